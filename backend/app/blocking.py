@@ -0,0 +1,62 @@
+"""
+Bounded thread pool for the blocking I/O behind the async route handlers.
+
+supabase-py (and the sync Shopify helpers in `supabase_client`) block the
+calling thread, so handlers hand those calls to `run_blocking()` instead of
+running them on the event loop. The pool size caps concurrent upstream
+calls per worker. The queue limit caps how many calls may be running or
+waiting; past that, requests fail fast with `IOQueueFull` (HTTP 503)
+instead of piling up.
+"""
+
+import os
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException
+
+IO_THREAD_POOL_SIZE = int(os.getenv("IO_THREAD_POOL_SIZE", "32"))
+IO_QUEUE_LIMIT = int(os.getenv("IO_QUEUE_LIMIT", "256"))
+
+_executor = ThreadPoolExecutor(max_workers=IO_THREAD_POOL_SIZE, thread_name_prefix="io")
+# Only touched from the event loop thread, so no lock is needed
+_pending = 0
+
+
+class IOQueueFull(HTTPException):
+    def __init__(self, pending: int):
+        super().__init__(
+            status_code=503,
+            detail=f"Server busy: {pending} upstream calls already queued",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run `fn(*args, **kwargs)` on the I/O pool, carrying the caller's contextvars."""
+    global _pending
+    if _pending >= IO_QUEUE_LIMIT:
+        raise IOQueueFull(_pending)
+
+    _pending += 1
+    try:
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, fn, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(_executor, call)
+    finally:
+        _pending -= 1
+
+
+def pool_stats() -> dict:
+    return {
+        "pool_size": IO_THREAD_POOL_SIZE,
+        "queue_limit": IO_QUEUE_LIMIT,
+        "pending": _pending,
+    }
+
+
+def shutdown_pool():
+    _executor.shutdown(wait=False, cancel_futures=True)
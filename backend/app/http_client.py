@@ -0,0 +1,153 @@
+"""
+Shared, connection-pooled HTTP clients for outbound Shopify / Mailtrap traffic.
+
+One httpx client is kept per upstream host (sync and async flavours), so
+TLS handshakes and keep-alive connections are reused across calls instead
+of being paid for on every request. Pool sizes and timeouts are set per
+host class via env vars.
+
+The FastAPI app closes the async clients from its lifespan handler; CLIs
+call `close_clients()` when they finish.
+"""
+
+import os
+import threading
+from urllib.parse import urlsplit
+
+import httpx
+
+from .tracing import instrument
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is installed)
+    _H2_AVAILABLE = True
+except ImportError:
+    _H2_AVAILABLE = False
+
+HTTP2_ENABLED = _H2_AVAILABLE and os.getenv("HTTP2_ENABLED", "true").strip().lower() == "true"
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+# Per-host-class pool limits and timeouts (seconds)
+HOST_SETTINGS = {
+    "shopify": {
+        "max_connections": _env_int("SHOPIFY_HTTP_MAX_CONNECTIONS", 10),
+        "max_keepalive": _env_int("SHOPIFY_HTTP_MAX_KEEPALIVE", 10),
+        "connect_timeout": _env_float("SHOPIFY_HTTP_CONNECT_TIMEOUT", 5),
+        "timeout": _env_float("SHOPIFY_HTTP_TIMEOUT", 20),
+    },
+    "mailtrap": {
+        "max_connections": _env_int("MAILTRAP_HTTP_MAX_CONNECTIONS", 10),
+        "max_keepalive": _env_int("MAILTRAP_HTTP_MAX_KEEPALIVE", 10),
+        "connect_timeout": _env_float("MAILTRAP_HTTP_CONNECT_TIMEOUT", 5),
+        "timeout": _env_float("MAILTRAP_HTTP_TIMEOUT", 20),
+    },
+    "default": {
+        "max_connections": _env_int("HTTP_MAX_CONNECTIONS", 10),
+        "max_keepalive": _env_int("HTTP_MAX_KEEPALIVE", 5),
+        "connect_timeout": _env_float("HTTP_CONNECT_TIMEOUT", 5),
+        "timeout": _env_float("HTTP_TIMEOUT", 30),
+    },
+}
+
+_lock = threading.Lock()
+_sync_clients: dict[str, httpx.Client] = {}
+_async_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _env_netloc(name: str) -> str:
+    return urlsplit(os.getenv(name) or "").netloc.lower()
+
+
+def host_class(host: str) -> str:
+    """`host` is a netloc (host[:port]), as in the pool keys."""
+    shop_hosts = {(os.getenv("SHOP_URL") or "").lower(), _env_netloc("SHOPIFY_BASE_URL")} - {""}
+    host = host.lower()
+    if host.endswith(".myshopify.com") or host in shop_hosts:
+        return "shopify"
+    if host.endswith("mailtrap.io") or host == _env_netloc("MAILTRAP_URL"):
+        return "mailtrap"
+    return "default"
+
+
+def span_kind(request: httpx.Request) -> str:
+    """Span kind for an outbound call, used by the tracing hooks."""
+    kind = host_class(request.url.netloc.decode("ascii"))
+    if kind == "shopify":
+        return "shopify_graphql" if request.url.path.endswith("/graphql.json") else "shopify_rest"
+    if kind == "mailtrap":
+        return "mailtrap"
+    return "http"
+
+
+def _client_kwargs(host: str) -> dict:
+    settings = HOST_SETTINGS[host_class(host)]
+    return {
+        "http2": HTTP2_ENABLED,
+        "limits": httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive"],
+        ),
+        "timeout": httpx.Timeout(settings["timeout"], connect=settings["connect_timeout"]),
+    }
+
+
+def _host_of(url: str) -> str:
+    host = urlsplit(url).netloc
+    if not host:
+        raise ValueError(f"Absolute URL required, got {url!r}")
+    return host
+
+
+def get_client(url: str) -> httpx.Client:
+    """Pooled sync client for the host of `url`."""
+    host = _host_of(url)
+    client = _sync_clients.get(host)
+    if client is None:
+        with _lock:
+            client = _sync_clients.get(host)
+            if client is None:
+                client = instrument(httpx.Client(**_client_kwargs(host)), span_kind)
+                _sync_clients[host] = client
+    return client
+
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    """Pooled async client for the host of `url` (use from the app's event loop)."""
+    host = _host_of(url)
+    client = _async_clients.get(host)
+    if client is None:
+        client = instrument(httpx.AsyncClient(**_client_kwargs(host)), span_kind)
+        _async_clients[host] = client
+    return client
+
+
+def request(method: str, url: str, **kwargs) -> httpx.Response:
+    return get_client(url).request(method, url, **kwargs)
+
+
+async def arequest(method: str, url: str, **kwargs) -> httpx.Response:
+    return await get_async_client(url).request(method, url, **kwargs)
+
+
+def close_clients():
+    with _lock:
+        clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for client in clients:
+        client.close()
+
+
+async def aclose_clients():
+    clients = list(_async_clients.values())
+    _async_clients.clear()
+    for client in clients:
+        await client.aclose()
+    close_clients()
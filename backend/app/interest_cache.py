@@ -0,0 +1,150 @@
+"""
+In-process caches for admin reads of `product_interest_requests`.
+
+Entries are tagged with a generation number. Every write path
+(`insert_interest`, `update_status`, `archive_mark`, deferred enrichment)
+calls `invalidate_interest_caches()`, which bumps the generation and drops
+everything cached. A result computed while a write was in flight is never
+stored, because its generation is stale by the time it finishes.
+
+- counts: short TTL cache behind `GET /api/interest/counts`
+- lists: bounded LRU of `GET /api/interest` responses keyed by the
+  normalized query, with identical in-flight queries coalesced into one
+  upstream call
+"""
+
+import os
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+COUNTS_TTL_SECONDS = float(os.getenv("INTEREST_COUNTS_TTL_SECONDS", "30"))
+# Upper bound on staleness for writes made by another worker/process
+LIST_CACHE_TTL_SECONDS = float(os.getenv("INTEREST_LIST_CACHE_TTL_SECONDS", "60"))
+LIST_CACHE_MAX_ENTRIES = int(os.getenv("INTEREST_LIST_CACHE_MAX_ENTRIES", "256"))
+
+_lock = threading.Lock()
+_generation = 0
+_counts: dict[Hashable, Tuple[float, Any]] = {}
+_lists: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+_inflight: dict[Tuple[int, Hashable], asyncio.Future] = {}
+
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "coalesced": 0,
+    "evictions": 0,
+    "invalidations": 0,
+    "counts_hits": 0,
+    "counts_misses": 0,
+}
+
+
+def current_generation() -> int:
+    return _generation
+
+
+def invalidate_interest_caches():
+    global _generation
+    with _lock:
+        _generation += 1
+        _counts.clear()
+        _lists.clear()
+        _stats["invalidations"] += 1
+
+
+def get_counts(key: Hashable) -> Optional[Any]:
+    with _lock:
+        entry = _counts.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            _counts.pop(key, None)
+            _stats["counts_misses"] += 1
+            return None
+        _stats["counts_hits"] += 1
+        return entry[1]
+
+
+def set_counts(key: Hashable, value: Any, generation: int):
+    with _lock:
+        if generation != _generation:
+            return
+        _counts[key] = (time.monotonic() + COUNTS_TTL_SECONDS, value)
+
+
+def _get_list(key: Hashable) -> Optional[Any]:
+    entry = _lists.get(key)
+    if entry is None:
+        return None
+    if entry[0] < time.monotonic():
+        del _lists[key]
+        return None
+    _lists.move_to_end(key)
+    return entry[1]
+
+
+def _set_list(key: Hashable, value: Any, generation: int):
+    if generation != _generation:
+        return
+    _lists[key] = (time.monotonic() + LIST_CACHE_TTL_SECONDS, value)
+    _lists.move_to_end(key)
+    while len(_lists) > LIST_CACHE_MAX_ENTRIES:
+        _lists.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+async def cached_interest_list(key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Return the cached response for `key`, or run `load()` once and share its
+    result with every concurrent caller asking for the same key.
+    """
+    with _lock:
+        value = _get_list(key)
+        if value is not None:
+            _stats["hits"] += 1
+            return value
+        generation = _generation
+        inflight = _inflight.get((generation, key))
+        owner = inflight is None
+        if owner:
+            _stats["misses"] += 1
+            inflight = asyncio.get_running_loop().create_future()
+            _inflight[(generation, key)] = inflight
+        else:
+            _stats["coalesced"] += 1
+
+    if not owner:
+        return await asyncio.shield(inflight)
+
+    try:
+        value = await load()
+    except asyncio.CancelledError:
+        inflight.cancel()
+        raise
+    except Exception as e:
+        inflight.set_exception(e)
+        # Nobody else may be waiting; don't leave "exception never retrieved" noise
+        inflight.exception()
+        raise
+    else:
+        inflight.set_result(value)
+        with _lock:
+            _set_list(key, value, generation)
+        return value
+    finally:
+        with _lock:
+            _inflight.pop((generation, key), None)
+
+
+def cache_stats() -> dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"] + _stats["coalesced"]
+        return {
+            **_stats,
+            "hit_ratio": round((_stats["hits"] + _stats["coalesced"]) / lookups, 4) if lookups else None,
+            "list_entries": len(_lists),
+            "list_max_entries": LIST_CACHE_MAX_ENTRIES,
+            "counts_entries": len(_counts),
+            "generation": _generation,
+        }
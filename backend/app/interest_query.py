@@ -0,0 +1,224 @@
+"""
+Query building for the `product_interest_requests` admin list.
+
+Shared by `GET /api/interest` and anything else that needs the same
+filters and ordering, plus the opaque keyset cursor used by cursor
+pagination.
+"""
+
+import base64
+import binascii
+import json
+import re
+from typing import Any, Callable, Dict, List, Tuple
+
+INTEREST_TABLE = "product_interest_requests"
+
+INTEREST_COLUMNS = (
+    "id, product_id, product_title, email, customer_name, isbn, cr_id, status, cr_seq, archived, archived_at, "
+    "created_at, shopify_collection_handles, product_tags, shopify_collections, enrichment_status, is_out_of_print"
+)
+
+ALLOWED_SORT_FIELDS = {
+    "created_at",
+    "product_title",
+    "email",
+    "customer_name",
+    "status",
+    "cr_id",
+}
+
+# `sort_field=relevance` ranks search hits via the `search_interest_requests` RPC
+RELEVANCE_SORT = "relevance"
+SEARCH_RPC = "search_interest_requests"
+
+CR_ID_RE = re.compile(r"^CR[0-9A-F]{8}$", re.IGNORECASE)
+ISBN_RE = re.compile(r"^(\d{9}[\dX]|\d{13})$", re.IGNORECASE)
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def normalize_archived_mode(archived: str | None) -> str:
+    # Archived mode: exclude (default), include, only
+    archived_mode = (archived or "exclude").strip().lower()
+    if archived_mode not in {"exclude", "include", "only"}:
+        archived_mode = "exclude"
+    return archived_mode
+
+
+def normalize_collection_filter(collection_filter: str | None) -> str:
+    # Normalize: accept "All", "OP"/"Out-of-Print" variants, and "Not OP"
+    raw_cf = (collection_filter or "All").strip().lower()
+    norm = raw_cf.replace(" ", "-")  # normalize spaces -> hyphen
+    if norm in {"op", "out-of-print", "out_of_print"}:
+        return "op"
+    if norm in {"notop", "not-op", "not_out_of_print"}:
+        return "notop"
+    return "all"
+
+
+def parse_statuses(statuses: str | None) -> list[str]:
+    if not statuses:
+        return []
+    return [s.strip() for s in statuses.split(",") if s.strip()]
+
+
+def classify_search(search: str) -> Tuple[str, Any]:
+    """
+    Pick the cheapest way to answer a search box term:
+    ("cr_id", "CR…"), ("isbn", [forms]), ("email", term) or ("text", term).
+    """
+    term = search.strip()
+    if CR_ID_RE.match(term):
+        return "cr_id", term.upper()
+    compact = re.sub(r"[\s-]", "", term)
+    if ISBN_RE.match(compact):
+        return "isbn", sorted({term, compact.upper()})
+    if EMAIL_RE.match(term):
+        return "email", term
+    return "text", term
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def apply_search(q, search: str):
+    """
+    Exact-match fast paths for CR ids, ISBNs and emails; everything else is a
+    substring match on the trigram-indexed columns OR'd with a full-text match
+    on `search_vector`, so every branch is served by an index.
+    """
+    kind, value = classify_search(search)
+    if kind == "cr_id":
+        return q.eq("cr_id", value)
+    if kind == "isbn":
+        return q.in_("isbn", value)
+    if kind == "email":
+        return q.ilike("email", _escape_like(value))
+
+    pattern = _quote(f"%{_escape_like(value)}%")
+    return q.or_(
+        f"product_title.ilike.{pattern},email.ilike.{pattern},customer_name.ilike.{pattern},"
+        f"cr_id.ilike.{pattern},isbn.ilike.{pattern},search_vector.wfts(simple).{_quote(value)}"
+    )
+
+
+def apply_interest_filters(q, archived: str | None, collection_filter: str | None, search: str | None, statuses: str | None):
+    """Apply the archived / collection / search / status filters to a PostgREST query."""
+    archived_mode = normalize_archived_mode(archived)
+    if archived_mode == "exclude":
+        q = q.eq("archived", False)
+    elif archived_mode == "only":
+        q = q.eq("archived", True)
+
+    # Out-of-Print is the generated `is_out_of_print` column (definition in supabase/schema.sql)
+    cf = normalize_collection_filter(collection_filter)
+    if cf == "op":
+        q = q.eq("is_out_of_print", True)
+    elif cf == "notop":
+        q = q.eq("is_out_of_print", False)
+    # else: "all" -> no additional filter
+
+    # Apply search filter across product_title, email, customer_name, cr_id, isbn
+    if search and search.strip():
+        q = apply_search(q, search)
+
+    # Apply status filtering
+    status_list = parse_statuses(statuses)
+    if status_list:
+        or_clauses = ",".join([f"status.eq.{s}" for s in status_list])
+        q = q.or_(or_clauses)
+
+    return q
+
+
+def resolve_sort(sort_field: str | None, sort_order: str | None) -> Tuple[str, bool]:
+    # Default to created_at if invalid or missing
+    field = sort_field if sort_field in ALLOWED_SORT_FIELDS else "created_at"
+    desc_flag = True
+    if isinstance(sort_order, str) and sort_order.lower() == "asc":
+        desc_flag = False
+    return field, desc_flag
+
+
+# --- Keyset (cursor) pagination ---
+#
+# Rows are ordered by (sort field, id) in the requested direction, with NULLs
+# treated as the largest value (last ascending, first descending) so a plain
+# btree on (field, id) serves both directions. The cursor carries the last
+# row's values for both columns and the next page is a seek predicate on
+# them, so every page costs one index range scan no matter how deep it is,
+# and inserts never shift rows between pages.
+#
+# Postgres can't start an index scan from an OR alone, so each seek also
+# carries a plain range bound on the field (the OR only breaks ties on id).
+# Where the rest of the order spans the NULL block and the non-NULL values,
+# the seek is split into segments read one after the other (seek_segments).
+
+def encode_cursor(field: str, desc: bool, row: Dict[str, Any]) -> str:
+    raw = json.dumps(
+        {"f": field, "d": desc, "v": row.get(field), "id": row["id"]},
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, field: str, desc: bool) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error) as e:
+        raise InvalidCursor("Malformed cursor") from e
+
+    if not isinstance(data, dict) or "id" not in data or "v" not in data:
+        raise InvalidCursor("Malformed cursor")
+    if data.get("f") != field or bool(data.get("d")) != desc:
+        raise InvalidCursor("Cursor does not match the requested sort")
+    return data
+
+
+def _quote(value: Any) -> str:
+    """Quote a value for a PostgREST logic-tree filter (or=/and=)."""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def apply_keyset_order(q, field: str, desc: bool):
+    return q.order(field, desc=desc, nullsfirst=desc).order("id", desc=desc)
+
+
+def seek_segments(field: str, desc: bool, cursor: Dict[str, Any] | None) -> List[Callable[[Any], Any]]:
+    """
+    Filters selecting the rows strictly after the cursor position, as
+    segments in keyset order: read each (with apply_keyset_order) until the
+    page is full. Every segment is a single range on the (field, id) index.
+    """
+    if cursor is None:
+        return [lambda q: q]
+
+    value = cursor["v"]
+    last_id = cursor["id"]
+
+    if value is None:
+        if desc:
+            # Leading NULL block: remaining NULLs by id, then every non-NULL value
+            return [
+                lambda q: q.is_(field, "null").lt("id", last_id),
+                lambda q: q.not_.is_(field, "null"),
+            ]
+        # Trailing NULL block: only the id tiebreaker is left
+        return [lambda q: q.is_(field, "null").gt("id", last_id)]
+
+    op = "lt" if desc else "gt"
+    tiebreak = f"{field}.{op}.{_quote(value)},and({field}.eq.{_quote(value)},id.{op}.{_quote(last_id)})"
+    if desc:
+        # NULLs came first, so none are left
+        return [lambda q: q.lte(field, value).or_(tiebreak)]
+    return [
+        lambda q: q.gte(field, value).or_(tiebreak),
+        lambda q: q.is_(field, "null"),
+    ]
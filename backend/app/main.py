@@ -1,9 +1,25 @@
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from app.logging_config import configure_logging
+from app.blocking import shutdown_pool
+from app.http_client import aclose_clients
+from app.metrics import MetricsMiddleware, render_metrics
+from app.tracing import ServerTimingMiddleware
 from app.routes import router as interest_router
 from app.signed_copy_routes import router as signed_copy_router
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Drop pooled Shopify/Mailtrap connections on shutdown
+    await aclose_clients()
+    shutdown_pool()
+
+configure_logging()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,6 +32,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ServerTimingMiddleware)
+# Outermost, so the timings include CORS handling
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(interest_router, prefix="/api")
-app.include_router(signed_copy_router, prefix="/api")
\ No newline at end of file
+app.include_router(signed_copy_router, prefix="/api")
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request, token: str = ""):
+    # Route names, upstream hosts and error rates: admin only. Prometheus can pass the
+    # token as a `token` query param or as a bearer token (`authorization` in the scrape config)
+    admin_token = os.getenv("VITE_ADMIN_TOKEN")
+    bearer = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not admin_token or admin_token not in (token, bearer):
+        raise HTTPException(status_code=403, detail="Invalid token")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,136 @@
+"""
+Prometheus metrics for the API, served at `GET /metrics`.
+
+- http_requests_total{method,route,status}
+- http_request_duration_seconds{method,route} (histogram)
+- http_requests_in_flight{method,route}
+- http_request_errors_total{method,route,status} (4xx/5xx only)
+
+`route` is the matched path template (e.g. `/api/interest`), never the raw
+URL, so label cardinality stays bounded. Pool, cache and Shopify limiter
+state are exported as gauges read at scrape time.
+
+Under several worker processes set PROMETHEUS_MULTIPROC_DIR so each scrape
+aggregates all workers.
+"""
+
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from starlette.routing import Match
+
+from app.blocking import pool_stats
+from app.interest_cache import cache_stats
+from app.shopify_throttle import limiter
+from app.tracing import add_listener
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+UNMATCHED_ROUTE = "unmatched"
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests handled, by route and status code",
+    ["method", "route", "status"],
+)
+LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time from request start to the last body byte sent",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being handled",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+ERRORS = Counter(
+    "http_request_errors_total",
+    "Responses with a 4xx/5xx status, by route and status code",
+    ["method", "route", "status"],
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_call_duration_seconds",
+    "Supabase / Shopify / Mailtrap call time, by kind and calling function",
+    ["kind", "feature"],
+    buckets=LATENCY_BUCKETS,
+)
+add_listener(lambda kind, feature, seconds: UPSTREAM_LATENCY.labels(kind, feature).observe(seconds))
+
+# Read at scrape time; these are per-process and not aggregated in multiprocess mode
+IO_POOL_PENDING = Gauge("io_pool_pending", "Blocking calls running or queued on the I/O pool")
+IO_POOL_PENDING.set_function(lambda: pool_stats()["pending"])
+INTEREST_CACHE_ENTRIES = Gauge("interest_list_cache_entries", "Entries in the /interest list cache")
+INTEREST_CACHE_ENTRIES.set_function(lambda: cache_stats()["list_entries"])
+SHOPIFY_BUCKET_AVAILABLE = Gauge("shopify_graphql_bucket_available", "Estimated Shopify GraphQL cost points available")
+SHOPIFY_BUCKET_AVAILABLE.set_function(lambda: limiter.snapshot()["currently_available"])
+SHOPIFY_THROTTLED = Gauge("shopify_graphql_throttled", "THROTTLED responses received from Shopify GraphQL since start")
+SHOPIFY_THROTTLED.set_function(lambda: limiter.throttled_count)
+
+
+def _route_label(scope) -> str:
+    """Match the request against the app's routes up front so every metric,
+    including in-flight, carries the route template."""
+    app = scope.get("app")
+    partial = None
+    for route in getattr(getattr(app, "router", None), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (rather than BaseHTTPMiddleware) so streaming
+    responses aren't buffered and the timing covers the whole body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = _route_label(scope)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            LATENCY.labels(method, route).observe(time.perf_counter() - start)
+            REQUESTS.labels(method, route, str(status)).inc()
+            if status >= 400:
+                ERRORS.labels(method, route, str(status)).inc()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
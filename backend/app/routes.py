@@ -1,18 +1,45 @@
 import os
-import requests
+import asyncio
+import csv
+import io
+import json
 from datetime import datetime
-from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi import APIRouter, Request, HTTPException, Depends, BackgroundTasks
 from pydantic import BaseModel
-from fastapi.responses import Response
-from app.supabase_client import insert_interest, supabase, update_status, SHOP_URL, SHOPIFY_ACCESS_TOKEN, SHOPIFY_API_VERSION
+from fastapi.responses import Response, StreamingResponse
+from app.blocking import run_blocking
+from app.http_client import arequest
+from app.shopify_throttle import athrottled_graphql, limiter
+from app.tracing import ledger_snapshot, traced
+from app.interest_query import (
+    INTEREST_TABLE,
+    INTEREST_COLUMNS,
+    RELEVANCE_SORT,
+    SEARCH_RPC,
+    InvalidCursor,
+    apply_interest_filters,
+    apply_keyset_order,
+    seek_segments,
+    decode_cursor,
+    encode_cursor,
+    normalize_archived_mode,
+    classify_search,
+    normalize_collection_filter,
+    parse_statuses,
+    resolve_sort,
+)
+from app.interest_cache import cache_stats, cached_interest_list, current_generation, get_counts, set_counts
+from postgrest.types import CountMethod
+from app.supabase_client import insert_interest, supabase, update_status, update_status_bulk, archive_mark, enrich_interest_row, pending_enrichment_rows, lookup_catalog, SHOPIFY_ACCESS_TOKEN, SHOPIFY_API_VERSION, SHOPIFY_BASE_URL
 import re
 import logging
 from typing import Optional
 
 router = APIRouter()
-logger = logging.getLogger("uvicorn.error")
+logger = logging.getLogger(__name__)
 
-OOP_HANDLES = ["out-of-print-offers", "out-of-print-offers-1"]
+INTEREST_STATUSES = ["New", "In Progress", "Request Filed", "Complete"]
+MAX_BULK_STATUS_IDS = int(os.getenv("MAX_BULK_STATUS_IDS", "10000"))
 
 class InterestRequest(BaseModel):
     email: str
@@ -26,6 +53,11 @@ class StatusUpdateRequest(BaseModel):
     new_status: str
     changed_by: str | None = None
 
+class BulkStatusUpdateRequest(BaseModel):
+    ids: list[str]
+    new_status: str
+    changed_by: str | None = None
+
 class ArchiveOne(BaseModel):
     id: str
     reason: str | None = None
@@ -63,23 +95,53 @@ def validate_admin_token(request: Request, token: str = "") -> str:
     return provided
 
 @router.api_route("/interest", methods=["POST", "OPTIONS"])
-async def create_interest(req: Request):
+async def create_interest(req: Request, background_tasks: BackgroundTasks):
     try:
         body = await req.json()
         request = InterestRequest(**body)
-        result = insert_interest(
+        result = await run_blocking(
+            insert_interest,
             email=request.email,
             product_id=request.product_id,
             product_title=request.product_title,
             isbn=request.isbn,
             customer_name=request.customer_name
         )
+
+        # Deferred enrichment: respond now, fill in tags/collections after the response is sent
+        for row in result:
+            if row.get("enrichment_status") == "pending":
+                background_tasks.add_task(enrich_interest_row, row["id"], row["product_id"])
+
         return {"success": True, "data": result}
+    except HTTPException:
+        raise
     except Exception as e:
-        print("Error inserting interest:", e)
+        logger.exception("interest_insert_failed")
         raise HTTPException(status_code=500, detail="Failed to record interest.")
 
+@router.post("/interest/enrichment/retry", status_code=202)
+async def retry_interest_enrichment(background_tasks: BackgroundTasks, token: str = "", limit: int = 50, include_failed: bool = True):
+    """
+    Queue deferred Shopify enrichment again for rows stuck in `pending` or
+    `failed` with attempts left. The sweep runs after the response; poll the
+    rows' `enrichment_status` for the outcome.
+    """
+    if token != os.getenv("VITE_ADMIN_TOKEN"):
+        raise HTTPException(status_code=403, detail="Invalid token")
+    try:
+        limit = max(1, min(int(limit), 500))
+        rows = await run_blocking(pending_enrichment_rows, limit=limit, include_failed=include_failed)
+        for row in rows:
+            background_tasks.add_task(enrich_interest_row, row["id"], row["product_id"], row.get("enrichment_attempts") or 0)
+        return {"success": True, "queued": len(rows), "ids": [row["id"] for row in rows]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/interest")
+@traced
 async def get_interest_entries(
     token: str = "",
     collection_filter: str | None = None,
@@ -90,11 +152,20 @@ async def get_interest_entries(
     limit: int = 100,
     sort_field: str | None = None,
     sort_order: str | None = None,
+    pagination: str | None = None,
+    cursor: str | None = None,
 ):
-    # --- DEBUG LOGGING START ---
-    print(
-        "[INTEREST DEBUG]",
-        {
+    """
+    Admin list. Offset pagination (`page`) by default; pass `pagination=cursor`
+    (or a `cursor` from a previous response) for keyset pagination, which
+    returns an opaque `next_cursor` (null on the last page).
+
+    `sort_field=relevance` with a free-text `search` ranks hits by full-text
+    and trigram similarity (offset pagination only).
+    """
+    logger.debug(
+        "interest_list",
+        extra={
             "page": page,
             "limit": limit,
             "search": search,
@@ -102,9 +173,9 @@ async def get_interest_entries(
             "collection_filter": collection_filter,
             "sort_field": sort_field,
             "sort_order": sort_order,
-        }
+            "pagination": pagination,
+        },
     )
-    # --- DEBUG LOGGING END ---
 
     if token != os.getenv("VITE_ADMIN_TOKEN"):
         raise HTTPException(status_code=403, detail="Invalid token")
@@ -127,102 +198,304 @@ async def get_interest_entries(
     offset = (page - 1) * limit
     range_to = offset + limit - 1
 
-    try:
+    cursor_mode = bool(cursor) or (pagination or "").strip().lower() == "cursor"
+
+    # Relevance only means something for free text; exact-match fast paths fall back to the default sort
+    by_relevance = (
+        sort_field == RELEVANCE_SORT
+        and bool(search and search.strip())
+        and classify_search(search)[0] == "text"
+    )
+    if by_relevance and cursor_mode:
+        raise HTTPException(status_code=400, detail="Cursor pagination is not available for relevance sorting")
+
+    # Dynamic ordering
+    field, desc_flag = resolve_sort(sort_field, sort_order)
+
+    seek = None
+    if cursor:
+        try:
+            seek = decode_cursor(cursor, field, desc_flag)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def load():
+        if by_relevance:
+            # The RPC filters, ranks and cuts the page itself, so nothing is applied on top
+            q = supabase.rpc(SEARCH_RPC, {
+                "term": search.strip(),
+                "archived_mode": normalize_archived_mode(archived),
+                "collection_mode": normalize_collection_filter(collection_filter),
+                "statuses": parse_statuses(statuses) or None,
+                "row_offset": offset,
+                "row_limit": limit,
+            }).select(INTEREST_COLUMNS)
+            result = await run_blocking(q.execute)
+            return {"success": True, "data": result.data}
+
         # Build base query (apply filters first; order & range last)
-        q = supabase.table("product_interest_requests").select(
-            "id, product_id, product_title, email, customer_name, isbn, cr_id, status, cr_seq, archived, archived_at, created_at, shopify_collection_handles, product_tags, shopify_collections"
-        )
+        def base():
+            q = supabase.table(INTEREST_TABLE).select(INTEREST_COLUMNS)
+            return apply_interest_filters(q, archived, collection_filter, search, statuses)
 
-        # Archived mode: exclude (default), include, only
-        archived_mode = (archived or "exclude").strip().lower()
-        if archived_mode not in {"exclude", "include", "only"}:
-            archived_mode = "exclude"
-        if archived_mode == "exclude":
-            q = q.eq("archived", False)
-        elif archived_mode == "only":
-            q = q.eq("archived", True)
-
-        # Normalize: accept "All", "OP"/"Out-of-Print" variants, and "Not OP"
-        raw_cf = (collection_filter or "All").strip().lower()
-        norm = raw_cf.replace(" ", "-")  # normalize spaces -> hyphen
-        if norm in {"op", "out-of-print", "out_of_print"}:
-            cf = "op"
-        elif norm in {"notop", "not-op", "not_out_of_print"}:
-            cf = "notop"
-        else:
-            cf = "all"
-
-        if cf == "op":
-            # Out-of-Print definition
-            q = q.or_(
-                "shopify_collection_handles.ov.{out-of-print-offers,out-of-print-offers-1},"
-                "shopify_collections.ov.{Out-of-Print Offers,Past Out-of-Print Offers},"
-                "product_tags.ov.{op,pastop},"
-                "product_title.ilike.OP:%"
-            )
-        elif cf == "notop":
-            # Not-OP definition (title not OP and tags don't contain OP markers, accounting for null/empty)
-            q = q.or_(
-                "and(product_title.not.ilike.OP:%,product_tags.not.ov.{op,pastop}),"
-                "and(product_title.not.ilike.OP:%,or(product_tags.is.null,product_tags.eq.{}))"
-            )
-        # else: "all" -> no additional filter
-
-        # --- Begin: Apply backend filtering for search and statuses ---
-        # Apply search filter across product_title, email, customer_name
-        if search:
-            pattern = f"%{search}%"
-            q = q.or_(
-                f"product_title.ilike.{pattern},email.ilike.{pattern},customer_name.ilike.{pattern},cr_id.ilike.{pattern},isbn.ilike.{pattern}"
-            )
-
-        # Apply status filtering
-        if statuses:
-            status_list = [s.strip() for s in statuses.split(",") if s.strip()]
-            if status_list:
-                or_clauses = ",".join([f"status.eq.{s}" for s in status_list])
-                q = q.or_(or_clauses)
-        # --- End: Apply backend filtering ---
-
-        # Dynamic ordering
-        allowed_sort_fields = {
-            "created_at",
-            "product_title",
-            "email",
-            "customer_name",
-            "status",
-            "cr_id",
-        }
-        # Default to created_at if invalid or missing
-        field = sort_field if sort_field in allowed_sort_fields else "created_at"
-        desc_flag = True
-        if isinstance(sort_order, str) and sort_order.lower() == "asc":
-            desc_flag = False
+        if cursor_mode:
+            async def fetch(q):
+                return (await run_blocking(q.execute)).data or []
 
-        logger.info(f"🔥 SORT DEBUG: { {'sort_field': sort_field, 'resolved_field': field, 'sort_order': sort_order, 'desc_flag': desc_flag} }")
+            # One extra row tells us whether there is a next page
+            rows = await _read_keyset_page(base, field, desc_flag, seek, limit + 1, fetch)
+            next_cursor = encode_cursor(field, desc_flag, rows[limit - 1]) if len(rows) > limit else None
+            return {"success": True, "data": rows[:limit], "next_cursor": next_cursor}
 
         # Apply ordering before pagination
-        q = q.order(field, desc=desc_flag).range(offset, range_to)
+        q = base().order(field, desc=desc_flag).range(offset, range_to)
 
-        result = q.execute()
+        result = await run_blocking(q.execute)
         return {"success": True, "data": result.data}
+
+    # Normalized so equivalent requests (e.g. "Archived" vs "archived", status order) share an entry
+    cache_key = (
+        "list",
+        normalize_archived_mode(archived),
+        normalize_collection_filter(collection_filter),
+        (search or "").strip() or None,
+        tuple(sorted(parse_statuses(statuses))),
+        "relevance" if by_relevance else field,
+        desc_flag,
+        limit,
+        ("cursor", cursor or "") if cursor_mode else ("page", page),
+    )
+
+    try:
+        return await cached_interest_list(cache_key, load)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+EXPORT_PAGE_SIZE = int(os.getenv("INTEREST_EXPORT_PAGE_SIZE", "1000"))
+EXPORT_ARRAY_COLUMNS = {"shopify_collection_handles", "product_tags", "shopify_collections"}
+
+def _flatten_array(value, array_format: str, delimiter: str):
+    if value is None:
+        return None
+    if array_format == "json":
+        return json.dumps(value, ensure_ascii=False)
+    if array_format == "first":
+        return value[0] if value else None
+    if array_format == "native":
+        return value
+    return delimiter.join(str(v) for v in value)
+
+@traced
+def _fetch_export_page(q):
+    # The stream outlives export_interest(), so tag the page reads here
+    return q.execute()
+
+async def _read_keyset_page(base, field: str, desc: bool, seek, count: int, fetch):
+    """Up to `count` rows after `seek`, reading its segments in order until the page is full."""
+    rows = []
+    for segment in seek_segments(field, desc, seek):
+        q = apply_keyset_order(segment(base()), field, desc).limit(count - len(rows))
+        rows.extend(await fetch(q))
+        if len(rows) >= count:
+            break
+    return rows
+
+async def _iter_interest_rows(archived, collection_filter, search, statuses, field: str, desc: bool):
+    """Yield every matching row, reading keyset pages so only one page is ever held."""
+    def base():
+        q = supabase.table(INTEREST_TABLE).select(INTEREST_COLUMNS)
+        return apply_interest_filters(q, archived, collection_filter, search, statuses)
+
+    async def fetch(q):
+        return (await run_blocking(_fetch_export_page, q)).data or []
+
+    seek = None
+    while True:
+        rows = await _read_keyset_page(base, field, desc, seek, EXPORT_PAGE_SIZE, fetch)
+        for row in rows:
+            yield row
+        if len(rows) < EXPORT_PAGE_SIZE:
+            return
+        last = rows[-1]
+        seek = {"v": last.get(field), "id": last["id"]}
+
+@router.get("/interest/export")
+@traced
+async def export_interest(
+    token: str = "",
+    format: str = "csv",
+    collection_filter: str | None = None,
+    archived: str | None = None,
+    search: str | None = None,
+    statuses: str | None = None,
+    sort_field: str | None = None,
+    sort_order: str | None = None,
+    array_format: str | None = None,
+    array_delimiter: str = "; ",
+):
+    """
+    Stream every request matching the `GET /api/interest` filters as CSV or
+    NDJSON. Memory stays flat: rows are read in keyset pages and written out
+    as they arrive.
+
+    `array_format` flattens array columns (collections, handles, tags):
+    `join` (CSV default, joined with `array_delimiter`), `json`, `first`, or
+    `native` (NDJSON default, kept as JSON arrays).
+    """
+    if token != os.getenv("VITE_ADMIN_TOKEN"):
+        raise HTTPException(status_code=403, detail="Invalid token")
+
+    fmt = (format or "csv").strip().lower()
+    if fmt not in {"csv", "ndjson"}:
+        raise HTTPException(status_code=422, detail="format must be 'csv' or 'ndjson'")
+    arr = (array_format or ("join" if fmt == "csv" else "native")).strip().lower()
+    if arr not in {"join", "json", "first", "native"}:
+        raise HTTPException(status_code=422, detail="array_format must be join, json, first or native")
+    if fmt == "csv" and arr == "native":
+        arr = "json"
+
+    field, desc_flag = resolve_sort(sort_field, sort_order)
+    columns = [c.strip() for c in INTEREST_COLUMNS.split(",")]
+
+    def flatten(row):
+        return {
+            c: _flatten_array(row.get(c), arr, array_delimiter) if c in EXPORT_ARRAY_COLUMNS else row.get(c)
+            for c in columns
+        }
+
+    async def generate_csv():
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        async for row in _iter_interest_rows(archived, collection_filter, search, statuses, field, desc_flag):
+            writer.writerow(flatten(row))
+            if buf.tell() >= 64 * 1024:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+
+    async def generate_ndjson():
+        async for row in _iter_interest_rows(archived, collection_filter, search, statuses, field, desc_flag):
+            yield json.dumps(flatten(row), ensure_ascii=False, default=str) + "\n"
+
+    stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    if fmt == "csv":
+        body, media_type = generate_csv(), "text/csv; charset=utf-8"
+    else:
+        body, media_type = generate_ndjson(), "application/x-ndjson"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="interest-requests-{stamp}.{fmt}"'},
+    )
+
+@router.get("/interest/cache_stats")
+async def get_interest_cache_stats(token: str = ""):
+    if token != os.getenv("VITE_ADMIN_TOKEN"):
+        raise HTTPException(status_code=403, detail="Invalid token")
+    return {"success": True, "data": cache_stats()}
+
+@traced
+def _count_interest(method: CountMethod, archived: str | None, collection_filter: str | None, search: str | None, statuses: str | None) -> int:
+    q = supabase.table(INTEREST_TABLE).select("id", count=method, head=True)
+    q = apply_interest_filters(q, archived, collection_filter, search, statuses)
+    return q.execute().count or 0
+
+async def _count_interest_async(*args) -> int:
+    return await run_blocking(_count_interest, *args)
+
+@router.get("/interest/counts")
+@traced
+async def get_interest_counts(
+    token: str = "",
+    collection_filter: str | None = None,
+    archived: str | None = None,
+    search: str | None = None,
+    statuses: str | None = None,
+    count_mode: str = "auto",
+):
+    """
+    Total plus facet counts for the dashboard ("X–Y of Z" and filter badges).
+
+    `total` honours every filter. Each facet (`by_status`, `by_archived`,
+    `by_collection`) honours every filter except its own, so a badge shows
+    how many rows picking that option would give.
+
+    `count_mode=auto` uses exact counts when a search or status filter
+    narrows the set, and PostgREST's estimated count for broad filters.
+    Results are cached briefly and dropped on any write.
+    """
+    if token != os.getenv("VITE_ADMIN_TOKEN"):
+        raise HTTPException(status_code=403, detail="Invalid token")
+
+    archived_mode = normalize_archived_mode(archived)
+    cf = normalize_collection_filter(collection_filter)
+    status_list = parse_statuses(statuses)
+    search = (search or "").strip() or None
+
+    mode = (count_mode or "auto").strip().lower()
+    if mode == "exact":
+        method = CountMethod.exact
+    elif mode == "estimated":
+        method = CountMethod.estimated
+    else:
+        method = CountMethod.exact if (search or status_list) else CountMethod.estimated
+
+    key = ("counts", archived_mode, cf, search, tuple(sorted(status_list)), method.value)
+    cached = get_counts(key)
+    if cached is not None:
+        return {**cached, "cached": True}
+
+    generation = current_generation()
+    status_csv = ",".join(status_list) or None
+    archived_modes = ("exclude", "only")
+    collection_modes = ("op", "notop")
+    try:
+        # The count queries are independent, so run them side by side on the I/O pool
+        counts = await asyncio.gather(
+            _count_interest_async(method, archived_mode, cf, search, status_csv),
+            *[_count_interest_async(method, archived_mode, cf, search, s) for s in INTEREST_STATUSES],
+            *[_count_interest_async(method, mode_, cf, search, status_csv) for mode_ in archived_modes],
+            *[_count_interest_async(method, archived_mode, cf_, search, status_csv) for cf_ in collection_modes],
+        )
+        total, rest = counts[0], list(counts[1:])
+        by_status = dict(zip(INTEREST_STATUSES, rest[:len(INTEREST_STATUSES)]))
+        rest = rest[len(INTEREST_STATUSES):]
+        result = {
+            "success": True,
+            "count_method": method.value,
+            "total": total,
+            "by_status": by_status,
+            "by_archived": dict(zip(archived_modes, rest[:2])),
+            "by_collection": dict(zip(collection_modes, rest[2:])),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    result["by_archived"]["include"] = result["by_archived"]["exclude"] + result["by_archived"]["only"]
+    set_counts(key, result, generation)
+    return {**result, "cached": False}
+
 @router.post("/update_status")
 async def update_request_status(payload: StatusUpdateRequest, token: str = ""):
     if token != os.getenv("VITE_ADMIN_TOKEN"):
         raise HTTPException(status_code=403, detail="Invalid token")
 
     try:
-        # Debug: incoming payload
-        print("📥 Incoming status update payload:", payload.model_dump())
+        logger.debug("status_update_request", extra=payload.model_dump())
 
         # Default to "system" if no changed_by is provided
         actor = payload.changed_by if payload.changed_by else "system"
 
         # Call the RPC
-        result = update_status(
+        result = await run_blocking(
+            update_status,
             payload.request_id,
             payload.new_status,
             changed_by=actor,
@@ -230,12 +503,40 @@ async def update_request_status(payload: StatusUpdateRequest, token: str = ""):
             optimistic=False
         )
 
-        # Debug: RPC call result
-        print("✅ RPC result:", result)
+        logger.info("status_updated", extra={"request_id": payload.request_id, "new_status": payload.new_status})
 
         return {"success": True, "data": result}
+    except HTTPException:
+        raise
     except Exception as e:
-        print("❌ Error in update_request_status:", str(e))
+        logger.exception("status_update_failed", extra={"request_id": payload.request_id})
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/update_status/bulk")
+async def update_request_status_bulk(payload: BulkStatusUpdateRequest, token: str = ""):
+    if token != os.getenv("VITE_ADMIN_TOKEN"):
+        raise HTTPException(status_code=403, detail="Invalid token")
+    if not payload.ids:
+        raise HTTPException(status_code=422, detail="No ids provided")
+    if len(payload.ids) > MAX_BULK_STATUS_IDS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BULK_STATUS_IDS} ids per call")
+
+    try:
+        outcomes = await run_blocking(
+            update_status_bulk,
+            payload.ids,
+            payload.new_status,
+            changed_by=payload.changed_by or "system",
+            source="api_bulk",
+        )
+        summary: dict[str, int] = {}
+        for o in outcomes:
+            summary[o["outcome"]] = summary.get(o["outcome"], 0) + 1
+        return {"success": True, "summary": summary, "data": outcomes}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("status_update_bulk_failed", extra={"id_count": len(payload.ids)})
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/archive")
@@ -249,10 +550,9 @@ async def archive_one(payload: ArchiveOne | None = None, id: str | None = None,
         if not resolved_id:
             raise HTTPException(status_code=422, detail="Missing 'id' (provide as query param or JSON body)")
 
-        resp = supabase.rpc("archive_mark", {"ids": [resolved_id], "reason": reason}).execute()
+        data = await run_blocking(archive_mark, [resolved_id], reason)
         # Derive a useful count if possible
         moved = None
-        data = getattr(resp, "data", None)
         if isinstance(data, list):
             if data and isinstance(data[0], dict):
                 moved = data[0].get("moved") or data[0].get("count") or len(data)
@@ -274,8 +574,7 @@ async def archive_bulk(payload: ArchiveBulk, token: str = ""):
     if token != os.getenv("VITE_ADMIN_TOKEN"):
         raise HTTPException(status_code=403, detail="Invalid token")
     try:
-        resp = supabase.rpc("archive_mark", {"ids": payload.ids, "reason": payload.reason}).execute()
-        data = getattr(resp, "data", None)
+        data = await run_blocking(archive_mark, payload.ids, payload.reason)
         count = None
         if isinstance(data, list):
             if data and isinstance(data[0], dict):
@@ -287,24 +586,28 @@ async def archive_bulk(payload: ArchiveBulk, token: str = ""):
         elif isinstance(data, (int, float)):
             count = int(data)
         return {"success": True, "count": count if count is not None else len(payload.ids), "rpc": data}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/blacklist")
+@traced
 async def get_blacklist(token: str = ""):
     if token != os.getenv("VITE_ADMIN_TOKEN"):
         raise HTTPException(status_code=403, detail="Invalid token")
-    res = supabase.table("blacklisted_barcodes").select("*").execute()
+    res = await run_blocking(supabase.table("blacklisted_barcodes").select("*").execute)
     return res.data
 
 @router.post("/blacklist/add")
+@traced
 async def add_to_blacklist_debug(request: Request, token: str = ""):
     if token != os.getenv("VITE_ADMIN_TOKEN"):
         raise HTTPException(status_code=403, detail="Invalid token")
 
     try:
         raw_body = await request.json()
-        print("📥 Raw incoming body (pre-validation):", raw_body)
+        logger.debug("blacklist_add_request", extra={"body": raw_body})
 
         # Support both single object or list of objects
         entries = raw_body if isinstance(raw_body, list) else [raw_body]
@@ -312,18 +615,20 @@ async def add_to_blacklist_debug(request: Request, token: str = ""):
         parsed_entries = []
         for entry_data in entries:
             entry = BlacklistEntry(**entry_data)
-            print("✅ Parsed entry:", entry.model_dump())
             parsed_entries.append(entry.model_dump())
 
         # Bulk upsert
-        supabase.table("blacklisted_barcodes").upsert(parsed_entries).execute()
+        await run_blocking(supabase.table("blacklisted_barcodes").upsert(parsed_entries).execute)
         return {"success": True, "count": len(parsed_entries)}
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print("❌ Failed to parse or upsert:", e)
+        logger.warning("blacklist_add_failed", extra={"error": str(e)})
         raise HTTPException(status_code=422, detail=str(e))
 
 @router.post("/blacklist/remove")
+@traced
 async def remove_from_blacklist(entry: RemoveEntry, token: str = ""):
     if token != os.getenv("VITE_ADMIN_TOKEN"):
         raise HTTPException(status_code=403, detail="Invalid token")
@@ -337,17 +642,37 @@ async def remove_from_blacklist(entry: RemoveEntry, token: str = ""):
     delete_query = supabase.table("blacklisted_barcodes").delete().or_(
         ",".join(conditions)
     )
-    result = delete_query.execute()
-    print("🗑️ Delete result:", result.data)
+    result = await run_blocking(delete_query.execute)
+    logger.info("blacklist_removed", extra={"deleted": len(result.data or [])})
     return {"success": True}
 
+@router.get("/catalog/lookup")
+async def catalog_lookup(q: str, token: str = ""):
+    """Barcode / product ID lookup served from the local catalog mirror instead of live Shopify."""
+    if token != os.getenv("VITE_ADMIN_TOKEN"):
+        raise HTTPException(status_code=403, detail="Invalid token")
+    try:
+        return {"success": True, "source": "catalog_mirror", "data": await run_blocking(lookup_catalog, q)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/shopify/usage")
+async def shopify_usage(token: str = ""):
+    """Per-feature Shopify GraphQL cost / REST call ledger and upstream time since this worker started."""
+    if token != os.getenv("VITE_ADMIN_TOKEN"):
+        raise HTTPException(status_code=403, detail="Invalid token")
+    return {"success": True, "limiter": limiter.snapshot(), "features": ledger_snapshot()}
+
 @router.post("/blacklist/export_snippet")
+@traced
 async def export_blacklist_snippet(token: str = ""):
     if token != os.getenv("VITE_ADMIN_TOKEN"):
         raise HTTPException(status_code=403, detail="Invalid token")
     try:
         sb = supabase
-        response = sb.table("blacklisted_barcodes").select("barcode,product_id").execute()
+        response = await run_blocking(sb.table("blacklisted_barcodes").select("barcode,product_id").execute)
 
         barcodes = [row["barcode"] for row in response.data if row.get("barcode")]
         product_ids = [str(row["product_id"]) for row in response.data if row.get("product_id")]
@@ -361,13 +686,10 @@ async def export_blacklist_snippet(token: str = ""):
         snippet = product_id_snippet + "\n" + barcode_snippet
 
         # Step 1: Get the MAIN theme ID
-        theme_resp = requests.post(
-            f"https://{SHOP_URL}/admin/api/{SHOPIFY_API_VERSION}/graphql.json",
-            headers={
-                "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN,
-                "Content-Type": "application/json",
-            },
-            json={"query": "{ themes(first: 10) { edges { node { id name role } } } }"},
+        theme_resp = await athrottled_graphql(
+            f"{SHOPIFY_BASE_URL}/admin/api/{SHOPIFY_API_VERSION}/graphql.json",
+            SHOPIFY_ACCESS_TOKEN,
+            {"query": "{ themes(first: 10) { edges { node { id name role } } } }"},
         )
 
         theme_data = theme_resp.json()
@@ -391,14 +713,15 @@ async def export_blacklist_snippet(token: str = ""):
             raise Exception("No main theme found")
 
         # Step 2: Upload snippet to the theme
-        asset_url = f"https://{SHOP_URL}/admin/api/{SHOPIFY_API_VERSION}/themes/{main_theme_id}/assets.json"
+        asset_url = f"{SHOPIFY_BASE_URL}/admin/api/{SHOPIFY_API_VERSION}/themes/{main_theme_id}/assets.json"
         asset_payload = {
             "asset": {
                 "key": "snippets/blacklisted-barcodes.liquid",
                 "value": snippet
             }
         }
-        upload_resp = requests.put(
+        upload_resp = await arequest(
+            "PUT",
             asset_url,
             headers={
                 "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN,
@@ -407,19 +730,20 @@ async def export_blacklist_snippet(token: str = ""):
             json=asset_payload,
         )
 
-        if not upload_resp.ok:
+        if not upload_resp.is_success:
             raise Exception(f"Snippet upload failed: {upload_resp.text}")
 
         # Fetch current contents of main-product.liquid
-        theme_asset_url = f"https://{SHOP_URL}/admin/api/{SHOPIFY_API_VERSION}/themes/{main_theme_id}/assets.json?asset[key]=sections/main-product.liquid"
-        fetch_resp = requests.get(
+        theme_asset_url = f"{SHOPIFY_BASE_URL}/admin/api/{SHOPIFY_API_VERSION}/themes/{main_theme_id}/assets.json?asset[key]=sections/main-product.liquid"
+        fetch_resp = await arequest(
+            "GET",
             theme_asset_url,
             headers={
                 "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN,
                 "Content-Type": "application/json",
             },
         )
-        if not fetch_resp.ok:
+        if not fetch_resp.is_success:
             raise Exception(f"Failed to fetch main-product.liquid: {fetch_resp.text}")
         content = fetch_resp.json().get("asset", {}).get("value", "")
 
@@ -440,7 +764,8 @@ async def export_blacklist_snippet(token: str = ""):
             updated_content = barcode_snippet + "\n" + updated_content
 
         # Upload updated main-product.liquid
-        upload_main_resp = requests.put(
+        upload_main_resp = await arequest(
+            "PUT",
             asset_url,
             headers={
                 "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN,
@@ -453,25 +778,28 @@ async def export_blacklist_snippet(token: str = ""):
                 }
             },
         )
-        if not upload_main_resp.ok:
+        if not upload_main_resp.is_success:
             raise Exception(f"main-product.liquid update failed: {upload_main_resp.text}")
 
-        sb.table("blacklist_snippet_logs").insert({
+        await run_blocking(sb.table("blacklist_snippet_logs").insert({
             "barcodes": barcodes,
             "product_ids": product_ids,
             "exported_at": datetime.utcnow().isoformat()
-        }).execute()
+        }).execute)
 
         return {
             "success": True,
             "reload_required": True
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print("Export failed:", e)
+        logger.exception("blacklist_snippet_export_failed")
         return { "success": False, "error": str(e) }
 
 @router.post("/shopify/graphql")
+@traced
 async def proxy_to_shopify(request: Request):
     try:
         shopify_token = os.getenv("SHOPIFY_ACCESS_TOKEN")
@@ -480,20 +808,14 @@ async def proxy_to_shopify(request: Request):
 
         payload = await request.json()
 
-        headers = {
-            "X-Shopify-Access-Token": shopify_token,
-            "Content-Type": "application/json"
-        }   
-
-        response = requests.post(
-            f"https://{os.getenv('SHOP_URL')}/admin/api/2023-10/graphql.json",
-            json=payload,
-            headers=headers
+        # Shares the process-wide GraphQL cost budget with the rest of the app
+        response = await athrottled_graphql(
+            f"{SHOPIFY_BASE_URL}/admin/api/2023-10/graphql.json",
+            shopify_token,
+            payload,
         )
 
-        # 🔍 Log Shopify response for debugging
-        print("📡 Shopify GraphQL status:", response.status_code)
-        print("📄 Shopify response body:", response.text)
+        logger.debug("shopify_proxy_response", extra={"status": response.status_code, "bytes": len(response.content)})
 
         return Response(
             content=response.content,
@@ -502,5 +824,5 @@ async def proxy_to_shopify(request: Request):
         )
 
     except Exception as e:
-        print("❌ Shopify proxy error:", e)
+        logger.exception("shopify_proxy_failed")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""
+Process-wide, cost-aware limiter for the Shopify Admin GraphQL API.
+
+Shopify meters GraphQL with a leaky bucket: every response carries
+`extensions.cost.throttleStatus` (`maximumAvailable`, `currentlyAvailable`,
+`restoreRate`) plus the `requestedQueryCost` of the query. The limiter keeps
+a running estimate of the bucket from those numbers and delays a query only
+until the bucket is expected to hold that query's cost. Every caller in the
+process (app helpers, proxy, scripts) shares one budget, so concurrent
+callers queue up behind it instead of all getting THROTTLED together.
+"""
+
+import os
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from . import http_client
+from .tracing import record_graphql_cost
+
+log = logging.getLogger(__name__)
+
+# Conservative defaults until the first response tells us the shop's real bucket
+DEFAULT_MAXIMUM_AVAILABLE = float(os.getenv("SHOPIFY_GRAPHQL_BUCKET_SIZE", "1000"))
+DEFAULT_RESTORE_RATE = float(os.getenv("SHOPIFY_GRAPHQL_RESTORE_RATE", "50"))
+# Cost assumed for a query we haven't seen a response for yet
+DEFAULT_QUERY_COST = float(os.getenv("SHOPIFY_GRAPHQL_DEFAULT_COST", "10"))
+MAX_THROTTLE_RETRIES = int(os.getenv("SHOPIFY_GRAPHQL_MAX_THROTTLE_RETRIES", "10"))
+
+
+def query_key(query: str) -> str:
+    return hashlib.sha1(" ".join(query.split()).encode("utf-8")).hexdigest()[:16]
+
+
+def is_throttled(body: Dict[str, Any]) -> bool:
+    return any(
+        (e.get("extensions") or {}).get("code") == "THROTTLED"
+        for e in body.get("errors") or []
+        if isinstance(e, dict)
+    )
+
+
+class ShopifyCostLimiter:
+    def __init__(self, maximum_available: float = DEFAULT_MAXIMUM_AVAILABLE, restore_rate: float = DEFAULT_RESTORE_RATE):
+        self._lock = threading.Lock()
+        self.maximum_available = maximum_available
+        self.currently_available = maximum_available
+        self.restore_rate = restore_rate
+        self._updated_at = time.monotonic()
+        self._query_costs: dict[str, float] = {}
+        self.throttled_count = 0
+        self.waited_seconds = 0.0
+
+    def expected_cost(self, key: str) -> float:
+        return self._query_costs.get(key, DEFAULT_QUERY_COST)
+
+    def _available_now(self, now: float) -> float:
+        restored = (now - self._updated_at) * self.restore_rate
+        return min(self.maximum_available, self.currently_available + restored)
+
+    def _reserve(self, cost: float) -> float:
+        """Take `cost` from the bucket if it's there; otherwise return seconds to wait."""
+        # A query can never cost more than the bucket holds
+        cost = min(cost, self.maximum_available)
+        with self._lock:
+            now = time.monotonic()
+            available = self._available_now(now)
+            if available >= cost:
+                self.currently_available = available - cost
+                self._updated_at = now
+                return 0.0
+            return (cost - available) / self.restore_rate
+
+    def acquire(self, cost: float):
+        while True:
+            wait = self._reserve(cost)
+            if wait <= 0:
+                return
+            self.waited_seconds += wait
+            time.sleep(wait)
+
+    async def acquire_async(self, cost: float):
+        while True:
+            wait = self._reserve(cost)
+            if wait <= 0:
+                return
+            self.waited_seconds += wait
+            await asyncio.sleep(wait)
+
+    def update(self, key: str, extensions: Optional[Dict[str, Any]]):
+        """Resync the bucket estimate from a response's `extensions.cost`."""
+        cost = (extensions or {}).get("cost") or {}
+        status = cost.get("throttleStatus") or {}
+
+        with self._lock:
+            if cost.get("requestedQueryCost") is not None:
+                self._query_costs[key] = float(cost["requestedQueryCost"])
+            if status:
+                self.maximum_available = float(status.get("maximumAvailable", self.maximum_available))
+                self.currently_available = float(status.get("currentlyAvailable", self.currently_available))
+                self.restore_rate = float(status.get("restoreRate", self.restore_rate)) or DEFAULT_RESTORE_RATE
+                self._updated_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "maximum_available": self.maximum_available,
+                "currently_available": round(self._available_now(time.monotonic()), 1),
+                "restore_rate": self.restore_rate,
+                "throttled_count": self.throttled_count,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+
+limiter = ShopifyCostLimiter()
+
+
+def _headers(access_token: str) -> Dict[str, str]:
+    return {
+        "X-Shopify-Access-Token": access_token,
+        "Content-Type": "application/json",
+    }
+
+
+def throttled_graphql(url: str, access_token: str, query: str, variables: Optional[dict] = None) -> Dict[str, Any]:
+    """
+    POST a GraphQL query through the shared limiter and return the parsed body
+    (including any non-throttle `errors`, which callers handle as before).
+    THROTTLED responses are retried after waiting for the query's cost to restore.
+    """
+    key = query_key(query)
+
+    for _ in range(MAX_THROTTLE_RETRIES + 1):
+        limiter.acquire(limiter.expected_cost(key))
+        resp = http_client.request(
+            "POST",
+            url,
+            json={"query": query, "variables": variables or {}},
+            headers=_headers(access_token),
+        )
+        resp.raise_for_status()
+        body = resp.json()
+        limiter.update(key, body.get("extensions"))
+        record_graphql_cost(body.get("extensions"), throttled=is_throttled(body))
+
+        if not is_throttled(body):
+            return body
+
+        limiter.throttled_count += 1
+        log.warning("Shopify GraphQL throttled; waiting for %s cost points", limiter.expected_cost(key))
+
+    raise Exception(f"Shopify GraphQL still throttled after {MAX_THROTTLE_RETRIES} retries")
+
+
+async def athrottled_graphql(url: str, access_token: str, payload: Dict[str, Any]) -> httpx.Response:
+    """
+    Async variant for the app's handlers. Takes the raw `{"query", "variables"}`
+    payload and returns the raw response so it can be proxied unchanged.
+    """
+    key = query_key(payload.get("query") or "")
+
+    for _ in range(MAX_THROTTLE_RETRIES + 1):
+        await limiter.acquire_async(limiter.expected_cost(key))
+        resp = await http_client.arequest("POST", url, json=payload, headers=_headers(access_token))
+        try:
+            body = resp.json()
+        except ValueError:
+            return resp
+        if not isinstance(body, dict):
+            return resp
+        limiter.update(key, body.get("extensions"))
+        record_graphql_cost(body.get("extensions"), throttled=is_throttled(body))
+
+        if not is_throttled(body):
+            return resp
+
+        limiter.throttled_count += 1
+        log.warning("Shopify GraphQL throttled; waiting for %s cost points", limiter.expected_cost(key))
+
+    return resp
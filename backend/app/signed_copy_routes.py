@@ -1,11 +1,14 @@
 from fastapi import APIRouter, HTTPException
 import jwt
+import logging
 import os
 import time
 
+from app.blocking import run_blocking
 from app.supabase_client import record_signed_copy_response
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 SECRET = os.getenv("SIGNED_COPY_TOKEN_SECRET")
 
@@ -65,9 +68,9 @@ async def respond(payload: dict):
     if not row.get("order_id") or not row.get("line_item_id"):
         raise HTTPException(400, "Token missing order linkage")
 
-    print(f"[SIGNED COPY] {row['email']} → {row['response']}")
+    logger.info("signed_copy_response", extra={"order_id": row["order_id"], "line_item_id": row["line_item_id"], "response": row["response"]})
 
-    result = record_signed_copy_response(row)
+    result = await run_blocking(record_signed_copy_response, row)
 
     # handle new vs already recorded
     if isinstance(result, dict) and "status" in result:
@@ -1,12 +1,22 @@
 import os
+import asyncio
 from supabase import create_client, Client
 from dotenv import load_dotenv
+import logging
 import uuid
-import requests
+from datetime import datetime, timedelta, timezone
 from typing import Any, Dict
 
+from .blocking import run_blocking
+from .http_client import get_client
+from .interest_cache import invalidate_interest_caches
+from .shopify_throttle import throttled_graphql
+from .tracing import instrument, traced
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
@@ -14,10 +24,42 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SHOP_URL = os.getenv("SHOP_URL")  # e.g. castironbooks.myshopify.com
 SHOPIFY_ACCESS_TOKEN = os.getenv("SHOPIFY_ACCESS_TOKEN")
 SHOPIFY_API_VERSION = os.getenv("SHOPIFY_API_VERSION", "2024-10")
-
-SIGNED_COPY_PRODUCT_ID = 7179329437829
+# Override to point at a local stand-in (see bench/), e.g. http://127.0.0.1:9102
+SHOPIFY_BASE_URL = (os.getenv("SHOPIFY_BASE_URL") or f"https://{SHOP_URL}").rstrip("/")
+
+# Enrichment mode for new interest rows:
+# - "sync": fetch Shopify tags/collections before the insert (legacy behaviour)
+# - "deferred": insert the bare row as `enrichment_status = 'pending'` and let
+#   `enrich_interest_row` fill it in from a background task
+ENRICHMENT_MODE = os.getenv("ENRICHMENT_MODE", "sync").strip().lower()
+ENRICHMENT_MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "4"))
+ENRICHMENT_RETRY_BASE_SECONDS = float(os.getenv("ENRICHMENT_RETRY_BASE_SECONDS", "2"))
+# Which Shopify API backs enrichment: "graphql" (one paginated query) or "rest" (legacy 2 + N calls)
+ENRICHMENT_API = os.getenv("SHOPIFY_ENRICHMENT_API", "graphql").strip().lower()
+# Read product facts from the `catalog_products` mirror (scripts/sync_catalog_mirror.py) before asking Shopify
+CATALOG_MIRROR_ENABLED = os.getenv("CATALOG_MIRROR_ENABLED", "false").strip().lower() == "true"
+
+PRODUCT_ENRICHMENT_QUERY = """
+query ProductEnrichment($id: ID!, $cursor: String) {
+  product(id: $id) {
+    tags
+    collections(first: 25, after: $cursor) {
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+      nodes {
+        title
+        handle
+      }
+    }
+  }
+}
+"""
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Time every PostgREST query/RPC (see tracing.py)
+instrument(supabase.postgrest.session, "supabase")
 
 def _normalize_tags(tag_str: str | None):
     if not tag_str:
@@ -26,57 +68,167 @@ def _normalize_tags(tag_str: str | None):
     tags = [t for t in tags if t]
     return tags or None
 
-def _enrich_from_shopify(product_id: int):
+def _build_enrichment(tags: list[str] | None, titles: list[str], handles: list[str]) -> Dict[str, Any]:
+    out = {}
+    if tags is not None:
+        out["product_tags"] = tags
+    if titles:
+        out["shopify_collections"] = titles
+    if handles:
+        out["shopify_collection_handles"] = handles
+    return out
+
+def get_catalog_product(product_id: int) -> Dict[str, Any] | None:
+    resp = supabase.table("catalog_products") \
+        .select("*") \
+        .eq("product_id", product_id) \
+        .limit(1) \
+        .execute()
+    return resp.data[0] if resp.data else None
+
+def _enrich_from_catalog(product_id: int) -> Dict[str, Any] | None:
+    """Enrichment from the catalog mirror; None when the product hasn't been synced yet."""
+    product = get_catalog_product(product_id)
+    if not product:
+        return None
+    return _build_enrichment(
+        product.get("tags") or None,
+        product.get("collection_titles") or [],
+        product.get("collection_handles") or [],
+    )
+
+@traced
+def lookup_catalog(term: str) -> list[Dict[str, Any]]:
     """
-    Best-effort fetch of tags + collections (titles + handles).
-    Returns a dict suitable to merge into the insert payload.
+    Blacklist Manager lookup against the catalog mirror.
+    A numeric term may be either a product ID or a barcode (ISBN-13s are
+    the same length as product IDs), so both are checked.
     """
+    term = term.strip()
+    if not term:
+        return []
+
+    q = supabase.table("catalog_products") \
+        .select("product_id, title, handle, barcodes")
+    if term.isdigit():
+        q = q.or_(f"product_id.eq.{term},barcodes.cs.{{{term}}}")
+    else:
+        q = q.contains("barcodes", [term])
+    rows = q.limit(10).execute().data or []
+
+    out = []
+    for row in rows:
+        barcodes = row.get("barcodes") or []
+        out.append({
+            "product_id": row["product_id"],
+            "title": row.get("title"),
+            "handle": row.get("handle"),
+            "barcode": term if term in barcodes else (barcodes[0] if barcodes else None),
+            # The mirror has no author field
+            "author": None,
+        })
+    return out
+
+def _fetch_shopify_enrichment(product_id: int) -> Dict[str, Any]:
+    """
+    Fetch tags + collections (titles + handles) for a product.
+    Raises on HTTP/network errors so callers can decide whether to retry.
+    """
+    if CATALOG_MIRROR_ENABLED:
+        mirrored = _enrich_from_catalog(product_id)
+        if mirrored is not None:
+            return mirrored
+
     if not SHOP_URL or not SHOPIFY_ACCESS_TOKEN:
         return {}
 
-    session = requests.Session()
-    session.headers.update({"X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN})
-    base = f"https://{SHOP_URL}/admin/api/{SHOPIFY_API_VERSION}"
+    if ENRICHMENT_API == "rest":
+        return _fetch_shopify_enrichment_rest(product_id)
+    return _fetch_shopify_enrichment_graphql(product_id)
 
+def _fetch_shopify_enrichment_graphql(product_id: int) -> Dict[str, Any]:
+    """
+    Tags + every collection title/handle in one `product` query, following
+    the collections cursor only for products in more than 25 collections.
+    A small page keeps the requested cost (which the throttle reserves) near
+    30 points instead of ~250.
+    """
+    gid = f"gid://shopify/Product/{product_id}"
+    tags = None
+    titles: list[str] = []
+    handles: list[str] = []
+    cursor = None
+
+    while True:
+        data = shopify_graphql(PRODUCT_ENRICHMENT_QUERY, {"id": gid, "cursor": cursor})
+        product = data.get("product")
+        if not product:
+            # Deleted/unknown product: nothing to enrich, and retrying won't help
+            return {}
+
+        if cursor is None:
+            tags = [t.strip() for t in product.get("tags") or [] if t and t.strip()] or None
+
+        collections = product.get("collections") or {}
+        for coll in collections.get("nodes") or []:
+            if coll.get("title"):
+                titles.append(coll["title"])
+            if coll.get("handle"):
+                handles.append(coll["handle"])
+
+        page_info = collections.get("pageInfo") or {}
+        if not page_info.get("hasNextPage"):
+            break
+        cursor = page_info.get("endCursor")
+
+    return _build_enrichment(tags, titles, handles)
+
+def _fetch_shopify_enrichment_rest(product_id: int) -> Dict[str, Any]:
+    base = f"{SHOPIFY_BASE_URL}/admin/api/{SHOPIFY_API_VERSION}"
+    session = get_client(base)
+    headers = {"X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN}
+
+    pr = session.get(f"{base}/products/{product_id}.json", headers=headers, timeout=12)
+    pr.raise_for_status()
+    product = pr.json().get("product", {})
+    tags = _normalize_tags(product.get("tags"))
+
+    cr = session.get(f"{base}/collects.json",
+                     params={"product_id": product_id, "limit": 250},
+                     headers=headers,
+                     timeout=12)
+    cr.raise_for_status()
+    coll_ids = [c["collection_id"] for c in cr.json().get("collects", [])]
+
+    titles: list[str] = []
+    handles: list[str] = []
+    for cid in coll_ids:
+        r = session.get(f"{base}/collections/{cid}.json", headers=headers, timeout=10)
+        if r.status_code == 200:
+            coll = r.json().get("collection", {}) or {}
+            title = coll.get("title")
+            handle = coll.get("handle")
+            if title:
+                titles.append(title)
+            if handle:
+                handles.append(handle)
+
+    return _build_enrichment(tags, titles, handles)
+
+@traced
+def _enrich_from_shopify(product_id: int):
+    """
+    Best-effort fetch of tags + collections (titles + handles).
+    Returns a dict suitable to merge into the insert payload.
+    """
     try:
-        pr = session.get(f"{base}/products/{product_id}.json", timeout=12)
-        pr.raise_for_status()
-        product = pr.json().get("product", {})
-        tags = _normalize_tags(product.get("tags"))
-
-        cr = session.get(f"{base}/collects.json",
-                         params={"product_id": product_id, "limit": 250},
-                         timeout=12)
-        cr.raise_for_status()
-        coll_ids = [c["collection_id"] for c in cr.json().get("collects", [])]
-
-        titles: list[str] = []
-        handles: list[str] = []
-        for cid in coll_ids:
-            r = session.get(f"{base}/collections/{cid}.json", timeout=10)
-            if r.status_code == 200:
-                coll = r.json().get("collection", {}) or {}
-                title = coll.get("title")
-                handle = coll.get("handle")
-                if title:
-                    titles.append(title)
-                if handle:
-                    handles.append(handle)
-
-        out = {}
-        if tags is not None:
-            out["product_tags"] = tags
-        if titles:
-            out["shopify_collections"] = titles
-        if handles:
-            out["shopify_collection_handles"] = handles
-        return out
-
+        return _fetch_shopify_enrichment(product_id)
     except Exception as e:
-        print("Enrichment failed (non-fatal):", e)
+        logger.warning("enrichment_failed", extra={"product_id": product_id, "error": str(e)})
         return {}
 
-def insert_interest(email: str, product_id: int, product_title: str, isbn: str = None, customer_name: str = None):
+@traced
+def insert_interest(email: str, product_id: int, product_title: str, isbn: str = None, customer_name: str = None, enrichment_mode: str | None = None):
     cr_id = f"CR{uuid.uuid4().hex[:8].upper()}"
 
     if not customer_name or not customer_name.strip():
@@ -93,17 +245,104 @@ def insert_interest(email: str, product_id: int, product_title: str, isbn: str =
         "customer_name": customer_name
     }
 
-    enrich = _enrich_from_shopify(product_id)
-    if enrich:
-        payload.update(enrich)
+    mode = (enrichment_mode or ENRICHMENT_MODE).strip().lower()
+    if mode == "deferred":
+        # Caller schedules `enrich_interest_row` once the row id is known
+        payload["enrichment_status"] = "pending"
+        payload["enrichment_attempts"] = 0
+    else:
+        enrich = _enrich_from_shopify(product_id)
+        if enrich:
+            payload.update(enrich)
 
     response = supabase.table("product_interest_requests").insert(payload).execute()
 
     if not response.data:
         raise Exception("Insert failed or returned no data.")
-    
+
+    invalidate_interest_caches()
     return response.data
 
+@traced
+def enrich_interest_attempt(row_id: str, product_id: int, attempt: int, last: bool) -> Dict[str, Any]:
+    """
+    One deferred-enrichment attempt; `attempt` counts every earlier one,
+    including previous sweeps. Success writes the enrichment columns +
+    `enrichment_status = 'complete'`. A failure is only written (as
+    `'failed'` with the error) when `last`; until then the row stays
+    `pending` so the caller can try again.
+    """
+    try:
+        enrich = _fetch_shopify_enrichment(product_id)
+        update = {
+            **enrich,
+            "enrichment_status": "complete",
+            "enrichment_attempts": attempt,
+            "enrichment_error": None,
+            "enriched_at": datetime.now(timezone.utc).isoformat(),
+        }
+        supabase.table("product_interest_requests") \
+            .update(update) \
+            .eq("id", row_id) \
+            .execute()
+        # Tags/collections feed the OP/not-OP counts
+        invalidate_interest_caches()
+        return {"id": row_id, "status": "complete", "attempts": attempt}
+    except Exception as e:
+        error = str(e)
+        logger.warning("enrichment_attempt_failed", extra={"row_id": row_id, "attempt": attempt, "error": error})
+        if not last:
+            return {"id": row_id, "status": "retry", "attempts": attempt, "error": error}
+
+    supabase.table("product_interest_requests") \
+        .update({
+            "enrichment_status": "failed",
+            "enrichment_attempts": attempt,
+            "enrichment_error": error,
+        }) \
+        .eq("id", row_id) \
+        .execute()
+    return {"id": row_id, "status": "failed", "attempts": attempt, "error": error}
+
+async def enrich_interest_row(row_id: str, product_id: int, prior_attempts: int = 0) -> Dict[str, Any]:
+    """
+    Background task for deferred enrichment: up to ENRICHMENT_MAX_ATTEMPTS
+    attempts in total (counting `prior_attempts`), with exponential backoff
+    between them. Each attempt takes an I/O pool thread only while it runs;
+    the waits happen on the event loop, so a Shopify outage can't tie up the
+    pool that API reads share.
+    """
+    result = {"id": row_id, "status": "failed", "attempts": prior_attempts}
+    for attempt in range(prior_attempts + 1, ENRICHMENT_MAX_ATTEMPTS + 1):
+        if attempt > prior_attempts + 1:
+            await asyncio.sleep(ENRICHMENT_RETRY_BASE_SECONDS * (2 ** (attempt - prior_attempts - 2)))
+        result = await run_blocking(
+            enrich_interest_attempt, row_id, product_id, attempt, attempt == ENRICHMENT_MAX_ATTEMPTS,
+        )
+        if result["status"] != "retry":
+            break
+    return result
+
+@traced
+def pending_enrichment_rows(limit: int = 50, include_failed: bool = True, min_age_seconds: int = 60) -> list[Dict[str, Any]]:
+    """
+    Rows left `pending` (e.g. the worker died with the process) or `failed`
+    that still have attempts left (fewer than ENRICHMENT_MAX_ATTEMPTS), for
+    the retry sweep. Rows younger than `min_age_seconds` are skipped so an
+    in-flight background task is not raced.
+    """
+    states = ["pending", "failed"] if include_failed else ["pending"]
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=min_age_seconds)).isoformat()
+
+    return supabase.table("product_interest_requests") \
+        .select("id, product_id, enrichment_attempts") \
+        .in_("enrichment_status", states) \
+        .lt("enrichment_attempts", ENRICHMENT_MAX_ATTEMPTS) \
+        .lt("created_at", cutoff) \
+        .order("created_at") \
+        .limit(limit) \
+        .execute().data or []
+
 def fetch_all_interest():
     response = supabase.table("product_interest_requests") \
         .select("id, product_id, product_title, email, customer_name, isbn, cr_id, status, cr_seq, created_at") \
@@ -112,15 +351,8 @@ def fetch_all_interest():
         return []
     return response.data
 
+@traced
 def update_status(request_id: str, new_status: str, changed_by: str = "system", source: str = "api", optimistic: bool = False):
-    print("📤 Calling RPC update_status_with_log with params:", {
-        "req_id": request_id,
-        "new_stat": new_status,
-        "actor": changed_by,
-        "src": source,
-        "is_optimistic": optimistic
-    })
-
     resp = supabase.rpc(
         "update_status_with_log",
         {
@@ -132,14 +364,54 @@ def update_status(request_id: str, new_status: str, changed_by: str = "system",
         }
     ).execute()
 
-    print("📥 Raw Supabase RPC response:", resp)
-
     if getattr(resp, "error", None):
-        print("❌ Supabase RPC error:", resp.error)
+        logger.error("status_update_rpc_error", extra={"request_id": request_id, "error": str(resp.error)})
         raise Exception(f"Status update failed: {resp.error}")
-    
+
+    invalidate_interest_caches()
     return {"success": True}
 
+@traced
+def update_status_bulk(request_ids: list[str], new_status: str, changed_by: str = "system", source: str = "api") -> list[Dict[str, Any]]:
+    """
+    Move many requests to `new_status` with one `update_status_bulk_with_log`
+    RPC: every row update and status-log entry lands in a single transaction.
+    Returns one `{"id", "outcome", "previous_status"}` per requested id.
+    """
+    valid: list[str] = []
+    outcomes: list[Dict[str, Any]] = []
+    for rid in dict.fromkeys(request_ids):
+        try:
+            valid.append(str(uuid.UUID(str(rid))))
+        except ValueError:
+            outcomes.append({"id": rid, "outcome": "invalid_id", "previous_status": None})
+
+    if valid:
+        resp = supabase.rpc(
+            "update_status_bulk_with_log",
+            {
+                "req_ids": valid,
+                "new_stat": new_status,
+                "actor": changed_by,
+                "src": source,
+            }
+        ).execute()
+
+        if getattr(resp, "error", None):
+            raise Exception(f"Bulk status update failed: {resp.error}")
+
+        outcomes.extend(resp.data or [])
+        invalidate_interest_caches()
+
+    return outcomes
+
+@traced
+def archive_mark(ids: list[str], reason: str | None = None):
+    """Archive rows via the `archive_mark` RPC; returns the raw RPC data."""
+    resp = supabase.rpc("archive_mark", {"ids": ids, "reason": reason}).execute()
+    invalidate_interest_caches()
+    return getattr(resp, "data", None)
+
 
 # --- NEW SIGNED COPY HELPERS (APPENDED ONLY) ---
 
@@ -147,26 +419,17 @@ def shopify_graphql(query: str, variables: dict | None = None) -> dict:
     if not SHOP_URL or not SHOPIFY_ACCESS_TOKEN:
         raise Exception("Missing Shopify credentials")
 
-    url = f"https://{SHOP_URL}/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
-    headers = {
-        "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN,
-        "Content-Type": "application/json",
-    }
+    url = f"{SHOPIFY_BASE_URL}/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
 
-    r = requests.post(
-        url,
-        headers=headers,
-        json={"query": query, "variables": variables or {}},
-        timeout=20,
-    )
-    r.raise_for_status()
-    data = r.json()
+    # Waits on the shared cost budget and retries THROTTLED responses
+    data = throttled_graphql(url, SHOPIFY_ACCESS_TOKEN, query, variables)
 
     if data.get("errors"):
         raise Exception(f"Shopify GraphQL errors: {data['errors']}")
 
     return data["data"]
 
+@traced
 def record_signed_copy_response(row: Dict[str, Any]) -> Dict[str, Any]:
     existing = supabase.table("signed_copy_responses") \
         .select("*") \
@@ -207,6 +470,7 @@ def record_signed_copy_response(row: Dict[str, Any]) -> Dict[str, Any]:
 
         raise
 
+@traced
 def enrich_signed_copy_response(saved_row: Dict[str, Any]) -> Dict[str, Any]:
     email = saved_row["email"]
     product_id = saved_row["product_id"]
@@ -0,0 +1,219 @@
+"""
+Lightweight upstream spans and a Shopify API cost ledger.
+
+Every outbound call made through an instrumented httpx client (the
+Supabase PostgREST session and the pooled Shopify/Mailtrap clients in
+`http_client`) is timed and recorded as a span of one kind:
+`supabase`, `shopify_graphql`, `shopify_rest`, `mailtrap` or `http`.
+
+Spans are tagged with the innermost function wrapped in `@traced` (or
+`with feature("...")`), e.g. `_enrich_from_shopify`. Inside an API request,
+`ServerTimingMiddleware` collects that request's spans and, for requests
+carrying the admin token (or every request with SERVER_TIMING_PUBLIC=true),
+returns them as a `Server-Timing` header, for example:
+
+    Server-Timing: supabase.insert_interest;dur=41.2;desc="2 calls", app;dur=310.5
+
+The ledger keeps process-lifetime totals per feature: GraphQL calls and
+requested/actual query cost, REST call counts, and time per span kind.
+"""
+
+import functools
+import hmac
+import inspect
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Union
+from urllib.parse import parse_qs
+
+import httpx
+
+log = logging.getLogger(__name__)
+
+# Span names and timings describe internals: by default only admin-token requests get them
+SERVER_TIMING_PUBLIC = os.getenv("SERVER_TIMING_PUBLIC", "false").strip().lower() == "true"
+
+UNATTRIBUTED = "unattributed"
+
+_feature: ContextVar[str] = ContextVar("upstream_feature", default=UNATTRIBUTED)
+# Spans of the current API request; None outside a request (CLIs, startup)
+_request_spans: ContextVar[Optional[list]] = ContextVar("upstream_request_spans", default=None)
+
+_lock = threading.Lock()
+_ledger: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+_listeners: list[Callable[[str, str, float], None]] = []
+
+
+# --- Feature tagging ---
+
+def current_feature() -> str:
+    return _feature.get()
+
+
+@contextmanager
+def feature(name: str):
+    token = _feature.set(name)
+    try:
+        yield
+    finally:
+        _feature.reset(token)
+
+
+def traced(fn):
+    """Tag every upstream call made (directly or indirectly) by `fn` with its name."""
+    name = fn.__name__
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            with feature(name):
+                return await fn(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with feature(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+# --- Spans ---
+
+def add_listener(listener: Callable[[str, str, float], None]):
+    """Call `listener(kind, feature, seconds)` for every finished span (e.g. to feed metrics)."""
+    _listeners.append(listener)
+
+
+def record_span(kind: str, seconds: float, status: Optional[int] = None):
+    name = _feature.get()
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((kind, name, seconds))
+
+    with _lock:
+        entry = _ledger[name]
+        entry[f"{kind}_calls"] += 1
+        entry[f"{kind}_seconds"] += seconds
+
+    for listener in _listeners:
+        listener(kind, name, seconds)
+    log.debug("upstream_span", extra={"kind": kind, "feature": name, "ms": round(seconds * 1000, 1), "status": status})
+
+
+def record_graphql_cost(extensions: Optional[Dict[str, Any]], throttled: bool = False):
+    """Add one GraphQL response's `extensions.cost` to the current feature's ledger."""
+    cost = (extensions or {}).get("cost") or {}
+    with _lock:
+        entry = _ledger[_feature.get()]
+        entry["graphql_requested_cost"] += float(cost.get("requestedQueryCost") or 0)
+        entry["graphql_actual_cost"] += float(cost.get("actualQueryCost") or 0)
+        if throttled:
+            entry["graphql_throttled"] += 1
+
+
+def instrument(client: Union[httpx.Client, httpx.AsyncClient], kind: Union[str, Callable[[httpx.Request], str]]):
+    """
+    Time every request made through `client` with httpx event hooks. The span
+    ends when response headers arrive, which is when the upstream has done
+    its work; body download is left to the caller.
+    """
+    kind_of = kind if callable(kind) else (lambda _request: kind)
+
+    def on_request(request: httpx.Request):
+        request.extensions["span_start"] = time.perf_counter()
+
+    def on_response(response: httpx.Response):
+        start = response.request.extensions.get("span_start")
+        if start is not None:
+            record_span(kind_of(response.request), time.perf_counter() - start, response.status_code)
+
+    if isinstance(client, httpx.AsyncClient):
+        async def async_on_request(request):
+            on_request(request)
+
+        async def async_on_response(response):
+            on_response(response)
+
+        hooks = {"request": [async_on_request], "response": [async_on_response]}
+    else:
+        hooks = {"request": [on_request], "response": [on_response]}
+
+    existing = client.event_hooks
+    client.event_hooks = {
+        "request": list(existing.get("request", [])) + hooks["request"],
+        "response": list(existing.get("response", [])) + hooks["response"],
+    }
+    return client
+
+
+# --- Reporting ---
+
+def server_timing(spans: list, total_seconds: float) -> str:
+    grouped: Dict[tuple, list] = {}
+    for kind, name, seconds in spans:
+        bucket = grouped.setdefault((kind, name), [0.0, 0])
+        bucket[0] += seconds
+        bucket[1] += 1
+
+    parts = [
+        f'{kind}.{name};dur={seconds * 1000:.1f};desc="{count} call{"s" if count != 1 else ""}"'
+        for (kind, name), (seconds, count) in grouped.items()
+    ]
+    parts.append(f"app;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def ledger_snapshot() -> Dict[str, Dict[str, float]]:
+    with _lock:
+        return {
+            name: {
+                k: int(v) if k.endswith(("_calls", "_throttled")) else round(v, 4)
+                for k, v in sorted(entry.items())
+            }
+            for name, entry in sorted(_ledger.items())
+        }
+
+
+def _has_admin_token(scope) -> bool:
+    admin_token = os.getenv("VITE_ADMIN_TOKEN")
+    if not admin_token:
+        return False
+    tokens = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("token", [])
+    return any(hmac.compare_digest(t, admin_token) for t in tokens)
+
+
+class ServerTimingMiddleware:
+    """
+    Collect the upstream spans of each request into a `Server-Timing` header.
+    Only requests with the admin `token` get it, unless SERVER_TIMING_PUBLIC.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (SERVER_TIMING_PUBLIC or _has_admin_token(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        spans: list = []
+        token = _request_spans.set(spans)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                header = server_timing(spans, time.perf_counter() - start)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_spans.reset(token)
@@ -0,0 +1,427 @@
+"""
+Offline HTTP load benchmark for the FastAPI app.
+
+Starts the PostgREST and Shopify stand-ins (`bench.fake_postgrest`,
+`bench.fake_shopify`), starts `backend/app/main.py` under uvicorn pointed at
+them, drives a weighted mix of requests from concurrent clients and reports
+RPS and p50/p95/p99 latency per endpoint.
+
+Run from the repo root:
+
+    python -m bench.api_load --duration 30 --concurrency 32
+    python -m bench.api_load --out before.json
+    python -m bench.api_load --baseline before.json --app-env IO_THREAD_POOL_SIZE=64
+
+Nothing leaves the machine: the app gets SUPABASE_URL / SHOPIFY_BASE_URL for
+the stand-ins and dummy credentials.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+from bench import fixtures
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = REPO_ROOT / "backend"
+
+ADMIN_TOKEN = "bench-admin-token"
+TOKEN_SECRET = "bench-signed-copy-token-secret-0123456789"
+
+# Relative weights per scenario
+MIXES = {
+    "default": {
+        "create_interest": 15,
+        "list_default": 20,
+        "list_filtered": 15,
+        "list_search": 15,
+        "list_sorted": 10,
+        "list_cursor": 5,
+        "update_status": 12,
+        "signed_copy_respond": 8,
+    },
+    "read_heavy": {
+        "create_interest": 5,
+        "list_default": 30,
+        "list_filtered": 20,
+        "list_search": 20,
+        "list_sorted": 15,
+        "list_cursor": 5,
+        "update_status": 3,
+        "signed_copy_respond": 2,
+    },
+    "write_heavy": {
+        "create_interest": 40,
+        "list_default": 10,
+        "list_filtered": 5,
+        "list_search": 5,
+        "list_sorted": 5,
+        "update_status": 20,
+        "signed_copy_respond": 15,
+    },
+}
+
+
+# --- Scenarios: each returns (label, method, path, params, json_body, on_response) ---
+
+class Context:
+    def __init__(self, seed_rows: int, products: int, seed: int):
+        self.seed_rows = seed_rows
+        self.products = products
+        self.terms = fixtures.search_terms(200, seed)
+        self.cursors: list[str] = []
+        self.counter = 0
+
+    def next_index(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+def create_interest(ctx: Context, rng: random.Random):
+    pid = fixtures.product_id(rng.randrange(ctx.products))
+    who = fixtures.person(rng.randrange(10**6))
+    body = {
+        "email": who["email"],
+        "product_id": pid,
+        "product_title": fixtures.product_title(pid),
+        "customer_name": who["name"],
+        "isbn": f"978{rng.randrange(10**9, 10**10)}",
+    }
+    return "POST /api/interest", "POST", "/api/interest", {}, body, None
+
+
+def _list(label: str, params: dict, on_response=None):
+    return f"GET /api/interest [{label}]", "GET", "/api/interest", {"token": ADMIN_TOKEN, **params}, None, on_response
+
+
+def list_default(ctx, rng):
+    return _list("default", {"page": rng.choice([1, 1, 1, 2, 3]), "limit": 100})
+
+
+def list_filtered(ctx, rng):
+    params = rng.choice([
+        {"statuses": "New"},
+        {"statuses": "New,In Progress"},
+        {"collection_filter": "OP"},
+        {"collection_filter": "Not OP", "statuses": "Request Filed"},
+        {"archived": "only"},
+    ])
+    return _list("filtered", {**params, "limit": 100})
+
+
+def list_search(ctx, rng):
+    kind = rng.random()
+    if kind < 0.6:
+        term = rng.choice(ctx.terms)
+    elif kind < 0.8:
+        term = fixtures.person(rng.randrange(ctx.seed_rows))["email"]
+    else:
+        term = f"CR{uuid.UUID(fixtures.interest_id(rng.randrange(ctx.seed_rows))).hex[:8].upper()}"
+    params = {"search": term, "limit": 50}
+    if rng.random() < 0.3 and kind < 0.6:
+        params["sort_field"] = "relevance"
+    return _list("search", params)
+
+
+def list_sorted(ctx, rng):
+    field = rng.choice(["product_title", "email", "customer_name", "status", "cr_id"])
+    return _list("sorted", {"sort_field": field, "sort_order": rng.choice(["asc", "desc"]), "limit": 100})
+
+
+def list_cursor(ctx, rng):
+    params = {"pagination": "cursor", "limit": 100}
+    if ctx.cursors and rng.random() < 0.7:
+        params["cursor"] = ctx.cursors.pop()
+
+    def on_response(resp: httpx.Response):
+        if resp.status_code == 200:
+            nxt = resp.json().get("next_cursor")
+            if nxt and len(ctx.cursors) < 100:
+                ctx.cursors.append(nxt)
+
+    return _list("cursor", params, on_response)
+
+
+def update_status(ctx, rng):
+    body = {
+        "request_id": fixtures.interest_id(rng.randrange(ctx.seed_rows)),
+        "new_status": rng.choice(fixtures.STATUSES),
+        "changed_by": "bench",
+    }
+    return "POST /api/update_status", "POST", "/api/update_status", {"token": ADMIN_TOKEN}, body, None
+
+
+def signed_copy_respond(ctx, rng):
+    # Imported late: token_utils reads the secret at import time
+    from utils.token_utils import generate_signed_copy_token
+
+    i = ctx.next_index()
+    who = fixtures.person(i)
+    pid = fixtures.product_id(rng.randrange(ctx.products))
+    token = generate_signed_copy_token({
+        "email": who["email"],
+        "first_name": who["first_name"],
+        "product_id": pid,
+        "product_title": fixtures.product_title(pid),
+        "order_id": 5_000_000_000 + i,
+        "order_name": f"#{200000 + i}",
+        "line_item_id": 9_000_000_000 + i,
+        "customer_id": 6_000_000_000 + i,
+    })
+    body = {"token": token, "response": rng.choice(["keep", "cancel", "unsigned"])}
+    return "POST /api/signed-copy/respond", "POST", "/api/signed-copy/respond", {}, body, None
+
+
+SCENARIOS = {
+    "create_interest": create_interest,
+    "list_default": list_default,
+    "list_filtered": list_filtered,
+    "list_search": list_search,
+    "list_sorted": list_sorted,
+    "list_cursor": list_cursor,
+    "update_status": update_status,
+    "signed_copy_respond": signed_copy_respond,
+}
+
+
+# --- Processes ---
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start(args: list[str], cwd: Path, env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=cwd, env=env)
+
+
+def wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {proc.returncode} before becoming ready")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def stop(procs: list[subprocess.Popen]):
+    for proc in procs:
+        if proc.poll() is None:
+            proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+# --- Load ---
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def drive(base_url: str, mix: dict, ctx: Context, concurrency: int, duration: float, warmup: float, seed: int) -> dict:
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        start = time.perf_counter()
+        measure_from = start + warmup
+        stop_at = measure_from + duration
+
+        async def worker(worker_id: int):
+            rng = random.Random(seed * 1000 + worker_id)
+            while True:
+                now = time.perf_counter()
+                if now >= stop_at:
+                    return
+                scenario = SCENARIOS[rng.choices(names, weights=weights)[0]]
+                label, method, path, params, body, on_response = scenario(ctx, rng)
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.request(method, path, params=params, json=body)
+                    status = str(resp.status_code)
+                except httpx.HTTPError as e:
+                    resp, status = None, type(e).__name__
+                elapsed = time.perf_counter() - t0
+
+                if t0 >= measure_from:
+                    latencies[label].append(elapsed)
+                    if resp is None or resp.status_code >= 400:
+                        errors[label][status] += 1
+                if resp is not None and on_response:
+                    on_response(resp)
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+    results = {}
+    for label in sorted(latencies):
+        values = sorted(latencies[label])
+        results[label] = {
+            "requests": len(values),
+            "errors": dict(errors[label]),
+            "rps": round(len(values) / duration, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2),
+        }
+    total = sum(r["requests"] for r in results.values())
+    results["ALL"] = {
+        "requests": total,
+        "errors": {},
+        "rps": round(total / duration, 2),
+        **{
+            key: round(percentile(sorted(v for vals in latencies.values() for v in vals), pct) * 1000, 2)
+            for key, pct in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99))
+        },
+        "mean_ms": round(sum(v for vals in latencies.values() for v in vals) / total * 1000, 2) if total else 0.0,
+    }
+    return results
+
+
+# --- Reporting ---
+
+def _delta(now: float, before: float | None) -> str:
+    if not before:
+        return ""
+    return f" ({(now - before) / before * 100:+.0f}%)"
+
+
+def print_report(results: dict, baseline: dict | None):
+    base = (baseline or {}).get("endpoints", {})
+    header = f"{'endpoint':<42} {'reqs':>7} {'err':>5} {'rps':>14} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}"
+    print(header)
+    print("-" * len(header))
+    for label, r in results.items():
+        b = base.get(label, {})
+        errs = sum(r["errors"].values())
+        print(
+            f"{label:<42} {r['requests']:>7} {errs:>5} "
+            f"{str(r['rps']) + _delta(r['rps'], b.get('rps')):>14} "
+            f"{str(r['p50_ms']) + _delta(r['p50_ms'], b.get('p50_ms')):>16} "
+            f"{str(r['p95_ms']) + _delta(r['p95_ms'], b.get('p95_ms')):>16} "
+            f"{str(r['p99_ms']) + _delta(r['p99_ms'], b.get('p99_ms')):>16}"
+        )
+    for label, r in results.items():
+        if r["errors"]:
+            print(f"  {label}: errors by status {r['errors']}")
+
+
+def run(args):
+    env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+    pg_port, shop_port, app_port = free_port(), free_port(), free_port()
+    procs = []
+    try:
+        procs.append(start([
+            "-m", "bench.fake_postgrest", "--port", str(pg_port),
+            "--seed-rows", str(args.seed_rows), "--products", str(args.products),
+            "--latency-ms", str(args.supabase_latency_ms), "--workers", str(args.supabase_workers),
+        ], REPO_ROOT, env))
+        procs.append(start([
+            "-m", "bench.fake_shopify", "--port", str(shop_port),
+            "--latency-ms", str(args.shopify_latency_ms), "--jitter-ms", str(args.shopify_jitter_ms),
+        ], REPO_ROOT, env))
+        wait_ready(f"http://127.0.0.1:{pg_port}/health", procs[0])
+        wait_ready(f"http://127.0.0.1:{shop_port}/health", procs[1])
+
+        app_env = {
+            **env,
+            "SUPABASE_URL": f"http://127.0.0.1:{pg_port}",
+            "SUPABASE_KEY": "bench.bench.bench",
+            "SHOP_URL": "bench-shop.myshopify.com",
+            "SHOPIFY_BASE_URL": f"http://127.0.0.1:{shop_port}",
+            "SHOPIFY_ACCESS_TOKEN": "bench",
+            "VITE_ADMIN_TOKEN": ADMIN_TOKEN,
+            "SIGNED_COPY_TOKEN_SECRET": TOKEN_SECRET,
+            "SIGNED_COPY_CAMPAIGN_ACTIVE": "true",
+            "ENRICHMENT_MODE": args.enrichment_mode,
+            "LOG_LEVEL": "WARNING",
+        }
+        for item in args.app_env:
+            key, _, value = item.partition("=")
+            app_env[key] = value
+
+        procs.append(start([
+            "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(app_port),
+            "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+        ], BACKEND_DIR, app_env))
+        wait_ready(f"http://127.0.0.1:{app_port}/metrics?token={ADMIN_TOKEN}", procs[2])
+
+        os.environ["SIGNED_COPY_TOKEN_SECRET"] = TOKEN_SECRET
+        sys.path.insert(0, str(REPO_ROOT))
+
+        mix = MIXES[args.mix]
+        ctx = Context(args.seed_rows, args.products, args.seed)
+        print(
+            f"Running mix={args.mix} concurrency={args.concurrency} duration={args.duration}s "
+            f"warmup={args.warmup}s workers={args.workers} supabase={args.supabase_latency_ms}ms "
+            f"shopify={args.shopify_latency_ms}±{args.shopify_jitter_ms}ms"
+        )
+        results = asyncio.run(drive(
+            f"http://127.0.0.1:{app_port}", mix, ctx, args.concurrency, args.duration, args.warmup, args.seed,
+        ))
+        shopify_stats = httpx.get(f"http://127.0.0.1:{shop_port}/health").json()
+    finally:
+        stop(procs)
+
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    print()
+    print_report(results, baseline)
+    print(f"\nShopify stand-in: {shopify_stats}")
+
+    if args.out:
+        report = {
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+            "endpoints": results,
+            "shopify": shopify_stats,
+        }
+        Path(args.out).write_text(json.dumps(report, indent=2))
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for the app")
+    parser.add_argument("--seed-rows", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--supabase-latency-ms", type=float, default=5.0)
+    parser.add_argument("--supabase-workers", type=int, default=4, help="PostgREST stand-in processes")
+    parser.add_argument("--shopify-latency-ms", type=float, default=80.0)
+    parser.add_argument("--shopify-jitter-ms", type=float, default=40.0)
+    parser.add_argument("--enrichment-mode", choices=["sync", "deferred"], default="sync")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE", help="extra env for the app (repeatable)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON from a previous --out to compare against")
+    run(parser.parse_args())
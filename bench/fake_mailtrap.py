@@ -0,0 +1,125 @@
+"""
+Mailtrap Sending API stand-in for the pipeline benchmark.
+
+Accepts `POST /api/send` with a per-call latency, fails a share of calls
+with a 500 (`--error-rate`) and, with `--rate-limit`, answers 429 once more
+than that many calls arrive in a second. `POST /api/batch` takes the same
+latency once per call and rejects each message in it at `--error-rate`,
+reporting per-message results the way the Batch Sending API does.
+`/health` reports the counts.
+
+    python -m bench.fake_mailtrap --port 9103 --latency-ms 120 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class Stats:
+    def __init__(self):
+        self.calls = 0
+        self.messages = 0
+        self.sent = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.recipients: set[str] = set()
+        self.duplicates = 0
+
+
+def create_app(latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, rate_limit: int = 0, seed: int = 0) -> Starlette:
+    stats = Stats()
+    rng = random.Random(seed)
+    window = {"second": 0, "count": 0}
+
+    async def admit():
+        """Per-call latency and rate limit; returns a 429 response when over the limit."""
+        stats.calls += 1
+        delay = latency_ms + (rng.uniform(0, jitter_ms) if jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+
+        if rate_limit:
+            second = int(time.monotonic())
+            if window["second"] != second:
+                window["second"], window["count"] = second, 0
+            window["count"] += 1
+            if window["count"] > rate_limit:
+                stats.rate_limited += 1
+                return JSONResponse({"success": False, "errors": ["Too many requests"]}, status_code=429)
+        return None
+
+    def deliver(message: dict):
+        for to in message.get("to") or []:
+            email = (to.get("email") or "").lower()
+            if email in stats.recipients:
+                stats.duplicates += 1
+            stats.recipients.add(email)
+        stats.messages += 1
+        stats.sent += 1
+        return f"bench-{stats.messages}"
+
+    async def send(request: Request):
+        if (limited := await admit()) is not None:
+            return limited
+
+        if error_rate and rng.random() < error_rate:
+            stats.errors += 1
+            return JSONResponse({"success": False, "errors": ["Internal error"]}, status_code=500)
+
+        body = json.loads(await request.body() or b"{}")
+        return JSONResponse({"success": True, "message_ids": [deliver(body)]})
+
+    async def batch(request: Request):
+        if (limited := await admit()) is not None:
+            return limited
+
+        body = json.loads(await request.body() or b"{}")
+        responses = []
+        for message in body.get("requests") or []:
+            if error_rate and rng.random() < error_rate:
+                stats.errors += 1
+                responses.append({"success": False, "errors": ["Internal error"]})
+            else:
+                responses.append({"success": True, "message_ids": [deliver(message)]})
+        return JSONResponse({"success": True, "responses": responses})
+
+    async def health(_request: Request):
+        return JSONResponse({
+            "calls": stats.calls,
+            "messages": stats.messages,
+            "sent": stats.sent,
+            "errors": stats.errors,
+            "rate_limited": stats.rate_limited,
+            "duplicates": stats.duplicates,
+        })
+
+    return Starlette(routes=[
+        Route("/api/send", send, methods=["POST"]),
+        Route("/api/batch", batch, methods=["POST"]),
+        Route("/health", health),
+    ])
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9103)
+    parser.add_argument("--latency-ms", type=float, default=120.0)
+    parser.add_argument("--jitter-ms", type=float, default=60.0)
+    parser.add_argument("--error-rate", type=float, default=0.02, help="share of sends answered with a 500 (batch: messages rejected)")
+    parser.add_argument("--rate-limit", type=int, default=0, help="sends per second before answering 429 (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,584 @@
+"""
+In-memory PostgREST stand-in for the benchmarks.
+
+Implements the subset of the PostgREST API that supabase-py sends for this
+app: `select`, column filters (`eq`, `neq`, `gt`, `gte`, `lt`, `lte`,
+`like`, `ilike`, `is`, `in`, `cs`, `ov`, `wfts`/`fts`, with `not.`),
+`or=(...)` / `and(...)` logic trees, `order` (with nulls first/last),
+`offset`/`limit`, `Prefer: count=...`, insert/upsert/update/delete, and the
+RPCs from supabase/schema.sql. Every response can be delayed by a fixed
+latency to stand in for the network round trip to Supabase.
+
+    python -m bench.fake_postgrest --port 9101 --seed-rows 5000 --latency-ms 5 --workers 4
+
+Filtering is a scan in Python, so `--workers` runs several processes to
+keep the stand-in from being the bottleneck. Each worker seeds an identical
+store, so a row inserted through one worker isn't visible through another;
+fine for throughput numbers, not for correctness checks.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from bench import fixtures
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+OP_HANDLES = {"out-of-print-offers", "out-of-print-offers-1"}
+OP_TITLES = {"Out-of-Print Offers", "Past Out-of-Print Offers"}
+OP_TAGS = {"op", "pastop"}
+SEARCH_COLUMNS = ("product_title", "email", "customer_name", "cr_id", "isbn")
+
+TABLE_KEYS = {
+    "product_interest_requests": "id",
+    "signed_copy_responses": "id",
+    "blacklisted_barcodes": "barcode",
+    "catalog_products": "product_id",
+    "catalog_sync_state": "id",
+    "signed_copy_campaign_recipients": "campaign_key,line_item_id",
+    "signed_copy_campaigns": "campaign_key",
+    "email_log": "id",
+    "signed_copy_ingest_state": "key",
+}
+
+
+class PostgrestError(Exception):
+    def __init__(self, message: str, status: int = 400, code: str = "PGRST100"):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+# --- Store ---
+
+class Store:
+    def __init__(self):
+        self.tables: Dict[str, List[dict]] = {name: [] for name in TABLE_KEYS}
+        self.status_log: List[dict] = []
+        self.requests = 0
+        self._cr_seq = 0
+
+    def seed_campaigns(self, count: int):
+        self.tables["signed_copy_campaigns"] = fixtures.campaigns(count)
+
+    def seed(self, rows: int, products: int):
+        now = datetime.now(timezone.utc)
+        table = self.tables["product_interest_requests"]
+        for i in range(rows):
+            table.append(with_generated(fixtures.interest_row(i, products, now)))
+        self._cr_seq = rows
+
+    def next_cr_seq(self) -> int:
+        self._cr_seq += 1
+        return self._cr_seq
+
+
+def is_out_of_print(row: dict) -> bool:
+    return bool(
+        OP_HANDLES & set(row.get("shopify_collection_handles") or [])
+        or OP_TITLES & set(row.get("shopify_collections") or [])
+        or OP_TAGS & set(row.get("product_tags") or [])
+        or (row.get("product_title") or "").lower().startswith("op:")
+    )
+
+
+def with_generated(row: dict) -> dict:
+    row["is_out_of_print"] = is_out_of_print(row)
+    return row
+
+
+def interest_defaults(store: Store, row: dict) -> dict:
+    seq = store.next_cr_seq()
+    base = {
+        "id": str(uuid.uuid4()),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "cr_seq": seq,
+        "status": "New",
+        "archived": False,
+        "archived_at": None,
+        "customer_name": None,
+        "isbn": None,
+        "product_tags": None,
+        "shopify_collections": None,
+        "shopify_collection_handles": None,
+        "enrichment_status": None,
+        "enrichment_attempts": 0,
+    }
+    base.update(row)
+    return with_generated(base)
+
+
+DEFAULTS: Dict[str, Callable[[Store, dict], dict]] = {
+    "product_interest_requests": interest_defaults,
+    "signed_copy_responses": lambda store, row: {
+        "id": str(uuid.uuid4()),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **row,
+    },
+    "signed_copy_campaign_recipients": lambda store, row: {
+        "id": str(uuid.uuid4()),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "email_sent": False,
+        "email_sent_at": None,
+        "token": None,
+        "token_generated_at": None,
+        **row,
+    },
+    "email_log": lambda store, row: {
+        "id": str(uuid.uuid4()),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **row,
+    },
+}
+
+
+# --- Filter parsing ---
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes."""
+    parts, depth, quoted, buf, i = [], 0, False, [], 0
+    while i < len(text):
+        ch = text[i]
+        if quoted and ch == "\\" and i + 1 < len(text):
+            buf.append(text[i:i + 2])
+            i += 2
+            continue
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append("".join(buf))
+            buf = []
+            i += 1
+            continue
+        buf.append(ch)
+        i += 1
+    if buf:
+        parts.append("".join(buf))
+    return parts
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+    return value
+
+
+def _like_regex(pattern: str, case_insensitive: bool) -> re.Pattern:
+    out, i = [], 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        out.append(".*" if ch in "%*" else "." if ch == "_" else re.escape(ch))
+        i += 1
+    return re.compile("^" + "".join(out) + "$", re.IGNORECASE | re.DOTALL if case_insensitive else re.DOTALL)
+
+
+def _coerce(sample: Any, raw: str) -> Any:
+    if isinstance(sample, bool):
+        return raw.lower() == "true"
+    if isinstance(sample, int):
+        try:
+            return int(raw)
+        except ValueError:
+            return raw
+    if isinstance(sample, float):
+        return float(raw)
+    return raw
+
+
+def _search_text(row: dict) -> str:
+    return " ".join(str(row.get(c) or "") for c in SEARCH_COLUMNS).lower()
+
+
+@functools.lru_cache(maxsize=65536)
+def _words(text: str) -> frozenset:
+    return frozenset(re.split(r"\W+", text))
+
+
+def _pg_array(raw: str) -> List[str]:
+    inner = raw.strip()
+    if inner[:1] in "{(" and inner[-1:] in "})":
+        inner = inner[1:-1]
+    return [_unquote(v.strip()) for v in _split_top_level(inner) if v.strip()]
+
+
+def compile_condition(column: str, expr: str) -> Callable[[dict], bool]:
+    """`column` + `op.value` (optionally `not.op.value`) -> row predicate."""
+    negate = expr.startswith("not.")
+    if negate:
+        expr = expr[4:]
+    op, _, raw = expr.partition(".")
+    value = _unquote(raw)
+
+    def cmp(fn):
+        def check(row):
+            v = row.get(column)
+            if v is None:
+                return False
+            return fn(v, _coerce(v, value))
+        return check
+
+    if op == "eq":
+        pred = cmp(lambda a, b: a == b)
+    elif op == "neq":
+        pred = cmp(lambda a, b: a != b)
+    elif op == "gt":
+        pred = cmp(lambda a, b: a > b)
+    elif op == "gte":
+        pred = cmp(lambda a, b: a >= b)
+    elif op == "lt":
+        pred = cmp(lambda a, b: a < b)
+    elif op == "lte":
+        pred = cmp(lambda a, b: a <= b)
+    elif op in ("like", "ilike"):
+        rx = _like_regex(value, op == "ilike")
+        pred = lambda row: row.get(column) is not None and bool(rx.match(str(row.get(column))))
+    elif op == "is":
+        target = {"null": None, "true": True, "false": False}[value.lower()]
+        pred = lambda row: row.get(column) is target if target is None else row.get(column) == target
+    elif op == "in":
+        options = _pg_array(value)
+        pred = lambda row: row.get(column) is not None and str(row.get(column)) in options
+    elif op == "cs":
+        wanted = set(_pg_array(value))
+        pred = lambda row: wanted <= {str(v) for v in row.get(column) or []}
+    elif op == "ov":
+        wanted = set(_pg_array(value))
+        pred = lambda row: bool(wanted & {str(v) for v in row.get(column) or []})
+    elif op.split("(")[0] in ("fts", "plfts", "phfts", "wfts"):
+        words = {w for w in re.split(r"\W+", value.lower()) if w}
+        pred = lambda row: words <= _words(_search_text(row))
+    else:
+        raise PostgrestError(f"Unsupported operator: {op}")
+
+    return (lambda row: not pred(row)) if negate else pred
+
+
+def compile_logic(tree: str, conjunction: str) -> Callable[[dict], bool]:
+    """Parse the body of `or=(...)` / `and=(...)`."""
+    inner = tree.strip()
+    if inner.startswith("(") and inner.endswith(")"):
+        inner = inner[1:-1]
+
+    preds = []
+    for part in _split_top_level(inner):
+        part = part.strip()
+        negate = part.startswith("not.")
+        body = part[4:] if negate else part
+        m = re.match(r"^(and|or)(\(.*\))$", body, re.DOTALL)
+        if m:
+            pred = compile_logic(m.group(2), m.group(1))
+        else:
+            column, _, expr = body.partition(".")
+            pred = compile_condition(column, expr)
+        preds.append((lambda p: (lambda row: not p(row)))(pred) if negate else pred)
+
+    if conjunction == "or":
+        return lambda row: any(p(row) for p in preds)
+    return lambda row: all(p(row) for p in preds)
+
+
+def build_filter(params: List[tuple]) -> Callable[[dict], bool]:
+    preds = []
+    for key, value in params:
+        if key in RESERVED_PARAMS:
+            continue
+        if key in ("or", "and"):
+            preds.append(compile_logic(value, key))
+        elif key in ("not.or", "not.and"):
+            inner = compile_logic(value, key[4:])
+            preds.append(lambda row, inner=inner: not inner(row))
+        else:
+            preds.append(compile_condition(key, value))
+    return lambda row: all(p(row) for p in preds)
+
+
+def apply_order(rows: List[dict], order: Optional[str]) -> List[dict]:
+    if not order:
+        return rows
+    for term in reversed([t for t in order.split(",") if t]):
+        parts = term.split(".")
+        column = parts[0]
+        desc = "desc" in parts[1:]
+        nulls_first = "nullsfirst" in parts[1:] or ("nullslast" not in parts[1:] and desc)
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        present.sort(key=lambda r: r.get(column), reverse=desc)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+
+def project(rows: List[dict], select: Optional[str]) -> List[dict]:
+    if not select or select.strip() == "*":
+        return [dict(r) for r in rows]
+    columns = [c.strip() for c in select.split(",") if c.strip()]
+    return [{c: r.get(c) for c in columns} for r in rows]
+
+
+# --- Read path shared by tables and RPCs ---
+
+def read_rows(rows: List[dict], request: Request, head: bool = False) -> Response:
+    matcher = build_filter(request.query_params.multi_items())
+    matched = [r for r in rows if matcher(r)]
+    matched = apply_order(matched, request.query_params.get("order"))
+
+    offset = int(request.query_params.get("offset") or 0)
+    limit = request.query_params.get("limit")
+    page = matched[offset:offset + int(limit)] if limit is not None else matched[offset:]
+
+    headers = {}
+    if "count=" in request.headers.get("prefer", ""):
+        end = offset + len(page) - 1
+        span = f"{offset}-{end}" if page else "*"
+        headers["Content-Range"] = f"{span}/{len(matched)}"
+
+    if head:
+        return Response(status_code=200, headers=headers)
+    return JSONResponse(project(page, request.query_params.get("select")), headers=headers)
+
+
+# --- RPCs (supabase/schema.sql) ---
+
+def rpc_update_status_with_log(store: Store, args: dict):
+    for row in store.tables["product_interest_requests"]:
+        if row["id"] == args.get("req_id"):
+            store.status_log.append({"request_id": row["id"], "from": row["status"], "to": args.get("new_stat")})
+            row["status"] = args.get("new_stat")
+            return None
+    raise PostgrestError("Request not found", status=400, code="P0002")
+
+
+def rpc_update_status_bulk_with_log(store: Store, args: dict):
+    if args.get("new_stat") not in fixtures.STATUSES:
+        raise PostgrestError(f"Invalid status: {args.get('new_stat')}", status=400, code="22023")
+    by_id = {r["id"]: r for r in store.tables["product_interest_requests"]}
+    out = []
+    for rid in args.get("req_ids") or []:
+        row = by_id.get(rid)
+        if row is None:
+            out.append({"id": rid, "outcome": "not_found", "previous_status": None})
+        elif row["status"] == args.get("new_stat"):
+            out.append({"id": rid, "outcome": "unchanged", "previous_status": row["status"]})
+        else:
+            out.append({"id": rid, "outcome": "updated", "previous_status": row["status"]})
+            store.status_log.append({"request_id": rid, "from": row["status"], "to": args.get("new_stat")})
+            row["status"] = args.get("new_stat")
+    return out
+
+
+def rpc_archive_mark(store: Store, args: dict):
+    ids = set(args.get("ids") or [])
+    now = datetime.now(timezone.utc).isoformat()
+    count = 0
+    for row in store.tables["product_interest_requests"]:
+        if row["id"] in ids and not row.get("archived"):
+            row["archived"] = True
+            row["archived_at"] = now
+            count += 1
+    return count
+
+
+def rpc_mark_signed_copy_emails_sent(store: Store, args: dict):
+    sends = {s["id"]: s for s in args.get("sends") or []}
+    out = []
+    for row in store.tables["signed_copy_campaign_recipients"]:
+        send = sends.get(row["id"])
+        if send and not row.get("email_sent"):
+            row.update(email_sent=True, email_sent_at=send["sent_at"], token=send["token"], token_generated_at=send["sent_at"])
+            out.append({"id": row["id"]})
+    return out
+
+
+def rpc_search_interest_requests(store: Store, args: dict):
+    term = (args.get("term") or "").lower()
+    archived_mode = args.get("archived_mode") or "exclude"
+    collection_mode = args.get("collection_mode") or "all"
+    statuses = set(args.get("statuses") or [])
+    offset = int(args.get("row_offset") or 0)
+    limit = int(args.get("row_limit") or 100)
+    words = [w for w in re.split(r"\W+", term) if w]
+
+    def score(row):
+        text = _search_text(row)
+        return sum(text.count(w) for w in words) + (2 if term in text else 0)
+
+    def keep(row):
+        if archived_mode != "include" and row.get("archived") != (archived_mode == "only"):
+            return False
+        if collection_mode != "all" and is_out_of_print(row) != (collection_mode == "op"):
+            return False
+        return not statuses or row.get("status") in statuses
+
+    hits = [(score(r), r) for r in store.tables["product_interest_requests"] if keep(r)]
+    hits = [h for h in hits if h[0] > 0]
+    hits.sort(key=lambda h: (h[0], h[1]["created_at"], h[1]["id"]), reverse=True)
+    return [r for _, r in hits[offset:offset + limit]]
+
+
+RPCS = {
+    "update_status_with_log": rpc_update_status_with_log,
+    "update_status_bulk_with_log": rpc_update_status_bulk_with_log,
+    "archive_mark": rpc_archive_mark,
+    "search_interest_requests": rpc_search_interest_requests,
+    "mark_signed_copy_emails_sent": rpc_mark_signed_copy_emails_sent,
+}
+
+
+# --- App ---
+
+def create_app(store: Store, latency_ms: float = 0.0) -> Starlette:
+    delay = latency_ms / 1000.0
+
+    async def pause():
+        store.requests += 1
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def table_rows(name: str) -> List[dict]:
+        if name not in store.tables:
+            store.tables[name] = []
+        return store.tables[name]
+
+    def wants_body(request: Request) -> bool:
+        return "return=representation" in request.headers.get("prefer", "")
+
+    async def table(request: Request):
+        await pause()
+        name = request.path_params["table"]
+        rows = table_rows(name)
+        try:
+            if request.method in ("GET", "HEAD"):
+                return read_rows(rows, request, head=request.method == "HEAD")
+
+            if request.method == "POST":
+                body = json.loads(await request.body() or b"[]")
+                items = body if isinstance(body, list) else [body]
+                key = request.query_params.get("on_conflict") or TABLE_KEYS.get(name, "id")
+                columns = key.split(",")
+                merge = "merge-duplicates" in request.headers.get("prefer", "")
+
+                def key_of(r: dict):
+                    value = tuple(r.get(c) for c in columns)
+                    return None if None in value else value
+
+                index = {key_of(r): r for r in rows}
+                out = []
+                for item in items:
+                    existing = index.get(key_of(item)) if key_of(item) is not None else None
+                    if existing is not None:
+                        if not merge:
+                            raise PostgrestError(
+                                f'duplicate key value violates unique constraint "{name}_{key}_key"',
+                                status=409,
+                                code="23505",
+                            )
+                        existing.update(item)
+                        out.append(existing)
+                        continue
+                    if name == "signed_copy_responses" and any(r.get("token_jti") == item.get("token_jti") for r in rows):
+                        raise PostgrestError("duplicate token_jti", status=409, code="23505")
+                    row = DEFAULTS.get(name, lambda _s, r: dict(r))(store, dict(item))
+                    rows.append(row)
+                    index[key_of(row)] = row
+                    out.append(row)
+                return JSONResponse(project(out, request.query_params.get("select")) if wants_body(request) else [], status_code=201)
+
+            if request.method == "PATCH":
+                patch = json.loads(await request.body() or b"{}")
+                matcher = build_filter(request.query_params.multi_items())
+                out = []
+                for row in rows:
+                    if matcher(row):
+                        row.update(patch)
+                        if name == "product_interest_requests":
+                            with_generated(row)
+                        out.append(row)
+                return JSONResponse(project(out, request.query_params.get("select")) if wants_body(request) else [])
+
+            if request.method == "DELETE":
+                matcher = build_filter(request.query_params.multi_items())
+                removed = [r for r in rows if matcher(r)]
+                rows[:] = [r for r in rows if not matcher(r)]
+                return JSONResponse(project(removed, request.query_params.get("select")) if wants_body(request) else [])
+        except PostgrestError as e:
+            return JSONResponse({"message": str(e), "code": e.code, "details": None, "hint": None}, status_code=e.status)
+
+        return Response(status_code=405)
+
+    async def rpc(request: Request):
+        await pause()
+        fn = RPCS.get(request.path_params["fn"])
+        if fn is None:
+            return JSONResponse({"message": "function not found", "code": "PGRST202", "details": None, "hint": None}, status_code=404)
+        try:
+            result = fn(store, json.loads(await request.body() or b"{}"))
+            if isinstance(result, list):
+                return read_rows(result, request)
+            return JSONResponse(result)
+        except PostgrestError as e:
+            return JSONResponse({"message": str(e), "code": e.code, "details": None, "hint": None}, status_code=e.status)
+
+    async def health(_request: Request):
+        return JSONResponse({
+            "requests": store.requests,
+            "tables": {table: len(rows) for table, rows in store.tables.items()},
+        })
+
+    return Starlette(routes=[
+        Route("/rest/v1/rpc/{fn}", rpc, methods=["POST", "GET"]),
+        Route("/rest/v1/{table}", table, methods=["GET", "HEAD", "POST", "PATCH", "DELETE"]),
+        Route("/health", health),
+    ])
+
+
+def app_from_env() -> Starlette:
+    """uvicorn factory, so every worker process builds and seeds its own store."""
+    store = Store()
+    store.seed(int(os.getenv("FAKE_PG_SEED_ROWS", "5000")), int(os.getenv("FAKE_PG_PRODUCTS", "500")))
+    store.seed_campaigns(int(os.getenv("FAKE_PG_CAMPAIGNS", "1")))
+    return create_app(store, float(os.getenv("FAKE_PG_LATENCY_MS", "5")))
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9101)
+    parser.add_argument("--seed-rows", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--campaigns", type=int, default=1, help="active rows seeded into signed_copy_campaigns")
+    args = parser.parse_args()
+
+    os.environ["FAKE_PG_SEED_ROWS"] = str(args.seed_rows)
+    os.environ["FAKE_PG_PRODUCTS"] = str(args.products)
+    os.environ["FAKE_PG_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_PG_CAMPAIGNS"] = str(args.campaigns)
+    uvicorn.run(
+        "bench.fake_postgrest:app_from_env",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level="warning",
+    )
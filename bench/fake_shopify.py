@@ -0,0 +1,371 @@
+"""
+Shopify Admin API stand-in for the benchmarks.
+
+Serves the REST endpoints the app uses for enrichment (`products/{id}`,
+`collects`, `collections/{id}`) and the GraphQL endpoint, answering the
+product-enrichment and signed-copy order queries from the synthetic
+catalogue in `bench.fixtures`, plus a cursor-paginated `orders` connection
+over `--orders` synthetic orders for the ingestion scripts. Every GraphQL
+response carries `extensions.cost` from a simulated leaky bucket and
+over-budget queries get a `THROTTLED` error, like the real API.
+
+    python -m bench.fake_shopify --port 9102 --latency-ms 80 --jitter-ms 40
+    python -m bench.fake_shopify --orders 20000 --target-ratio 0.25 --latency-ms 250
+
+Query costs are an approximation of Shopify's: a connection costs 2 plus
+its page size times the cost of each node, and a nested connection counts
+one point per ten requested items. The requested cost is reserved up front
+and the unused part refunded, as Shopify does.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import math
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from bench import fixtures
+
+ORDERS_QUERY_COST = 60
+DEFAULT_QUERY_COST = 10
+
+
+class LeakyBucket:
+    def __init__(self, size: float, restore_rate: float):
+        self.size = size
+        self.restore_rate = restore_rate
+        self.available = size
+        self.updated_at = time.monotonic()
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def refund(self, points: float):
+        with self._lock:
+            self.available = min(self.size, self.available + points)
+
+    def take(self, cost: float) -> tuple[bool, float]:
+        """Spend `cost` if the bucket holds it. Returns (allowed, available after)."""
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(self.size, self.available + (now - self.updated_at) * self.restore_rate)
+            self.updated_at = now
+            if self.available < cost:
+                self.throttled += 1
+                return False, self.available
+            self.available -= cost
+            return True, self.available
+
+
+class Stats:
+    def __init__(self):
+        self.rest_calls = 0
+        self.graphql_calls = 0
+        self.by_operation: dict[str, int] = {}
+
+    def count(self, operation: str):
+        self.by_operation[operation] = self.by_operation.get(operation, 0) + 1
+
+
+def cost_extensions(bucket: LeakyBucket, requested: float, actual: float | None, available: float) -> dict:
+    return {
+        "cost": {
+            "requestedQueryCost": requested,
+            "actualQueryCost": actual,
+            "throttleStatus": {
+                "maximumAvailable": bucket.size,
+                "currentlyAvailable": round(available, 1),
+                "restoreRate": bucket.restore_rate,
+            },
+        }
+    }
+
+
+def _numeric_id(gid: str) -> int:
+    return int(str(gid).rsplit("/", 1)[-1])
+
+
+class OrdersConfig:
+    def __init__(self, total: int = 0, target_ratio: float = 0.25, seed: int = 0, max_line_items: int = 8):
+        self.total = total
+        self.target_ratio = target_ratio
+        self.seed = seed
+        self.max_line_items = max_line_items
+
+    def order(self, i: int) -> dict:
+        return fixtures.order(i, self.target_ratio, self.seed, self.max_line_items)
+
+    @functools.lru_cache(maxsize=16)
+    def matching(self, search: str) -> list[int] | None:
+        """
+        Indexes of orders matching the `updated_at:>=`, `created_at:>=` and
+        `sku:` terms of a search, or None (all orders) when it has none.
+        """
+        since = {
+            field: datetime.fromisoformat(value)
+            for field, value in re.findall(r"(updated_at|created_at):>='?([^'\s]+)'?", search)
+        }
+        sku = re.search(r"sku:'?([^'\s]+)'?", search)
+        if not since and not sku:
+            return None
+
+        def keep(node: dict) -> bool:
+            for field, value in since.items():
+                key = "updatedAt" if field == "updated_at" else "createdAt"
+                if datetime.fromisoformat(node[key]) < value:
+                    return False
+            return not sku or any(li["sku"] == sku.group(1) for li in node["lineItems"])
+
+        return [i for i in range(self.total) if keep(self.order(i))]
+
+
+def _first_arg(query: str, field: str, default: int) -> int:
+    m = re.search(field + r"\(\s*first:\s*(\d+)", query)
+    return int(m.group(1)) if m else default
+
+
+def _connection_cost(first: int, node_cost: float) -> float:
+    return 2 + first * node_cost
+
+
+def product_requested_cost(query: str) -> float:
+    # Shopify reserves the cost of a full `collections(first: N)` page up front
+    return 1 + _connection_cost(_first_arg(query, "collections", 10), 1)
+
+
+def product_enrichment(variables: dict, query: str, orders: OrdersConfig) -> tuple[dict, float]:
+    pid = _numeric_id(variables["id"])
+    facts = fixtures.product(pid)
+    data = {
+        "product": {
+            "tags": facts["tags"],
+            "collections": {
+                "pageInfo": {"hasNextPage": False, "endCursor": None},
+                "nodes": [{"title": c["title"], "handle": c["handle"]} for c in facts["collections"]],
+            },
+        }
+    }
+    return data, 1 + _connection_cost(len(facts["collections"]), 1)
+
+
+def _line_items_connection(items: list[dict], first: int) -> dict:
+    page = items[:first]
+    return {
+        "pageInfo": {
+            "hasNextPage": len(items) > first,
+            "endCursor": str(len(page)) if page else None,
+        },
+        "edges": [{"node": li} for li in page],
+    }
+
+
+def orders_page(variables: dict, query: str, orders: OrdersConfig) -> tuple[dict, float]:
+    """
+    Cursor-paginated `orders` connection over the `$search` variable (see
+    `OrdersConfig.matching`). Cursors are positions in the result.
+    """
+    first = _first_arg(query, "orders", 50)
+    li_first = _first_arg(query, "lineItems", 50)
+    matching = orders.matching(variables.get("search") or "")
+    total = orders.total if matching is None else len(matching)
+    start = int(variables.get("cursor") or 0)
+    end = min(start + first, total)
+
+    edges, returned_items = [], 0
+    for n in range(start, end):
+        i = n if matching is None else matching[n]
+        node = orders.order(i)
+        node["lineItems"] = _line_items_connection(node["lineItems"], li_first)
+        returned_items += len(node["lineItems"]["edges"])
+        edges.append({"cursor": str(n + 1), "node": node})
+
+    data = {
+        "orders": {
+            "pageInfo": {"hasNextPage": end < total, "endCursor": str(end) if edges else None},
+            "edges": edges,
+        }
+    }
+    actual = 2 + len(edges) + math.ceil(returned_items / 10)
+    return data, actual
+
+
+def order_line_items(variables: dict, query: str, orders: OrdersConfig) -> tuple[dict, float]:
+    """`order(id:)` with a `lineItems` page after the `$cursor` variable."""
+    li_first = _first_arg(query, "lineItems", 50)
+    node = orders.order(_numeric_id(variables["id"]) - fixtures.ORDER_ID_BASE)
+    start = int(variables.get("cursor") or 0)
+    items = node["lineItems"][start:]
+    connection = _line_items_connection(items, li_first)
+    if connection["pageInfo"]["endCursor"] is not None:
+        connection["pageInfo"]["endCursor"] = str(start + len(connection["edges"]))
+    node["lineItems"] = connection
+    return {"order": node}, 3 + len(connection["edges"])
+
+
+def orders_requested_cost(query: str) -> float:
+    li_first = _first_arg(query, "lineItems", 50)
+    return _connection_cost(_first_arg(query, "orders", 50), 1 + math.ceil(li_first / 10))
+
+
+def orders_for_email(variables: dict, query: str, orders: OrdersConfig) -> tuple[dict, float]:
+    """Signed-copy decision lookup: a couple of orders for the customer in the search string."""
+    query = variables.get("query") or ""
+    seed = sum(ord(ch) for ch in query)
+    rng = random.Random(seed)
+    edges = []
+    for n in range(rng.randint(1, 3)):
+        order_id = 5_000_000_000 + seed * 10 + n
+        pid = fixtures.product_id(rng.randrange(500))
+        edges.append({
+            "node": {
+                "id": f"gid://shopify/Order/{order_id}",
+                "name": f"#{100000 + seed + n}",
+                "orderNumber": 100000 + seed + n,
+                "note": None,
+                "customer": {"id": f"gid://shopify/Customer/{seed}", "firstName": "Bench", "lastName": "Customer", "email": None},
+                "lineItems": {
+                    "edges": [{
+                        "node": {
+                            "id": f"gid://shopify/LineItem/{order_id * 10}",
+                            "title": fixtures.product_title(pid),
+                            "quantity": 1,
+                            "variant": {"id": f"gid://shopify/ProductVariant/{pid * 10}"},
+                            "product": {"id": f"gid://shopify/Product/{pid}", "title": fixtures.product_title(pid)},
+                        }
+                    }]
+                },
+            }
+        })
+    return {"orders": {"edges": edges}}, ORDERS_QUERY_COST
+
+
+# (marker in the query text, operation name, requested cost, resolver); first match wins.
+# Resolvers return (data, actual cost).
+GRAPHQL_OPERATIONS = [
+    ("ProductEnrichment", "product_enrichment", product_requested_cost, product_enrichment),
+    ("FindOrdersForSignedCopyDecision", "orders_for_email", lambda _q: ORDERS_QUERY_COST, orders_for_email),
+    ("order(id:", "order_line_items", lambda q: 1 + _connection_cost(_first_arg(q, "lineItems", 50), 1), order_line_items),
+    ("orders(", "orders_page", orders_requested_cost, orders_page),
+]
+
+
+def create_app(
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    bucket_size: float = 1000.0,
+    restore_rate: float = 50.0,
+    orders: OrdersConfig | None = None,
+) -> Starlette:
+    bucket = LeakyBucket(bucket_size, restore_rate)
+    stats = Stats()
+    orders = orders or OrdersConfig()
+
+    async def pause():
+        delay = latency_ms + (random.uniform(0, jitter_ms) if jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+
+    async def product(request: Request):
+        await pause()
+        stats.rest_calls += 1
+        stats.count("rest_product")
+        facts = fixtures.product(int(request.path_params["product_id"]))
+        return JSONResponse({"product": {"id": facts["id"], "title": facts["title"], "tags": ", ".join(facts["tags"])}})
+
+    async def collects(request: Request):
+        await pause()
+        stats.rest_calls += 1
+        stats.count("rest_collects")
+        pid = int(request.query_params.get("product_id") or 0)
+        facts = fixtures.product(pid)
+        return JSONResponse({"collects": [{"product_id": pid, "collection_id": c["id"]} for c in facts["collections"]]})
+
+    async def collection(request: Request):
+        await pause()
+        stats.rest_calls += 1
+        stats.count("rest_collection")
+        cid = int(request.path_params["collection_id"])
+        for c in fixtures.COLLECTIONS:
+            if c["id"] == cid:
+                return JSONResponse({"collection": c})
+        return JSONResponse({"errors": "Not Found"}, status_code=404)
+
+    async def graphql(request: Request):
+        await pause()
+        stats.graphql_calls += 1
+        body = json.loads(await request.body() or b"{}")
+        query = body.get("query") or ""
+        variables = body.get("variables") or {}
+
+        name, cost, resolver = "unknown", DEFAULT_QUERY_COST, lambda _v, _q, _o: ({}, DEFAULT_QUERY_COST)
+        for marker, op_name, op_cost, op_resolver in GRAPHQL_OPERATIONS:
+            if marker in query:
+                name, cost, resolver = op_name, op_cost(query), op_resolver
+                break
+        stats.count(name)
+
+        if cost > bucket.size:
+            return JSONResponse({
+                "errors": [{
+                    "message": f"Query cost is {cost}, which exceeds the single query max cost limit ({bucket.size}).",
+                    "extensions": {"code": "MAX_COST_EXCEEDED", "cost": cost, "maxCost": bucket.size},
+                }],
+            })
+
+        allowed, available = bucket.take(cost)
+        if not allowed:
+            return JSONResponse({
+                "errors": [{"message": "Throttled", "extensions": {"code": "THROTTLED"}}],
+                "extensions": cost_extensions(bucket, cost, None, available),
+            })
+
+        data, actual = resolver(variables, query, orders)
+        actual = min(actual, cost)
+        bucket.refund(cost - actual)
+        return JSONResponse({"data": data, "extensions": cost_extensions(bucket, cost, actual, available + cost - actual)})
+
+    async def health(_request: Request):
+        return JSONResponse({
+            "rest_calls": stats.rest_calls,
+            "graphql_calls": stats.graphql_calls,
+            "throttled": bucket.throttled,
+            "by_operation": stats.by_operation,
+        })
+
+    return Starlette(routes=[
+        Route("/admin/api/{version}/products/{product_id:int}.json", product),
+        Route("/admin/api/{version}/collects.json", collects),
+        Route("/admin/api/{version}/collections/{collection_id:int}.json", collection),
+        Route("/admin/api/{version}/graphql.json", graphql, methods=["POST"]),
+        Route("/health", health),
+    ])
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9102)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=40.0)
+    parser.add_argument("--bucket-size", type=float, default=1000.0)
+    parser.add_argument("--restore-rate", type=float, default=50.0)
+    parser.add_argument("--orders", type=int, default=0, help="synthetic orders served by the orders connection")
+    parser.add_argument("--target-ratio", type=float, default=0.25, help="share of orders containing the signed-copy product")
+    parser.add_argument("--max-line-items", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    orders = OrdersConfig(args.orders, args.target_ratio, args.seed, args.max_line_items)
+    app = create_app(args.latency_ms, args.jitter_ms, args.bucket_size, args.restore_rate, orders)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,188 @@
+"""
+Deterministic synthetic data for the benchmarks.
+
+Everything is derived from an integer index and a seed, so the stand-in
+servers and the load driver agree on ids, emails and products without
+sharing state.
+"""
+
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+BENCH_NAMESPACE = uuid.UUID("6f1c2a4e-2d3b-4c8e-9a41-7b0e5d9f3c21")
+
+# Product ids start here; ids divisible by OP_EVERY are Out-of-Print
+PRODUCT_ID_BASE = 7_000_000_000_000
+OP_EVERY = 7
+
+STATUSES = ["New", "In Progress", "Request Filed", "Complete"]
+
+WORDS = [
+    "noma", "flavour", "bread", "salt", "fire", "kitchen", "pastry", "ferment",
+    "vegetable", "japanese", "french", "baking", "wine", "coffee", "spice",
+    "garden", "sea", "preserving", "butcher", "cheese", "sourdough", "tart",
+]
+FIRST_NAMES = ["Ada", "Ben", "Chloe", "Dev", "Eli", "Fran", "Gus", "Hana", "Ivo", "Jun", "Kai", "Lena"]
+LAST_NAMES = ["Aoki", "Brandt", "Costa", "Diaz", "Evans", "Fox", "Greer", "Hale", "Ito", "Jones", "Khan", "Lund"]
+
+COLLECTIONS = [
+    {"id": 1001, "title": "Cookbooks", "handle": "cookbooks"},
+    {"id": 1002, "title": "Baking", "handle": "baking"},
+    {"id": 1003, "title": "Out-of-Print Offers", "handle": "out-of-print-offers"},
+    {"id": 1004, "title": "Signed Copies", "handle": "signed-copies"},
+    {"id": 1005, "title": "New Arrivals", "handle": "new-arrivals"},
+]
+
+
+def interest_id(i: int) -> str:
+    return str(uuid.uuid5(BENCH_NAMESPACE, f"interest-{i}"))
+
+
+def product_id(i: int) -> int:
+    return PRODUCT_ID_BASE + i
+
+
+def product_title(pid: int) -> str:
+    rng = random.Random(pid)
+    title = " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(2, 4)))
+    return f"OP: {title}" if pid % (OP_EVERY * 11) == 0 else title
+
+
+def product(pid: int) -> dict:
+    """Shopify-side facts for a product id: tags and collections."""
+    rng = random.Random(pid * 31)
+    tags = rng.sample(WORDS, rng.randint(1, 4))
+    collections = rng.sample(COLLECTIONS[:2] + COLLECTIONS[3:], rng.randint(1, 3))
+    if pid % OP_EVERY == 0:
+        tags.append("op")
+        collections.append(COLLECTIONS[2])
+    return {
+        "id": pid,
+        "title": product_title(pid),
+        "tags": tags,
+        "collections": collections,
+    }
+
+
+def person(i: int) -> dict:
+    rng = random.Random(i * 17)
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    return {
+        "first_name": first,
+        "last_name": last,
+        "name": f"{first} {last}",
+        "email": f"{first.lower()}.{last.lower()}.{i}@example.com",
+    }
+
+
+def interest_row(i: int, product_count: int, now: datetime | None = None) -> dict:
+    """One seeded `product_interest_requests` row, enriched as the app would store it."""
+    rng = random.Random(i)
+    now = now or datetime(2026, 1, 1, tzinfo=timezone.utc)
+    pid = product_id(rng.randrange(product_count))
+    facts = product(pid)
+    who = person(i)
+    return {
+        "id": interest_id(i),
+        "product_id": pid,
+        "product_title": facts["title"],
+        "email": who["email"],
+        "customer_name": who["name"] if rng.random() < 0.8 else None,
+        "isbn": f"978{rng.randrange(10**9, 10**10)}" if rng.random() < 0.6 else None,
+        "cr_id": f"CR{uuid.UUID(interest_id(i)).hex[:8].upper()}",
+        "cr_seq": i + 1,
+        "status": rng.choices(STATUSES, weights=[50, 20, 15, 15])[0],
+        "archived": rng.random() < 0.1,
+        "archived_at": None,
+        "created_at": (now - timedelta(minutes=i * 7)).isoformat(),
+        "product_tags": facts["tags"],
+        "shopify_collections": [c["title"] for c in facts["collections"]],
+        "shopify_collection_handles": [c["handle"] for c in facts["collections"]],
+        "enrichment_status": None,
+        "enrichment_attempts": 0,
+    }
+
+
+def search_terms(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [rng.choice(WORDS) for _ in range(count)]
+
+
+# --- Orders (pipeline benchmark) ---
+
+SIGNED_COPY_PRODUCT_ID = 7179329437829
+ORDER_ID_BASE = 4_000_000_000
+LINE_ITEM_ID_BASE = 11_000_000_000
+MISSING_EMAIL_RATE = 0.03
+# Share of orders with more line items than one page of `lineItems(first: ...)`
+LARGE_ORDER_RATE = 0.01
+
+
+SIGNED_COPY_CAMPAIGN_KEY = "noma-signed-copy-decision"
+
+
+def campaigns(count: int) -> list[dict]:
+    """`signed_copy_campaigns` rows: the signed-copy campaign plus `count - 1` catalogue-product campaigns."""
+    rows = [{
+        "campaign_key": SIGNED_COPY_CAMPAIGN_KEY,
+        "title": "The Noma Guide to Building Flavour",
+        "product_ids": [SIGNED_COPY_PRODUCT_ID],
+        "starts_at": None,
+        "ends_at": None,
+        "active": True,
+    }]
+    for n in range(1, count):
+        pids = [product_id(n * 3 + k) for k in range(3)]
+        rows.append({
+            "campaign_key": f"bench-preorder-{n}",
+            "title": product_title(pids[0]),
+            "product_ids": pids,
+            "starts_at": None,
+            "ends_at": None,
+            "active": True,
+        })
+    return rows
+
+
+def sku(pid: int) -> str:
+    return f"BENCH-{pid}"
+
+
+def order(i: int, target_ratio: float = 0.25, seed: int = 0, max_line_items: int = 8) -> dict:
+    """
+    Order node `i`, newest first by index, shaped like the Admin GraphQL
+    `orders` connection. About `target_ratio` of orders contain the
+    signed-copy product.
+    """
+    rng = random.Random(seed * 1_000_003 + i)
+    order_id = ORDER_ID_BASE + i
+    who = person(i)
+    placed = datetime(2026, 1, 1, tzinfo=timezone.utc) - timedelta(minutes=i * 3)
+
+    if rng.random() < LARGE_ORDER_RATE:
+        count = rng.randint(51, 120)
+    else:
+        count = rng.randint(1, max_line_items)
+    products = [product_id(rng.randrange(500)) for _ in range(count)]
+    if rng.random() < target_ratio:
+        products[rng.randrange(count)] = SIGNED_COPY_PRODUCT_ID
+
+    return {
+        "id": f"gid://shopify/Order/{order_id}",
+        "name": f"#{100000 + i}",
+        "email": None if rng.random() < MISSING_EMAIL_RATE else who["email"],
+        "createdAt": placed.isoformat(),
+        "updatedAt": (placed + timedelta(minutes=rng.randrange(60 * 24))).isoformat(),
+        "customer": {"id": f"gid://shopify/Customer/{6_000_000_000 + i}", "firstName": who["first_name"]},
+        "lineItems": [
+            {
+                "id": f"gid://shopify/LineItem/{LINE_ITEM_ID_BASE + i * 100 + n}",
+                "quantity": 1,
+                "sku": sku(pid),
+                "product": {"id": f"gid://shopify/Product/{pid}"},
+            }
+            for n, pid in enumerate(products)
+        ],
+    }
@@ -0,0 +1,202 @@
+"""
+Offline benchmark for the signed-copy campaign pipeline.
+
+Starts the PostgREST, Shopify and Mailtrap stand-ins (`bench.fake_postgrest`,
+`bench.fake_shopify`, `bench.fake_mailtrap`), then runs the real scripts
+against them, one after the other:
+
+    1. python -m scripts.ingest_signed_copy_orders
+    2. python -m mailtrap.send_signed_copy_emails
+
+For each stage it reports wall time, the child's peak RSS, and the calls it
+made to each stand-in: GraphQL pages and THROTTLED responses, Supabase
+requests, Mailtrap sends and failures. Run from the repo root:
+
+    python -m bench.pipeline --orders 5000
+    python -m bench.pipeline --orders 20000 --shopify-latency-ms 250 --out before.json
+    python -m bench.pipeline --baseline before.json --send-args "--sleep 0"
+
+Script output goes to `<log-dir>/<stage>.log`. Nothing leaves the machine:
+the scripts get SUPABASE_URL / SHOPIFY_BASE_URL / MAILTRAP_URL for the
+stand-ins and dummy credentials.
+"""
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from bench.api_load import REPO_ROOT, TOKEN_SECRET, _delta, free_port, start, stop, wait_ready
+
+STAGES = {
+    "ingest": ["-m", "scripts.ingest_signed_copy_orders"],
+    "send": ["-m", "mailtrap.send_signed_copy_emails"],
+}
+
+# (report column, stand-in, health field)
+COUNTERS = [
+    ("graphql_calls", "shopify", "graphql_calls"),
+    ("throttled", "shopify", "throttled"),
+    ("supabase_requests", "supabase", "requests"),
+    ("mail_calls", "mailtrap", "calls"),
+    ("mail_sent", "mailtrap", "sent"),
+    ("mail_errors", "mailtrap", "errors"),
+]
+
+
+def health(urls: dict) -> dict:
+    return {name: httpx.get(f"{url}/health", timeout=10.0).json() for name, url in urls.items()}
+
+
+def run_stage(name: str, extra_args: list[str], env: dict, log_dir: Path, urls: dict) -> dict:
+    before = health(urls)
+    log_path = log_dir / f"{name}.log"
+    with log_path.open("w") as log_file:
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, *STAGES[name], *extra_args],
+            cwd=REPO_ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+        )
+        # wait4 rather than wait(): it also returns the child's resource usage
+        _pid, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - started
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    after = health(urls)
+
+    result = {
+        "exit_code": proc.returncode,
+        "wall_s": round(wall, 2),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+    }
+    for column, server, field in COUNTERS:
+        result[column] = after[server][field] - before[server][field]
+    result["recipients"] = after["supabase"]["tables"].get("signed_copy_campaign_recipients", 0)
+    result["log"] = str(log_path)
+    return result
+
+
+def print_report(results: dict, baseline: dict | None):
+    base = (baseline or {}).get("stages", {})
+    columns = ["wall_s", "peak_rss_mb"] + [c for c, _s, _f in COUNTERS] + ["recipients"]
+    header = f"{'stage':<8} {'exit':>4} " + " ".join(f"{c:>20}" for c in columns)
+    print(header)
+    print("-" * len(header))
+    for stage, r in results.items():
+        b = base.get(stage, {})
+        cells = " ".join(f"{str(r[c]) + _delta(r[c], b.get(c)):>20}" for c in columns)
+        print(f"{stage:<8} {r['exit_code']:>4} {cells}")
+    for stage, r in results.items():
+        if r["exit_code"]:
+            print(f"  {stage} failed; see {r['log']}")
+
+
+def run(args):
+    env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+    pg_port, shop_port, mail_port = free_port(), free_port(), free_port()
+    urls = {
+        "supabase": f"http://127.0.0.1:{pg_port}",
+        "shopify": f"http://127.0.0.1:{shop_port}",
+        "mailtrap": f"http://127.0.0.1:{mail_port}",
+    }
+    log_dir = Path(args.log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    procs = []
+    results = {}
+    try:
+        # One PostgREST worker: the send stage must see the ingest stage's rows
+        procs.append(start([
+            "-m", "bench.fake_postgrest", "--port", str(pg_port),
+            "--seed-rows", "0", "--latency-ms", str(args.supabase_latency_ms), "--workers", "1",
+            "--campaigns", str(args.campaigns),
+        ], REPO_ROOT, env))
+        procs.append(start([
+            "-m", "bench.fake_shopify", "--port", str(shop_port),
+            "--latency-ms", str(args.shopify_latency_ms), "--jitter-ms", str(args.shopify_jitter_ms),
+            "--bucket-size", str(args.bucket_size), "--restore-rate", str(args.restore_rate),
+            "--orders", str(args.orders), "--target-ratio", str(args.target_ratio),
+            "--max-line-items", str(args.max_line_items), "--seed", str(args.seed),
+        ], REPO_ROOT, env))
+        procs.append(start([
+            "-m", "bench.fake_mailtrap", "--port", str(mail_port),
+            "--latency-ms", str(args.mail_latency_ms), "--jitter-ms", str(args.mail_jitter_ms),
+            "--error-rate", str(args.mail_error_rate), "--rate-limit", str(args.mail_rate_limit),
+            "--seed", str(args.seed),
+        ], REPO_ROOT, env))
+        for proc, url in zip(procs, urls.values()):
+            wait_ready(f"{url}/health", proc)
+
+        script_env = {
+            **env,
+            "SUPABASE_URL": urls["supabase"],
+            "SUPABASE_KEY": "bench.bench.bench",
+            "SHOP_URL": "bench-shop.myshopify.com",
+            "SHOPIFY_BASE_URL": urls["shopify"],
+            "SHOPIFY_ACCESS_TOKEN": "bench",
+            "MAILTRAP_URL": f"{urls['mailtrap']}/api/send",
+            "MAILTRAP_API_TOKEN": "bench",
+            "EMAIL_SENDER": "bench@example.com",
+            "SIGNED_COPY_TOKEN_SECRET": TOKEN_SECRET,
+        }
+
+        print(
+            f"Running orders={args.orders} target_ratio={args.target_ratio} "
+            f"shopify={args.shopify_latency_ms}±{args.shopify_jitter_ms}ms bucket={args.bucket_size}/{args.restore_rate}s "
+            f"mailtrap={args.mail_latency_ms}±{args.mail_jitter_ms}ms errors={args.mail_error_rate}"
+        )
+        stage_args = {"ingest": shlex.split(args.ingest_args), "send": shlex.split(args.send_args)}
+        for stage in args.stages:
+            print(f"  {stage}...", flush=True)
+            results[stage] = run_stage(stage, stage_args[stage], script_env, log_dir, urls)
+            if results[stage]["exit_code"]:
+                break
+        stand_ins = health(urls)
+    finally:
+        stop(procs)
+
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    print()
+    print_report(results, baseline)
+    print(f"\nShopify stand-in: {stand_ins['shopify']}")
+    print(f"Mailtrap stand-in: {stand_ins['mailtrap']}")
+
+    if args.out:
+        report = {
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+            "stages": results,
+            "stand_ins": stand_ins,
+        }
+        Path(args.out).write_text(json.dumps(report, indent=2))
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--target-ratio", type=float, default=0.25, help="share of orders containing the signed-copy product")
+    parser.add_argument("--max-line-items", type=int, default=8)
+    parser.add_argument("--campaigns", type=int, default=1, help="active campaigns seeded for the ingester")
+    parser.add_argument("--shopify-latency-ms", type=float, default=150.0)
+    parser.add_argument("--shopify-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--bucket-size", type=float, default=1000.0)
+    parser.add_argument("--restore-rate", type=float, default=50.0)
+    parser.add_argument("--supabase-latency-ms", type=float, default=5.0)
+    parser.add_argument("--mail-latency-ms", type=float, default=120.0)
+    parser.add_argument("--mail-jitter-ms", type=float, default=60.0)
+    parser.add_argument("--mail-error-rate", type=float, default=0.02)
+    parser.add_argument("--mail-rate-limit", type=int, default=0, help="Mailtrap sends per second before 429 (0 = unlimited)")
+    parser.add_argument("--ingest-args", default="", help="extra arguments for the ingest script")
+    parser.add_argument("--send-args", default="", help="extra arguments for the send script, e.g. \"--sleep 0\"")
+    parser.add_argument("--log-dir", default="bench-logs")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON from a previous --out to compare against")
+    run(parser.parse_args())
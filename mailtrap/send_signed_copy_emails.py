@@ -1,18 +1,24 @@
 import os
 import time
+import queue
 import logging
-import requests
+import threading
 from datetime import datetime
 from typing import List
 
+import httpx
 from dotenv import load_dotenv
 load_dotenv()
 
+from backend.app import http_client
 from backend.app.supabase_client import supabase
-from utils.token_utils import generate_signed_copy_token
+from backend.app.tracing import ledger_snapshot, traced
+from utils.token_utils import DEFAULT_CAMPAIGN_KEY, generate_signed_copy_token
 from email_templates.email_templates import build_signed_copy_email
 
-MAILTRAP_URL = "https://send.api.mailtrap.io/api/send"
+MAILTRAP_URL = os.getenv("MAILTRAP_URL", "https://send.api.mailtrap.io/api/send")
+# Batch Sending API: many messages, each with its own recipient and body, per call
+MAILTRAP_BATCH_URL = os.getenv("MAILTRAP_BATCH_URL") or MAILTRAP_URL.rsplit("/", 1)[0] + "/batch"
 
 logging.basicConfig(level=logging.INFO)
 
@@ -24,11 +30,52 @@ DEFAULT_BATCH_SIZE = 25
 DEFAULT_SLEEP_SECONDS = 0.4
 MAX_RETRIES = 3
 
+# --workers > 1: concurrent sends behind one token bucket, instead of --sleep
+DEFAULT_WORKERS = 1
+# Messages per second across all workers (and batch calls); set to your Mailtrap plan's sending limit
+DEFAULT_SEND_RATE = float(os.getenv("MAILTRAP_SEND_RATE", "10"))
+SEND_ROUNDS = 2            # a row that still fails after with_retry is queued once more
+PROGRESS_SECONDS = 10
+
+# --transport batch: messages per Mailtrap batch call (the API accepts up to 500)
+DEFAULT_MAIL_BATCH_SIZE = int(os.getenv("MAILTRAP_BATCH_SIZE", "500"))
+
+
+# ---------------------------
+# RATE LIMIT
+# ---------------------------
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursts of up to `burst`.
+    acquire(n) for more than the burst waits for a full bucket and borrows the
+    rest, so the calls after it wait out the difference.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n=1):
+        needed = min(n, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self.tokens >= needed:
+                    self.tokens -= n
+                    return
+                wait = (needed - self.tokens) / self.rate
+            time.sleep(wait)
+
 
 # ---------------------------
 # MAIL SEND
 # ---------------------------
-def send_mailtrap_email(subject, html_body, to_email):
+def _mailtrap_auth():
     token = os.getenv("MAILTRAP_API_TOKEN")
     sender = os.getenv("EMAIL_SENDER")
 
@@ -42,31 +89,86 @@ def send_mailtrap_email(subject, html_body, to_email):
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
+    return headers, {"email": sender, "name": "Kitchen Arts & Letters"}
+
+
+@traced
+def send_mailtrap_email(subject, html_body, to_email):
+    headers, sender = _mailtrap_auth()
 
     payload = {
-        "from": {
-            "email": sender,
-            "name": "Kitchen Arts & Letters"
-        },
+        "from": sender,
         "to": [{"email": to_email}],
         "subject": subject,
         "html": html_body
     }
 
-    res = requests.post(MAILTRAP_URL, headers=headers, json=payload)
+    res = http_client.request("POST", MAILTRAP_URL, headers=headers, json=payload)
 
     if res.status_code not in (200, 202):
         raise RuntimeError(f"Mailtrap failed: {res.text}")
 
 
+class BatchNotAccepted(RuntimeError):
+    """Mailtrap certainly didn't take the batch: nothing in it was sent."""
+
+
+class BatchTemporarilyRefused(BatchNotAccepted):
+    """Not accepted, and worth trying again (connect failure, 429, bare 5xx)."""
+
+
+@traced
+def send_mailtrap_batch(messages):
+    """
+    Send [{"to", "subject", "html"}] in one batch call. Returns one entry per
+    message, in order: None if it was accepted, else its error.
+
+    Raises BatchNotAccepted (or BatchTemporarilyRefused) only when the batch
+    was certainly not delivered. Any other exception, e.g. a read timeout
+    after the request went out or a 200 we can't parse, means some or all
+    of it may have been sent.
+    """
+    headers, sender = _mailtrap_auth()
+
+    payload = {
+        "base": {"from": sender},
+        "requests": [
+            {"to": [{"email": m["to"]}], "subject": m["subject"], "html": m["html"]}
+            for m in messages
+        ]
+    }
+
+    try:
+        res = http_client.request("POST", MAILTRAP_BATCH_URL, headers=headers, json=payload)
+    except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+        # The request never reached Mailtrap
+        raise BatchTemporarilyRefused(f"Mailtrap batch not sent: {e!r}") from e
+
+    if res.status_code == 429 or (res.status_code >= 500 and not res.text.strip()):
+        raise BatchTemporarilyRefused(f"Mailtrap batch refused: HTTP {res.status_code}")
+    if 400 <= res.status_code < 500:
+        raise BatchNotAccepted(f"Mailtrap batch rejected: HTTP {res.status_code} {res.text}")
+    if res.status_code not in (200, 202):
+        raise RuntimeError(f"Mailtrap batch failed: HTTP {res.status_code} {res.text}")
+
+    responses = res.json().get("responses") or []
+    if len(responses) != len(messages):
+        raise RuntimeError(f"Mailtrap batch returned {len(responses)} results for {len(messages)} messages")
+
+    return [
+        None if r.get("success") else "; ".join(str(e) for e in (r.get("errors") or ["rejected"]))
+        for r in responses
+    ]
+
+
 # ---------------------------
 # RETRY WRAPPER
 # ---------------------------
-def with_retry(fn, max_retries=MAX_RETRIES, base_delay=1.0):
+def with_retry(fn, max_retries=MAX_RETRIES, base_delay=1.0, retry_on=Exception):
     for attempt in range(max_retries):
         try:
             return fn()
-        except Exception as e:
+        except retry_on as e:
             if attempt == max_retries - 1:
                 raise
             sleep_time = base_delay * (2 ** attempt)
@@ -77,61 +179,290 @@ def with_retry(fn, max_retries=MAX_RETRIES, base_delay=1.0):
 # ---------------------------
 # PROCESS SINGLE ROW
 # ---------------------------
-def process_row(row, dry_run=False):
-    email = row["email"]
+def email_subject(row):
+    return f"Quick question about your preorder for {row['product_title']}"
 
+
+def render(row):
     token = generate_signed_copy_token(row)
-    html = build_signed_copy_email(row, token)
+    return token, build_signed_copy_email(row, token)
+
+
+def process_row(row, outcomes, dry_run=False, limiter=None):
+    email = row["email"]
+
+    token, html = render(row)
 
     if dry_run:
         logging.info(f"[DRY RUN] Would send to {email}")
         return "dry_run"
 
-    # 1️⃣ SEND EMAIL (with retry)
-    with_retry(lambda: send_mailtrap_email(
-        subject="Quick question about your preorder for The Noma Guide to Building Flavour",
-        html_body=html,
-        to_email=email
-    ))
-
-    now = datetime.utcnow().isoformat()
-
-    # 2️⃣ UPDATE RECIPIENT (safe conditional update)
-    def update_recipient():
-        return supabase.table("signed_copy_campaign_recipients") \
-            .update({
-                "email_sent": True,
-                "email_sent_at": now,
-                "token": token,
-                "token_generated_at": now
-            }) \
-            .eq("id", row["id"]) \
-            .eq("email_sent", False) \
-            .execute()
-
-    with_retry(update_recipient)
-
-    # 3️⃣ LOG SUCCESS
-    def log_success():
-        return supabase.table("email_log").insert({
-            "request_id": row["id"],
-            "email": email,
-            "status": "sent",
-            "sent_at": now
-        }).execute()
-
-    with_retry(log_success)
-
-    logging.info(f"Sent → {email}")
+    # 1️⃣ SEND EMAIL (with retry; every attempt takes a token when rate-limited)
+    def send():
+        if limiter:
+            limiter.acquire()
+        send_mailtrap_email(
+            subject=email_subject(row),
+            html_body=html,
+            to_email=email
+        )
+
+    with_retry(send)
+
+    # 2️⃣ RECORD (recipient update + email_log, written in bulk by Outcomes.flush)
+    outcomes.sent(row, token)
     return "sent"
 
 
+# ---------------------------
+# BOOKKEEPING
+# ---------------------------
+class Outcomes:
+    """
+    Collects send outcomes and writes each batch of them in two calls: the
+    mark_signed_copy_emails_sent RPC for the recipients (only rows still
+    email_sent = false) and one bulk email_log insert. With `flush_size`
+    it flushes itself once that many outcomes are waiting. Thread-safe.
+    """
+
+    def __init__(self, flush_size=None):
+        self.flush_size = flush_size
+        self._sent: List[dict] = []
+        self._log: List[dict] = []
+        self._lock = threading.Lock()
+
+    def sent(self, row, token):
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            self._sent.append({"id": row["id"], "token": token, "sent_at": now})
+            self._log.append({
+                "request_id": row["id"],
+                "email": row["email"],
+                "status": "sent",
+                "sent_at": now
+            })
+        logging.info(f"Sent → {row['email']}")
+        self._flush_if_full()
+
+    def failed(self, row, error_msg, status="failed"):
+        logging.error(f"{status.upper()} → {row['email']} → {error_msg}")
+        with self._lock:
+            self._log.append({
+                "request_id": row["id"],
+                "email": row["email"],
+                "status": status,
+                "error": error_msg,
+                "sent_at": datetime.utcnow().isoformat()
+            })
+        self._flush_if_full()
+
+    def _flush_if_full(self):
+        if self.flush_size and len(self._log) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            sent, log = self._sent, self._log
+            self._sent, self._log = [], []
+
+        if sent:
+            def mark_sent():
+                return supabase.rpc("mark_signed_copy_emails_sent", {"sends": sent}).execute()
+
+            try:
+                marked = with_retry(mark_sent).data or []
+                if len(marked) < len(sent):
+                    logging.warning(f"{len(sent) - len(marked)} recipients were already marked sent; left unchanged")
+            except Exception as e:
+                # Delivered but still email_sent = false: a re-run would email them again
+                logging.error(f"Failed to mark {len(sent)} recipients sent: {e} → ids {[s['id'] for s in sent]}")
+
+        if log:
+            # email_log is best-effort, as before
+            try:
+                with_retry(lambda: supabase.table("email_log").insert(log).execute())
+            except Exception as log_err:
+                logging.error(f"Failed to write {len(log)} email_log entries: {log_err}")
+
+
+# ---------------------------
+# BATCH RUNNER
+# ---------------------------
+def run_batches(rows, outcomes, dry_run=False, batch_size=DEFAULT_MAIL_BATCH_SIZE, send_rate=None):
+    """
+    Send `rows` through the Mailtrap batch API, `batch_size` messages per call.
+    `send_rate` is messages per second: each call takes one token per message.
+    Only the messages a batch rejected are sent again. A batch call is only
+    repeated, or replaced by per-message sends, when Mailtrap certainly
+    didn't take it (BatchNotAccepted). If it is still refused after retries
+    (rate limited, or Mailtrap unavailable), the run stops and the remaining
+    rows are left unsent. If it may have been delivered, its rows are logged
+    as "unknown" and not sent again. Outcomes are written once per call.
+
+    Returns (sent, failed, unknown, not_attempted).
+    """
+    limiter = TokenBucket(send_rate) if send_rate else None
+    sent = failed = unknown = 0
+
+    for i in range(0, len(rows), batch_size):
+        pending = rows[i:i + batch_size]
+        logging.info(f"\n--- Sending batch {i//batch_size + 1} ({len(pending)} messages) ---")
+
+        if dry_run:
+            logging.info(f"[DRY RUN] Would send {len(pending)} messages in one call")
+            sent += len(pending)
+            continue
+
+        for round_no in range(1, SEND_ROUNDS + 1):
+            rendered = [(row, *render(row)) for row in pending]
+            messages = [{"to": row["email"], "subject": email_subject(row), "html": html} for row, _token, html in rendered]
+
+            def send():
+                if limiter:
+                    limiter.acquire(len(messages))
+                return send_mailtrap_batch(messages)
+
+            try:
+                errors = with_retry(send, retry_on=BatchTemporarilyRefused)
+            except BatchTemporarilyRefused as e:
+                # Sending one by one would only add to the pressure: stop, leave the rest for a re-run
+                not_attempted = len(pending) + len(rows[i + batch_size:])
+                logging.error(f"Mailtrap still refusing batches after {MAX_RETRIES} attempts ({e}); stopping")
+                return sent, failed, unknown, not_attempted
+            except BatchNotAccepted as e:
+                logging.warning(f"Batch not accepted ({e}); falling back to per-message sends")
+                for row in pending:
+                    try:
+                        process_row(row, outcomes, limiter=limiter)
+                        sent += 1
+                    except Exception as row_err:
+                        outcomes.failed(row, str(row_err))
+                        failed += 1
+                outcomes.flush()
+                pending = []
+                break
+            except Exception as e:
+                # Mailtrap may have sent some or all of it: never send these again blind
+                logging.error(f"Batch outcome unknown ({e!r}); not resending {len(pending)} messages")
+                for row in pending:
+                    outcomes.failed(row, f"delivery unknown: {e!r}", status="unknown")
+                unknown += len(pending)
+                outcomes.flush()
+                pending = []
+                break
+
+            retry = []
+            for (row, token, _html), error in zip(rendered, errors):
+                if error is not None:
+                    outcomes.failed(row, error)
+                    retry.append(row)
+                else:
+                    outcomes.sent(row, token)
+                    sent += 1
+            outcomes.flush()
+
+            pending = retry
+            if not pending:
+                break
+            if round_no < SEND_ROUNDS:
+                logging.info(f"Retrying {len(pending)} rejected messages")
+
+        failed += len(pending)
+
+    return sent, failed, unknown, 0
+
+
+# ---------------------------
+# CONCURRENT RUNNER
+# ---------------------------
+def _format_seconds(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m" if seconds >= 3600 else f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+def run_concurrent(rows, outcomes, dry_run=False, workers=4, send_rate=DEFAULT_SEND_RATE):
+    """
+    Send `rows` from `workers` threads behind one TokenBucket, sharing
+    `outcomes`. Ctrl-C drains: workers finish the row in hand and take no more.
+
+    Returns (sent, failed, not_attempted).
+    """
+    total = len(rows)
+    limiter = TokenBucket(send_rate)
+    pending = queue.Queue()
+    for row in rows:
+        pending.put((row, 1))
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    counts = {"sent": 0, "failed": 0}
+
+    def finished():
+        return counts["sent"] + counts["failed"]
+
+    def worker():
+        while not stop.is_set():
+            with lock:
+                if finished() >= total:
+                    return
+            try:
+                row, attempt = pending.get(timeout=0.5)
+            except queue.Empty:
+                # Another worker may still put a retry back
+                continue
+
+            try:
+                process_row(row, outcomes, dry_run=dry_run, limiter=limiter)
+                with lock:
+                    counts["sent"] += 1
+            except Exception as e:
+                outcomes.failed(row, str(e))
+                if attempt < SEND_ROUNDS:
+                    pending.put((row, attempt + 1))
+                else:
+                    with lock:
+                        counts["failed"] += 1
+
+    logging.info(f"Sending with {workers} workers at up to {send_rate}/s")
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, name=f"sender-{n}", daemon=True) for n in range(workers)]
+    for t in threads:
+        t.start()
+
+    def report():
+        elapsed = time.monotonic() - started
+        done = finished()
+        rate = done / elapsed if elapsed else 0.0
+        eta = _format_seconds((total - done) / rate) if rate else "?"
+        logging.info(
+            f"Progress: {done}/{total} (sent {counts['sent']}, failed {counts['failed']}) "
+            f"{rate:.1f}/s, elapsed {_format_seconds(elapsed)}, ETA {eta}"
+        )
+
+    try:
+        last_report = started
+        while any(t.is_alive() for t in threads):
+            time.sleep(0.5)
+            if time.monotonic() - last_report >= PROGRESS_SECONDS:
+                report()
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
+        logging.warning("Interrupted: finishing in-flight sends (Ctrl-C again to abort)")
+        stop.set()
+        for t in threads:
+            t.join()
+
+    report()
+    return counts["sent"], counts["failed"], total - finished()
+
+
 # ---------------------------
 # MAIN RUNNER
 # ---------------------------
-def run(dry_run=False, batch_size=DEFAULT_BATCH_SIZE, sleep_seconds=DEFAULT_SLEEP_SECONDS, limit=None, randomize=False, exclude_emails=None):
+def run(dry_run=False, batch_size=DEFAULT_BATCH_SIZE, sleep_seconds=DEFAULT_SLEEP_SECONDS, limit=None, randomize=False, exclude_emails=None, campaign_key=DEFAULT_CAMPAIGN_KEY, workers=DEFAULT_WORKERS, send_rate=DEFAULT_SEND_RATE, transport="single", mail_batch_size=DEFAULT_MAIL_BATCH_SIZE):
     rows = supabase.table("signed_copy_campaign_recipients") \
-        .select("id,email,first_name,product_id,product_title,order_id,order_name,line_item_id,customer_id") \
+        .select("id,campaign_key,email,first_name,product_id,product_title,order_id,order_name,line_item_id,customer_id") \
+        .eq("campaign_key", campaign_key) \
         .eq("email_sent", False) \
         .execute().data
 
@@ -156,6 +487,48 @@ def run(dry_run=False, batch_size=DEFAULT_BATCH_SIZE, sleep_seconds=DEFAULT_SLEE
         logging.info("No recipients to send.")
         return
 
+    # Concurrent workers flush every batch_size outcomes; the other paths flush per batch
+    outcomes = Outcomes(flush_size=batch_size if workers > 1 and transport == "single" else None)
+    try:
+        _send_all(rows, outcomes, dry_run, batch_size, sleep_seconds, workers, send_rate, transport, mail_batch_size)
+    finally:
+        outcomes.flush()
+
+
+def _send_all(rows, outcomes, dry_run, batch_size, sleep_seconds, workers, send_rate, transport, mail_batch_size):
+    total = len(rows)
+
+    if transport == "batch":
+        sent, failed, unknown, not_attempted = run_batches(rows, outcomes, dry_run=dry_run, batch_size=mail_batch_size, send_rate=send_rate)
+        logging.info("\n--- RUN COMPLETE ---" if not not_attempted else "\n--- RUN STOPPED ---")
+        logging.info(f"Total: {total}")
+        if dry_run:
+            logging.info(f"Dry run processed: {sent}")
+        else:
+            logging.info(f"Success: {sent}")
+            logging.info(f"Failed: {failed}")
+        if unknown:
+            logging.warning(
+                f"Delivery unknown: {unknown} (email_log status 'unknown'; still email_sent = false, "
+                "so check Mailtrap and --exclude any that arrived before re-running)"
+            )
+        if not_attempted:
+            logging.info(f"Not attempted: {not_attempted} (still email_sent = false; re-run to continue)")
+        return
+
+    if workers > 1:
+        sent, failed, not_attempted = run_concurrent(rows, outcomes, dry_run=dry_run, workers=workers, send_rate=send_rate)
+        logging.info("\n--- RUN COMPLETE ---" if not not_attempted else "\n--- RUN STOPPED ---")
+        logging.info(f"Total: {total}")
+        if dry_run:
+            logging.info(f"Dry run processed: {sent}")
+        else:
+            logging.info(f"Success: {sent}")
+            logging.info(f"Failed: {failed}")
+        if not_attempted:
+            logging.info(f"Not attempted: {not_attempted} (still email_sent = false; re-run to continue)")
+        return
+
     success_count = 0
     failure_queue: List[dict] = []
 
@@ -168,31 +541,19 @@ def run(dry_run=False, batch_size=DEFAULT_BATCH_SIZE, sleep_seconds=DEFAULT_SLEE
 
         for row in batch:
             try:
-                result = process_row(row, dry_run=dry_run)
+                result = process_row(row, outcomes, dry_run=dry_run)
                 if result == "sent":
                     success_count += 1
 
             except Exception as e:
-                error_msg = str(e)
-                logging.error(f"FAILED → {row['email']} → {error_msg}")
-
                 failure_queue.append(row)
-
-                # failure log (non-blocking)
-                try:
-                    supabase.table("email_log").insert({
-                        "request_id": row["id"],
-                        "email": row["email"],
-                        "status": "failed",
-                        "error": error_msg,
-                        "sent_at": datetime.utcnow().isoformat()
-                    }).execute()
-                except Exception as log_err:
-                    logging.error(f"Failed to log error: {log_err}")
+                outcomes.failed(row, str(e))
 
             # rate limit
             time.sleep(sleep_seconds)
 
+        outcomes.flush()
+
     # ---------------------------
     # RETRY FAILED
     # ---------------------------
@@ -201,11 +562,13 @@ def run(dry_run=False, batch_size=DEFAULT_BATCH_SIZE, sleep_seconds=DEFAULT_SLEE
 
         for row in failure_queue:
             try:
-                process_row(row, dry_run=dry_run)
+                process_row(row, outcomes, dry_run=dry_run)
                 success_count += 1
             except Exception as e:
                 logging.error(f"FINAL FAIL → {row['email']} → {e}")
 
+        outcomes.flush()
+
     # ---------------------------
     # SUMMARY
     # ---------------------------
@@ -231,16 +594,31 @@ if __name__ == "__main__":
     parser.add_argument("--limit", type=int, default=None)
     parser.add_argument("--randomize", action="store_true")
     parser.add_argument("--exclude", type=str, default=None, help="Comma-separated emails to exclude")
+    # The email template is written for this campaign; only send others with a template to match
+    parser.add_argument("--campaign", type=str, default=DEFAULT_CAMPAIGN_KEY, help="campaign_key of the recipients to email")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="concurrent senders; >1 replaces --sleep with --rate")
+    parser.add_argument("--rate", type=float, default=DEFAULT_SEND_RATE, help="max messages per second across workers or batch calls (MAILTRAP_SEND_RATE)")
+    parser.add_argument("--transport", choices=["single", "batch"], default="single", help="one API call per email, or Mailtrap's batch API")
+    parser.add_argument("--mail-batch-size", type=int, default=DEFAULT_MAIL_BATCH_SIZE, help="messages per batch call (MAILTRAP_BATCH_SIZE)")
 
     args = parser.parse_args()
 
     exclude_emails = args.exclude.split(",") if args.exclude else None
 
-    run(
-        dry_run=args.dry_run,
-        batch_size=args.batch_size,
-        sleep_seconds=args.sleep,
-        limit=args.limit,
-        randomize=args.randomize,
-        exclude_emails=exclude_emails
-    )
\ No newline at end of file
+    try:
+        run(
+            dry_run=args.dry_run,
+            batch_size=args.batch_size,
+            sleep_seconds=args.sleep,
+            limit=args.limit,
+            randomize=args.randomize,
+            exclude_emails=exclude_emails,
+            campaign_key=args.campaign,
+            workers=args.workers,
+            send_rate=args.rate,
+            transport=args.transport,
+            mail_batch_size=args.mail_batch_size
+        )
+    finally:
+        logging.info(f"Upstream usage: {ledger_snapshot()}")
+        http_client.close_clients()
\ No newline at end of file
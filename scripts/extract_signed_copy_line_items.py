@@ -1,15 +1,17 @@
 import os
-import requests
 from dotenv import load_dotenv
 load_dotenv()
 
+from backend.app.shopify_throttle import throttled_graphql
+
 SHOP_URL = os.getenv("SHOP_URL")
 ACCESS_TOKEN = os.getenv("SHOPIFY_ACCESS_TOKEN")
 
 if not SHOP_URL or not ACCESS_TOKEN:
     raise ValueError("Missing SHOP_URL or SHOPIFY_ACCESS_TOKEN. Make sure your .env is loaded.")
 
-API_URL = f"https://{SHOP_URL}/admin/api/2024-01/graphql.json"
+SHOPIFY_BASE_URL = (os.getenv("SHOPIFY_BASE_URL") or f"https://{SHOP_URL}").rstrip("/")
+API_URL = f"{SHOPIFY_BASE_URL}/admin/api/2024-01/graphql.json"
 
 def fetch_order(order_id):
     query = """
@@ -38,16 +40,9 @@ def fetch_order(order_id):
 
     gid = f"gid://shopify/Order/{order_id}"
 
-    res = requests.post(
-        API_URL,
-        headers={
-            "X-Shopify-Access-Token": ACCESS_TOKEN,
-            "Content-Type": "application/json"
-        },
-        json={"query": query, "variables": {"id": gid}}
-    )
+    res = throttled_graphql(API_URL, ACCESS_TOKEN, query, {"id": gid})
 
-    return res.json()["data"]["order"]
+    return res["data"]["order"]
 
 
 def extract(order_id, target_product_id):
@@ -2,24 +2,59 @@
 """
 Ingest Signed Copy Orders
 
-- Fetches all Shopify orders (paginated)
-- Extracts line items matching TARGET_PRODUCT_ID
-- Builds normalized rows
-- Deduplicates by line_item_id
-- Inserts into Supabase
+- Fetches Shopify orders (paginated); after the first run, only orders
+  updated since the watermark stored in `signed_copy_ingest_state`
+- Narrows the search on Shopify's side by the target SKU and/or a
+  created-after date when configured, so only candidate orders are fetched
+- Pages through the rest of an order's line items when it has more than
+  fit in the first page
+- Reads the active campaigns from `signed_copy_campaigns` (campaign_key,
+  product ids, title, order window) and checks every line item against one
+  product-id -> campaigns map, so N concurrent campaigns cost one scan
+- Builds normalized rows, one per matching campaign
+- Streams page by page: dedupes on a set of (campaign_key, line_item_id),
+  so memory stays flat however many orders are scanned
+- Upserts rows into Supabase in chunks as they accumulate, then checkpoints
+  the page cursor; pages with nothing left unwritten are checkpointed as they
+  pass, and a partial chunk is flushed every CHECKPOINT_PAGES pages or
+  CHECKPOINT_SECONDS, so a run that crashes or throttles out resumes close to
+  where it stopped whatever the chunk size
+- With --pipelined, fetching, row-building and writing overlap: a thread
+  prefetches Shopify pages and another writes chunks, connected by bounded
+  queues; all Shopify calls still share one cost budget (shopify_throttle)
 
 Supports:
     --dry-run  (no DB writes)
+    --full     (ignore the watermark and scan every order)
+    --restart  (discard an unfinished run's cursor instead of resuming it)
+    --sku      (only orders containing this SKU; default SIGNED_COPY_TARGET_SKU;
+                only with a single campaign)
+    --since    (only orders created on/after this date; default SIGNED_COPY_ORDERS_SINCE)
+    --chunk-size  (rows per upsert, default 500)
+    --pipelined   (overlap page fetches with row-building and upserts)
+    --campaign    (only this campaign_key, active or not; repeatable)
+
+Run from the repo root:
+    python -m scripts.ingest_signed_copy_orders
 """
 
 import os
+import time
+import queue
 import argparse
 import logging
-from typing import List, Dict, Any
+import threading
+import contextvars
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
 
 from dotenv import load_dotenv
 from supabase import create_client
 
+from backend.app import http_client
+from backend.app.shopify_throttle import throttled_graphql
+from backend.app.tracing import ledger_snapshot, traced
+
 # --- ENV SETUP ---
 load_dotenv()
 
@@ -28,10 +63,22 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
 SHOP_URL = os.getenv("SHOP_URL")
 SHOPIFY_ACCESS_TOKEN = os.getenv("SHOPIFY_ACCESS_TOKEN")
+SHOPIFY_BASE_URL = (os.getenv("SHOPIFY_BASE_URL") or f"https://{SHOP_URL}").rstrip("/")
 
 # --- CONFIG ---
-TARGET_PRODUCT_ID = "gid://shopify/Product/7179329437829"
-TARGET_TITLE = "The Noma Guide to Building Flavour"
+CAMPAIGNS_TABLE = "signed_copy_campaigns"
+RECIPIENTS_TABLE = "signed_copy_campaign_recipients"
+STATE_TABLE = "signed_copy_ingest_state"
+STATE_KEY = "signed_copy_orders"  # + ":" + the scanned campaign keys
+DEFAULT_CHUNK_SIZE = 500
+PREFETCH_PAGES = 2   # --pipelined: pages fetched ahead of row-building
+WRITE_QUEUE = 2      # --pipelined: chunks waiting for the writer
+CHECKPOINT_PAGES = 20      # flush a partial chunk at least this often...
+CHECKPOINT_SECONDS = 60.0  # ...or after this long, so the resume cursor keeps up
+
+# Optional Shopify-side search narrowing; line items are still matched on campaign product ids
+TARGET_SKU = os.getenv("SIGNED_COPY_TARGET_SKU")
+ORDERS_SINCE = os.getenv("SIGNED_COPY_ORDERS_SINCE")  # e.g. the preorder launch date, 2025-09-01
 
 # --- LOGGING ---
 logging.basicConfig(level=logging.INFO, format="%(message)s")
@@ -49,51 +96,35 @@ def extract_id(gid: str) -> int:
 
 
 def shopify_graphql(query: str, variables: dict) -> dict:
-    import requests
-    import time
-
-    url = f"https://{SHOP_URL}/admin/api/2024-01/graphql.json"
+    url = f"{SHOPIFY_BASE_URL}/admin/api/2024-01/graphql.json"
 
-    headers = {
-        "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN,
-        "Content-Type": "application/json",
-    }
-
-    while True:
-        resp = requests.post(
-            url,
-            json={"query": query, "variables": variables},
-            headers=headers,
-        )
+    # Paces each page against the shop's leaky bucket (throttleStatus /
+    # requestedQueryCost) and retries THROTTLED responses after the exact wait
+    data = throttled_graphql(url, SHOPIFY_ACCESS_TOKEN, query, variables)
 
-        # --- HTTP-level failure ---
-        if resp.status_code != 200:
-            raise Exception(f"Shopify HTTP error: {resp.text}")
+    # Any other GraphQL error → fail fast
+    if "errors" in data:
+        raise Exception(f"GraphQL errors: {data['errors']}")
 
-        data = resp.json()
+    return data["data"]
 
-        # --- GraphQL errors ---
-        if "errors" in data:
-            errors = data["errors"]
 
-            # Handle rate limiting
-            if any(
-                e.get("extensions", {}).get("code") == "THROTTLED"
-                for e in errors
-            ):
-                log.warning("⚠️ Shopify throttled. Sleeping 2 seconds and retrying...")
-                time.sleep(2)
-                continue
+def _parse_ts(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
 
-            # Any other GraphQL error → fail fast
-            raise Exception(f"GraphQL errors: {errors}")
 
-        return data["data"]
+def in_window(campaign: Dict[str, Any], created_at: Optional[datetime]) -> bool:
+    """Orders count for a campaign only if placed within its starts_at/ends_at (either may be open)"""
+    if created_at is None:
+        return True
+    starts_at, ends_at = _parse_ts(campaign.get("starts_at")), _parse_ts(campaign.get("ends_at"))
+    return (starts_at is None or created_at >= starts_at) and (ends_at is None or created_at <= ends_at)
 
 
-def build_rows(order: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Extract matching line items from an order"""
+def build_rows(order: Dict[str, Any], by_product: Dict[int, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Extract line items matching any campaign's products from an order, one row per campaign"""
     rows = []
+    created_at = _parse_ts(order.get("createdAt"))
 
     for edge in order["lineItems"]["edges"]:
         li = edge["node"]
@@ -102,7 +133,9 @@ def build_rows(order: Dict[str, Any]) -> List[Dict[str, Any]]:
         if not product:
             continue
 
-        if product["id"] != TARGET_PRODUCT_ID:
+        product_id = extract_id(product["id"])
+        campaigns = by_product.get(product_id)
+        if not campaigns:
             continue
 
         customer = order.get("customer") or {}
@@ -110,31 +143,36 @@ def build_rows(order: Dict[str, Any]) -> List[Dict[str, Any]]:
         first_name = (customer.get("firstName") or "").strip() or None
         customer_id = extract_id(customer["id"]) if customer.get("id") else None
 
-        row = {
-            "email": order.get("email"),
-            "first_name": first_name,
-            "customer_first_name": first_name,
-            "product_id": extract_id(TARGET_PRODUCT_ID),
-            "product_title": TARGET_TITLE,
-            "order_id": extract_id(order["id"]),
-            "order_name": order["name"],
-            "order_number": int(order["name"].replace("#", "")),
-            "line_item_id": extract_id(li["id"]),
-            "customer_id": (customer_id),
-        }
+        for campaign in campaigns:
+            if not in_window(campaign, created_at):
+                continue
 
-        rows.append(row)
+            row = {
+                "campaign_key": campaign["campaign_key"],
+                "email": order.get("email"),
+                "first_name": first_name,
+                "customer_first_name": first_name,
+                "product_id": product_id,
+                "product_title": campaign["title"],
+                "order_id": extract_id(order["id"]),
+                "order_name": order["name"],
+                "order_number": int(order["name"].replace("#", "")),
+                "line_item_id": extract_id(li["id"]),
+                "customer_id": (customer_id),
+            }
+
+            rows.append(row)
 
     return rows
 
 
-def dedupe_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Remove duplicate line_item_id"""
-    seen = set()
+def dedupe_rows(rows: List[Dict[str, Any]], seen: Optional[set] = None) -> List[Dict[str, Any]]:
+    """Remove duplicate (campaign_key, line_item_id) (including any already in `seen`)"""
+    seen = set() if seen is None else seen
     deduped = []
 
     for row in rows:
-        lid = row["line_item_id"]
+        lid = (row["campaign_key"], row["line_item_id"])
         if lid in seen:
             continue
         seen.add(lid)
@@ -143,101 +181,431 @@ def dedupe_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return deduped
 
 
-# --- MAIN INGESTION ---
+def build_search(updated_since: Optional[str], sku: Optional[str] = None, created_since: Optional[str] = None) -> str:
+    terms = ["status:any"]
+    if sku:
+        terms.append(f"sku:'{sku}'")
+    if created_since:
+        terms.append(f"created_at:>='{created_since}'")
+    if updated_since:
+        terms.append(f"updated_at:>='{updated_since}'")
+    return " ".join(terms)
 
-def ingest(dry_run: bool = False):
-    log.info("Starting ingestion...")
 
-    query = """
-    query ($cursor: String) {
-      orders(first: 50, after: $cursor, query: "status:any") {
-        pageInfo {
-          hasNextPage
-          endCursor
+ORDERS_QUERY = """
+query ($cursor: String, $search: String) {
+  orders(first: 50, after: $cursor, query: $search) {
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+    edges {
+      node {
+        id
+        name
+        email
+        createdAt
+        customer {
+          id
+          firstName
         }
-        edges {
-          node {
-            id
-            name
-            email
-            customer {
+        lineItems(first: 20) {
+          pageInfo {
+            hasNextPage
+            endCursor
+          }
+          edges {
+            node {
               id
-              firstName
-            }
-            lineItems(first: 50) {
-              edges {
-                node {
-                  id
-                  product {
-                    id
-                  }
-                }
+              product {
+                id
               }
             }
           }
         }
       }
     }
-    """
+  }
+}
+"""
+
+
+LINE_ITEMS_QUERY = """
+query ($id: ID!, $cursor: String) {
+  order(id: $id) {
+    lineItems(first: 100, after: $cursor) {
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+      edges {
+        node {
+          id
+          product {
+            id
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def complete_line_items(order: Dict[str, Any]) -> Dict[str, Any]:
+    """Fetch the rest of an order's line items when the first page didn't hold them all"""
+    line_items = order["lineItems"]
+    edges = list(line_items["edges"])
+
+    while line_items["pageInfo"]["hasNextPage"]:
+        data = shopify_graphql(LINE_ITEMS_QUERY, {"id": order["id"], "cursor": line_items["pageInfo"]["endCursor"]})
+        line_items = data["order"]["lineItems"]
+        edges.extend(line_items["edges"])
+
+    order["lineItems"] = {"pageInfo": line_items["pageInfo"], "edges": edges}
+    return order
 
-    all_rows = []
-    cursor = None
-    page = 1
 
+def iter_pages(search: str, cursor: Optional[str] = None) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str], bool]]:
+    """Yield (orders with complete line items, endCursor, hasNextPage) one page at a time"""
     while True:
-        log.info(f"Fetching page {page}...")
+        data = shopify_graphql(ORDERS_QUERY, {"cursor": cursor, "search": search})
+        connection = data["orders"]
+        orders = [edge["node"] for edge in connection["edges"]]
 
-        data = shopify_graphql(query, {"cursor": cursor})
-        orders = data["orders"]["edges"]
+        extra_pages = 0
+        for order in orders:
+            if order["lineItems"]["pageInfo"]["hasNextPage"]:
+                extra_pages += 1
+                complete_line_items(order)
+        if extra_pages:
+            log.info(f"Paged further line items for {extra_pages} large orders")
 
-        for edge in orders:
-            order = edge["node"]
-            rows = build_rows(order)
-            all_rows.extend(rows)
+        cursor = connection["pageInfo"]["endCursor"]
+        has_next = connection["pageInfo"]["hasNextPage"]
+        yield orders, cursor, has_next
 
-        if not data["orders"]["pageInfo"]["hasNextPage"]:
-            break
+        if not has_next:
+            return
 
-        cursor = data["orders"]["pageInfo"]["endCursor"]
-        page += 1
 
-    log.info(f"\nTotal raw matches: {len(all_rows)}")
+# --- CAMPAIGNS ---
 
-    deduped = dedupe_rows(all_rows)
+def load_campaigns(keys: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """The named campaigns, or every active one"""
+    query = supabase.table(CAMPAIGNS_TABLE) \
+        .select("campaign_key,title,product_ids,starts_at,ends_at")
+    query = query.in_("campaign_key", keys) if keys else query.eq("active", True)
+    return query.order("campaign_key").execute().data or []
 
-    log.info(f"After dedupe: {len(deduped)}")
 
-    # --- VALIDATION SNAPSHOT ---
-    missing_email = sum(1 for r in deduped if not r["email"])
-    missing_name = sum(1 for r in deduped if not r["first_name"])
+def index_campaigns(campaigns: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+    """product id -> the campaigns it belongs to"""
+    by_product: Dict[int, List[Dict[str, Any]]] = {}
+    for campaign in campaigns:
+        for product_id in campaign["product_ids"] or []:
+            by_product.setdefault(int(product_id), []).append(campaign)
+    return by_product
+
+
+def earliest_start(campaigns: List[Dict[str, Any]]) -> Optional[str]:
+    """The earliest starts_at, if every campaign has one; orders before it can't match"""
+    starts = [c.get("starts_at") for c in campaigns]
+    if not starts or None in starts:
+        return None
+    return min(starts, key=_parse_ts)
+
 
-    log.info(f"Missing emails: {missing_email}")
-    log.info(f"Missing first names: {missing_name}")
+# --- CHECKPOINT ---
+
+def load_state(key: str) -> Dict[str, Any]:
+    res = supabase.table(STATE_TABLE) \
+        .select("*") \
+        .eq("key", key) \
+        .limit(1) \
+        .execute()
+    return res.data[0] if res.data else {}
+
+
+def save_state(key: str, **fields):
+    supabase.table(STATE_TABLE).upsert({
+        "key": key,
+        **fields,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }, on_conflict="key").execute()
+
+
+def write_rows(rows: List[Dict[str, Any]]):
+    # Re-ingested line items update in place; email_sent/token are never in the payload
+    supabase.table(RECIPIENTS_TABLE) \
+        .upsert(rows, on_conflict="campaign_key,line_item_id") \
+        .execute()
+
+
+# --- PIPELINE ---
+
+_DONE = object()
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """Block until `item` fits in `q`, unless the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _start_thread(target: Callable, *args) -> threading.Thread:
+    # Copy contextvars so upstream spans stay attributed to ingest()
+    ctx = contextvars.copy_context()
+    thread = threading.Thread(target=ctx.run, args=(target, *args), daemon=True)
+    thread.start()
+    return thread
+
+
+def prefetch(items: Iterator[Any], depth: int, stop: threading.Event) -> Iterator[Any]:
+    """
+    Run `items` on a thread up to `depth` items ahead of the consumer. Raises
+    if `stop` is set (another stage failed) before the producer finishes.
+    """
+    q: queue.Queue = queue.Queue(maxsize=depth)
+
+    def produce():
+        try:
+            for item in items:
+                if not _put(q, item, stop):
+                    return
+            _put(q, _DONE, stop)
+        except BaseException as e:
+            _put(q, e, stop)
+
+    _start_thread(produce)
+    while True:
+        try:
+            item = q.get(timeout=0.5)
+        except queue.Empty:
+            # The producer gives up putting once stop is set; don't wait on it
+            if stop.is_set():
+                raise RuntimeError("Ingest pipeline stopped")
+            continue
+        if item is _DONE:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+class BackgroundWriter:
+    """Runs submitted jobs in order on one thread, behind a bounded queue."""
+
+    def __init__(self, depth: int, stop: threading.Event):
+        self.stop = stop
+        self.error: Optional[BaseException] = None
+        self.queue: queue.Queue = queue.Queue(maxsize=depth)
+        self.thread = _start_thread(self._run)
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is _DONE:
+                return
+            try:
+                job()
+            except BaseException as e:
+                self.error = e
+                self.stop.set()
+                return
+
+    def _raise_if_failed(self):
+        if self.error is not None:
+            raise self.error
+
+    def submit(self, job: Callable[[], None]):
+        self._raise_if_failed()
+        if not _put(self.queue, job, self.stop):
+            self._raise_if_failed()
+            raise RuntimeError("Ingest pipeline stopped")
+
+    def close(self):
+        """Wait for every submitted job; re-raise the first failure."""
+        if _put(self.queue, _DONE, self.stop):
+            self.thread.join()
+        self._raise_if_failed()
+
+
+# --- MAIN INGESTION ---
+
+@traced
+def ingest(
+    dry_run: bool = False,
+    full: bool = False,
+    restart: bool = False,
+    sku: Optional[str] = TARGET_SKU,
+    since: Optional[str] = ORDERS_SINCE,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    pipelined: bool = False,
+    campaign_keys: Optional[List[str]] = None,
+):
+    log.info("Starting ingestion..." + (" (pipelined)" if pipelined else ""))
+
+    campaigns = load_campaigns(campaign_keys)
+    if not campaigns:
+        raise RuntimeError(f"No campaigns to ingest; add rows to {CAMPAIGNS_TABLE} or pass --campaign")
+    by_product = index_campaigns(campaigns)
+    log.info(f"Campaigns: {', '.join(c['campaign_key'] for c in campaigns)} ({len(by_product)} products)")
+    if sku and len(campaigns) > 1:
+        # One SKU filter on the shared scan would drop every other campaign's orders,
+        # and the watermark would then move past them for good
+        raise RuntimeError(
+            f"--sku / SIGNED_COPY_TARGET_SKU narrows the scan to one product but {len(campaigns)} campaigns "
+            "are being ingested; pass --campaign to pick one, or unset the SKU"
+        )
+
+    # The checkpoint belongs to this set of campaigns: adding one starts a fresh full scan
+    state_key = f"{STATE_KEY}:{','.join(c['campaign_key'] for c in campaigns)}"
+    state = load_state(state_key)
+    since = since or earliest_start(campaigns)
+
+    if state.get("run_cursor") and not (full or restart):
+        # An earlier run stopped part-way: continue the same search after its last written page
+        started_at = state["run_started_at"]
+        search = state["run_search"]
+        cursor = state["run_cursor"]
+        page = int(state.get("run_pages") or 0) + 1
+        written = int(state.get("run_rows") or 0)
+        log.info(f"Resuming run started {started_at} at page {page} ({written} rows already written)")
+    else:
+        started_at = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+        watermark = None if full else state.get("last_synced_at")
+        search = build_search(watermark, sku, since)
+        cursor = None
+        page = 1
+        written = 0
+        if watermark:
+            log.info(f"Incremental scan: orders updated since {watermark}")
+        else:
+            log.info("Full order history scan")
+    log.info(f"Order search: {search}")
+
+    totals = {"raw": 0, "unique": 0, "missing_email": 0, "missing_name": 0}
+    seen = set()
+    chunk: List[Dict[str, Any]] = []
+    samples: List[Dict[str, Any]] = []
+
+    stop = threading.Event()
+    pages = iter_pages(search, cursor)
+    writer = None
+    if pipelined:
+        pages = prefetch(pages, PREFETCH_PAGES, stop)
+        if not dry_run:
+            writer = BackgroundWriter(WRITE_QUEUE, stop)
+
+    def write_job(rows: List[Dict[str, Any]], page_no: int, next_cursor: Optional[str], total: int):
+        def job():
+            if rows:
+                write_rows(rows)
+                log.info(f"Upserted {len(rows)} rows (page {page_no}, {total} this run)")
+            # Checkpoint only once every row up to this page is written
+            save_state(
+                state_key,
+                run_started_at=started_at,
+                run_search=search,
+                run_cursor=next_cursor,
+                run_pages=page_no,
+                run_rows=total,
+            )
+        return job
+
+    checkpointed_page = page - 1
+    checkpointed_at = time.monotonic()
+
+    def flush(page_no: int, next_cursor: Optional[str]):
+        nonlocal chunk, written, checkpointed_page, checkpointed_at
+        written += len(chunk)
+        checkpointed_page, checkpointed_at = page_no, time.monotonic()
+        job = write_job(chunk, page_no, next_cursor, written)
+        chunk = []
+        if writer:
+            writer.submit(job)
+        else:
+            job()
+
+    try:
+        for orders, next_cursor, has_next in pages:
+            page_rows = [row for order in orders for row in build_rows(order, by_product)]
+            totals["raw"] += len(page_rows)
+
+            # Dedupe against every line_item_id seen this run so far
+            for r in dedupe_rows(page_rows, seen):
+                totals["unique"] += 1
+                if not r["first_name"]:
+                    totals["missing_name"] += 1
+                if not r["email"]:
+                    totals["missing_email"] += 1
+                    log.warning(f"Skipping row with missing email: {r['order_name']} (line_item_id={r['line_item_id']})")
+                    continue
+                if dry_run:
+                    if len(samples) < 5:
+                        samples.append(r)
+                    continue
+                chunk.append(r)
+
+            log.info(f"Page {page}: {len(orders)} orders, {totals['unique']} unique matches so far")
+
+            # Checkpoint when nothing is pending (just the cursor), when the chunk is
+            # full, and at least every CHECKPOINT_PAGES pages / CHECKPOINT_SECONDS
+            if not dry_run and (
+                not chunk
+                or len(chunk) >= chunk_size
+                or not has_next
+                or page - checkpointed_page >= CHECKPOINT_PAGES
+                or time.monotonic() - checkpointed_at >= CHECKPOINT_SECONDS
+            ):
+                flush(page, next_cursor if has_next else None)
+
+            page += 1
+
+        if writer:
+            writer.close()
+    except BaseException as e:
+        # Unblock the prefetch and writer threads
+        stop.set()
+        if writer and writer.error is not None and writer.error is not e:
+            # The writer's failure is what stopped the pipeline
+            raise writer.error from e
+        raise
+
+    log.info(f"\nTotal raw matches: {totals['raw']}")
+    log.info(f"After dedupe: {totals['unique']}")
+
+    # --- VALIDATION SNAPSHOT ---
+    log.info(f"Missing emails: {totals['missing_email']}")
+    log.info(f"Missing first names: {totals['missing_name']}")
 
     # --- DRY RUN ---
     if dry_run:
         log.info("\n[DRY RUN] Sample rows:")
-        for r in deduped[:5]:
+        for r in samples:
             log.info(r)
         return
-    
-    valid_rows = [r for r in deduped if r["email"]]
-    invalid_rows = [r for r in deduped if not r["email"]]
-
-    log.info(f"Valid rows: {len(valid_rows)}")
-    log.info(f"Skipped (missing email): {len(invalid_rows)}")
-
-    for r in invalid_rows:
-        log.warning(f"Skipping row with missing email: {r['order_name']} (line_item_id={r['line_item_id']})")
-
-    # --- INSERT ---
-    if valid_rows:
-        log.info("\nInserting into Supabase...")
-        supabase.table("signed_copy_campaign_recipients") \
-            .insert(valid_rows, upsert=True) \
-            .execute()
-        log.info(f"Insert complete. Added {len(valid_rows)} rows.")
 
+    log.info(f"Rows written this run: {written}")
+    log.info(f"Skipped (missing email): {totals['missing_email']}")
+
+    # The run is complete: advance the watermark to when it started and clear the cursor
+    save_state(
+        state_key,
+        last_synced_at=started_at,
+        run_started_at=None,
+        run_search=None,
+        run_cursor=None,
+        run_pages=0,
+        run_rows=0,
+    )
+    log.info(f"Watermark saved: {started_at}")
     log.info("Done.")
 
 
@@ -246,7 +614,27 @@ def ingest(dry_run: bool = False):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--full", action="store_true", help="ignore the watermark and scan every order")
+    parser.add_argument("--restart", action="store_true", help="discard an unfinished run instead of resuming it")
+    parser.add_argument("--sku", default=TARGET_SKU, help="only fetch orders containing this SKU (single campaign only)")
+    parser.add_argument("--since", default=ORDERS_SINCE, help="only fetch orders created on/after this date")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--pipelined", action="store_true", help="overlap page fetches with row-building and upserts")
+    parser.add_argument("--campaign", action="append", dest="campaigns", help="campaign_key to ingest (default: every active campaign)")
 
     args = parser.parse_args()
 
-    ingest(dry_run=args.dry_run)
\ No newline at end of file
+    try:
+        ingest(
+            dry_run=args.dry_run,
+            full=args.full,
+            restart=args.restart,
+            sku=args.sku,
+            since=args.since,
+            chunk_size=args.chunk_size,
+            pipelined=args.pipelined,
+            campaign_keys=args.campaigns,
+        )
+    finally:
+        log.info(f"Upstream usage: {ledger_snapshot()}")
+        http_client.close_clients()
\ No newline at end of file
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Sync Shopify Catalog Mirror
+
+- Starts a Shopify bulkOperationRunQuery for products, variants (barcode/SKU),
+  tags and collections
+- Polls until the bulk operation completes
+- Stream-parses the resulting JSONL line by line (one product in memory at a time)
+- Upserts products into `catalog_products` in chunks
+- Stores a last-synced watermark in `catalog_sync_state`; later runs only ask
+  Shopify for products updated since that watermark
+- Adding a product to a collection doesn't bump its `updatedAt`, so
+  incremental runs can't see membership changes (e.g. a title moving into
+  "Out-of-Print Offers"). A run becomes a full rescan once the last full one
+  is older than CATALOG_FULL_SYNC_HOURS (default 24), so scheduling this
+  script (e.g. hourly cron) keeps collections at most that stale
+
+Supports:
+    --full        (ignore the watermark, rescan every product and prune deleted ones)
+    --dry-run     (parse and count, no DB writes)
+    --chunk-size  (rows per upsert, default 500)
+
+Run from the repo root:
+    python -m scripts.sync_catalog_mirror
+"""
+
+import os
+import json
+import time
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+from backend.app import http_client
+from backend.app.shopify_throttle import throttled_graphql
+from backend.app.tracing import ledger_snapshot, traced
+
+# --- ENV SETUP ---
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+SHOP_URL = os.getenv("SHOP_URL")
+SHOPIFY_ACCESS_TOKEN = os.getenv("SHOPIFY_ACCESS_TOKEN")
+SHOPIFY_BASE_URL = (os.getenv("SHOPIFY_BASE_URL") or f"https://{SHOP_URL}").rstrip("/")
+SHOPIFY_API_VERSION = os.getenv("SHOPIFY_API_VERSION", "2024-10")
+
+# --- CONFIG ---
+MIRROR_TABLE = "catalog_products"
+STATE_TABLE = "catalog_sync_state"
+STATE_KEY = "catalog_products"
+DEFAULT_CHUNK_SIZE = 500
+POLL_SECONDS = 5
+# Incremental runs turn into a full rescan once the last full one is this old (0 = never)
+FULL_SYNC_HOURS = float(os.getenv("CATALOG_FULL_SYNC_HOURS", "24"))
+
+# --- LOGGING ---
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+log = logging.getLogger()
+
+# --- CLIENTS ---
+supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+
+# --- HELPERS ---
+
+def extract_id(gid: str) -> int:
+    """Convert Shopify GID to numeric ID"""
+    return int(gid.split("/")[-1])
+
+
+def shopify_graphql(query: str, variables: Optional[dict] = None) -> dict:
+    url = f"{SHOPIFY_BASE_URL}/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
+
+    data = throttled_graphql(url, SHOPIFY_ACCESS_TOKEN, query, variables)
+    if "errors" in data:
+        raise Exception(f"GraphQL errors: {data['errors']}")
+
+    return data["data"]
+
+
+def build_bulk_query(updated_since: Optional[str]) -> str:
+    search = f'(query: "updated_at:>=\'{updated_since}\'")' if updated_since else ""
+    return f"""
+    {{
+      products{search} {{
+        edges {{
+          node {{
+            id
+            title
+            handle
+            status
+            tags
+            updatedAt
+            variants {{
+              edges {{
+                node {{
+                  id
+                  barcode
+                  sku
+                }}
+              }}
+            }}
+            collections {{
+              edges {{
+                node {{
+                  id
+                  title
+                  handle
+                }}
+              }}
+            }}
+          }}
+        }}
+      }}
+    }}
+    """
+
+
+def start_bulk_operation(bulk_query: str) -> str:
+    mutation = """
+    mutation RunCatalogBulk($query: String!) {
+      bulkOperationRunQuery(query: $query) {
+        bulkOperation {
+          id
+          status
+        }
+        userErrors {
+          field
+          message
+        }
+      }
+    }
+    """
+    data = shopify_graphql(mutation, {"query": bulk_query})
+    result = data["bulkOperationRunQuery"]
+
+    if result["userErrors"]:
+        raise Exception(f"bulkOperationRunQuery failed: {result['userErrors']}")
+
+    return result["bulkOperation"]["id"]
+
+
+def wait_for_bulk_operation(operation_id: str) -> Dict[str, Any]:
+    query = """
+    query BulkStatus($id: ID!) {
+      node(id: $id) {
+        ... on BulkOperation {
+          id
+          status
+          errorCode
+          objectCount
+          url
+          partialDataUrl
+        }
+      }
+    }
+    """
+
+    while True:
+        op = shopify_graphql(query, {"id": operation_id})["node"]
+        status = op["status"]
+
+        if status == "COMPLETED":
+            return op
+        if status in {"FAILED", "CANCELED", "EXPIRED"}:
+            raise Exception(f"Bulk operation {status}: {op.get('errorCode')}")
+
+        log.info(f"Bulk operation {status} ({op.get('objectCount')} objects so far)...")
+        time.sleep(POLL_SECONDS)
+
+
+def stream_jsonl(url: str) -> Iterator[Dict[str, Any]]:
+    """Yield one parsed JSONL record at a time without buffering the file."""
+    with http_client.get_client(url).stream("GET", url) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
+def new_product_row(record: Dict[str, Any], synced_at: str) -> Dict[str, Any]:
+    return {
+        "product_id": extract_id(record["id"]),
+        "title": record.get("title"),
+        "handle": record.get("handle"),
+        "status": record.get("status"),
+        "tags": record.get("tags") or [],
+        "barcodes": [],
+        "skus": [],
+        "variant_ids": [],
+        "collection_titles": [],
+        "collection_handles": [],
+        "shopify_updated_at": record.get("updatedAt"),
+        "synced_at": synced_at,
+    }
+
+
+def iter_products(records: Iterator[Dict[str, Any]], synced_at: str, stats: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Fold the flat bulk JSONL back into one row per product.
+
+    Bulk output lists each product before its children (variants and
+    collections, linked by `__parentId`), so only the current product is
+    held in memory. Children that don't follow their product are counted
+    in `stats["orphans"]`.
+    """
+    current = None
+    stats = stats if stats is not None else {}
+    stats.setdefault("orphans", 0)
+
+    for record in records:
+        gid = record.get("id", "")
+        parent = record.get("__parentId")
+
+        if parent is None:
+            if current:
+                yield current
+            current = new_product_row(record, synced_at)
+            continue
+
+        if current is None or extract_id(parent) != current["product_id"]:
+            log.warning(f"Orphan child record {gid} (parent {parent}), skipping")
+            stats["orphans"] += 1
+            continue
+
+        if "/ProductVariant/" in gid:
+            current["variant_ids"].append(extract_id(gid))
+            if record.get("barcode"):
+                current["barcodes"].append(record["barcode"].strip())
+            if record.get("sku"):
+                current["skus"].append(record["sku"].strip())
+        elif "/Collection/" in gid:
+            if record.get("title"):
+                current["collection_titles"].append(record["title"])
+            if record.get("handle"):
+                current["collection_handles"].append(record["handle"])
+
+    if current:
+        yield current
+
+
+def upsert_chunk(rows: List[Dict[str, Any]]):
+    supabase.table(MIRROR_TABLE) \
+        .upsert(rows, on_conflict="product_id") \
+        .execute()
+
+
+def load_state() -> Dict[str, Any]:
+    res = supabase.table(STATE_TABLE) \
+        .select("last_synced_at,last_full_sync_at") \
+        .eq("key", STATE_KEY) \
+        .limit(1) \
+        .execute()
+    return res.data[0] if res.data else {}
+
+
+def full_sync_due(last_full_sync_at: Optional[str]) -> bool:
+    if not FULL_SYNC_HOURS:
+        return False
+    if not last_full_sync_at:
+        return True
+    last = datetime.fromisoformat(last_full_sync_at.replace("Z", "+00:00"))
+    return datetime.now(timezone.utc) - last >= timedelta(hours=FULL_SYNC_HOURS)
+
+
+def save_watermark(started_at: str, operation_id: str, object_count: int, full: bool):
+    state = {
+        "key": STATE_KEY,
+        "last_synced_at": started_at,
+        "last_bulk_operation_id": operation_id,
+        "last_object_count": object_count,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if full:
+        state["last_full_sync_at"] = started_at
+    supabase.table(STATE_TABLE).upsert(state, on_conflict="key").execute()
+
+
+# --- MAIN SYNC ---
+
+@traced
+def sync(full: bool = False, dry_run: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    started_at = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+
+    state = {} if full else load_state()
+    if not full and full_sync_due(state.get("last_full_sync_at")):
+        log.info(f"Last full sync {state.get('last_full_sync_at') or 'never'}; rescanning everything to refresh collections")
+        full = True
+    watermark = None if full else state.get("last_synced_at")
+    if watermark:
+        log.info(f"Incremental sync: products updated since {watermark}")
+    else:
+        log.info("Full catalog sync")
+
+    operation_id = start_bulk_operation(build_bulk_query(watermark))
+    log.info(f"Started bulk operation {operation_id}")
+
+    op = wait_for_bulk_operation(operation_id)
+    object_count = int(op.get("objectCount") or 0)
+    log.info(f"Bulk operation complete: {object_count} objects")
+
+    total = 0
+    chunk: List[Dict[str, Any]] = []
+    stats = {"orphans": 0}
+
+    # No url means the query matched nothing
+    if op.get("url"):
+        for row in iter_products(stream_jsonl(op["url"]), started_at, stats):
+            total += 1
+            if dry_run:
+                if total <= 5:
+                    log.info(f"[DRY RUN] {row}")
+                continue
+
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                upsert_chunk(chunk)
+                log.info(f"Upserted {total} products...")
+                chunk = []
+
+    if chunk:
+        upsert_chunk(chunk)
+
+    log.info(f"Products parsed: {total}")
+    if stats["orphans"]:
+        log.error(f"Orphan child records: {stats['orphans']} (their products' variants/collections are incomplete)")
+
+    if dry_run:
+        log.info("[DRY RUN] No DB writes.")
+        return
+
+    if full:
+        # Anything not touched by a full rescan no longer exists in Shopify
+        pruned = supabase.table(MIRROR_TABLE) \
+            .delete() \
+            .lt("synced_at", started_at) \
+            .execute()
+        log.info(f"Pruned {len(pruned.data or [])} deleted products")
+
+    if stats["orphans"]:
+        # Keep the old watermark so the next run fetches those products again
+        raise RuntimeError(f"{stats['orphans']} orphan child records; watermark not advanced")
+
+    save_watermark(started_at, operation_id, object_count, full)
+    log.info(f"Watermark saved: {started_at}")
+    log.info("Done.")
+
+
+# --- ENTRYPOINT ---
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--full", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    args = parser.parse_args()
+
+    try:
+        sync(full=args.full, dry_run=args.dry_run, chunk_size=args.chunk_size)
+    finally:
+        log.info(f"Upstream usage: {ledger_snapshot()}")
+        http_client.close_clients()
@@ -6,3 +6,334 @@ create table product_interest_requests (
   email text not null,
   created_at timestamptz default now()
 );
+
+
+-- Deferred Shopify enrichment (ENRICHMENT_MODE=deferred).
+-- NULL status = enriched inline at insert time (legacy / sync mode).
+alter table product_interest_requests
+  add column if not exists enrichment_status text
+    check (enrichment_status in ('pending', 'complete', 'failed')),
+  add column if not exists enrichment_attempts integer not null default 0,
+  add column if not exists enrichment_error text,
+  add column if not exists enriched_at timestamptz;
+
+create index if not exists product_interest_requests_enrichment_pending_idx
+  on product_interest_requests (created_at)
+  where enrichment_status in ('pending', 'failed');
+
+
+-- Local Shopify catalog mirror, filled by scripts/sync_catalog_mirror.py
+create table if not exists catalog_products (
+  product_id bigint primary key,
+  title text,
+  handle text,
+  status text,
+  tags text[] not null default '{}',
+  barcodes text[] not null default '{}',
+  skus text[] not null default '{}',
+  variant_ids bigint[] not null default '{}',
+  collection_titles text[] not null default '{}',
+  collection_handles text[] not null default '{}',
+  shopify_updated_at timestamptz,
+  synced_at timestamptz not null default now()
+);
+
+create index if not exists catalog_products_barcodes_idx
+  on catalog_products using gin (barcodes);
+
+create index if not exists catalog_products_synced_at_idx
+  on catalog_products (synced_at);
+
+create table if not exists catalog_sync_state (
+  key text primary key,
+  last_synced_at timestamptz,
+  last_bulk_operation_id text,
+  last_object_count integer,
+  updated_at timestamptz default now()
+);
+
+
+-- Keyset pagination for GET /api/interest?pagination=cursor: one (sort field, id)
+-- btree per sortable column; backward scans serve the descending direction.
+create index if not exists product_interest_requests_created_at_id_idx on product_interest_requests (created_at, id);
+create index if not exists product_interest_requests_product_title_id_idx on product_interest_requests (product_title, id);
+create index if not exists product_interest_requests_email_id_idx on product_interest_requests (email, id);
+create index if not exists product_interest_requests_customer_name_id_idx on product_interest_requests (customer_name, id);
+create index if not exists product_interest_requests_status_id_idx on product_interest_requests (status, id);
+create index if not exists product_interest_requests_cr_id_id_idx on product_interest_requests (cr_id, id);
+
+
+-- Indexed search for GET /api/interest?search=...
+-- Substring matches (ilike '%term%') are served by trigram GIN indexes;
+-- word matches by a maintained tsvector. CR ids use the (cr_id, id) btree above.
+create extension if not exists pg_trgm;
+
+create index if not exists product_interest_requests_product_title_trgm_idx
+  on product_interest_requests using gin (product_title gin_trgm_ops);
+create index if not exists product_interest_requests_email_trgm_idx
+  on product_interest_requests using gin (email gin_trgm_ops);
+create index if not exists product_interest_requests_customer_name_trgm_idx
+  on product_interest_requests using gin (customer_name gin_trgm_ops);
+create index if not exists product_interest_requests_cr_id_trgm_idx
+  on product_interest_requests using gin (cr_id gin_trgm_ops);
+create index if not exists product_interest_requests_isbn_trgm_idx
+  on product_interest_requests using gin (isbn gin_trgm_ops);
+create index if not exists product_interest_requests_isbn_idx
+  on product_interest_requests (isbn);
+
+alter table product_interest_requests
+  add column if not exists search_vector tsvector
+    generated always as (
+      setweight(to_tsvector('simple', coalesce(product_title, '')), 'A') ||
+      setweight(to_tsvector('simple', coalesce(customer_name, '')), 'B') ||
+      setweight(to_tsvector('simple', coalesce(email, '') || ' ' || coalesce(cr_id, '') || ' ' || coalesce(isbn, '')), 'C')
+    ) stored;
+
+create index if not exists product_interest_requests_search_vector_idx
+  on product_interest_requests using gin (search_vector);
+
+-- Relevance-ranked search (sort_field=relevance). The list filters and the
+-- page are applied inside the function, after matching and before the page
+-- is cut, so filtered results are complete at any depth. id breaks rank ties
+-- so the order is total. plpgsql so the function is never inlined.
+drop function if exists search_interest_requests(text, integer);
+
+create or replace function search_interest_requests(
+  term text,
+  archived_mode text default 'exclude',   -- exclude | include | only
+  collection_mode text default 'all',     -- all | op | notop
+  statuses text[] default null,           -- null = every status
+  row_offset integer default 0,
+  row_limit integer default 100
+)
+returns setof product_interest_requests
+language plpgsql
+stable
+as $$
+declare
+  q tsquery := websearch_to_tsquery('simple', term);
+  pattern text := '%' || replace(replace(replace(term, '\', '\\'), '%', '\%'), '_', '\_') || '%';
+begin
+  return query
+    select r.*
+    from product_interest_requests r
+    where (r.search_vector @@ q
+       or r.product_title ilike pattern
+       or r.email ilike pattern
+       or r.customer_name ilike pattern
+       or r.cr_id ilike pattern
+       or r.isbn ilike pattern)
+      and (archived_mode = 'include'
+       or (archived_mode = 'only') = r.archived)
+      and (collection_mode = 'all'
+       or (collection_mode = 'op') = r.is_out_of_print)
+      and (statuses is null or r.status = any(statuses))
+    order by
+      ts_rank(r.search_vector, q)
+      + greatest(
+          similarity(coalesce(r.product_title, ''), term),
+          similarity(coalesce(r.customer_name, ''), term),
+          similarity(r.email, term)
+        ) desc,
+      r.created_at desc,
+      r.id desc
+    offset row_offset
+    limit row_limit;
+end;
+$$;
+
+
+-- Out-of-Print classification, the single definition of "OP":
+-- OOP collection (by handle or title), an `op`/`pastop` tag, or a title starting "OP:".
+-- Generated, so it is recomputed whenever enrichment writes tags/collections,
+-- and adding the column backfills every existing row.
+alter table product_interest_requests
+  add column if not exists is_out_of_print boolean
+    generated always as (
+      coalesce(shopify_collection_handles && '{out-of-print-offers,out-of-print-offers-1}'::text[], false)
+      or coalesce(shopify_collections && '{Out-of-Print Offers,Past Out-of-Print Offers}'::text[], false)
+      or coalesce(product_tags && '{op,pastop}'::text[], false)
+      or coalesce(product_title ilike 'OP:%', false)
+    ) stored;
+
+create index if not exists product_interest_requests_op_created_at_idx
+  on product_interest_requests (created_at)
+  where is_out_of_print;
+create index if not exists product_interest_requests_not_op_created_at_idx
+  on product_interest_requests (created_at)
+  where not is_out_of_print;
+
+
+-- Set-based status change for POST /api/update_status/bulk.
+-- Thousands of ids cost one statement each for the status UPDATE and the
+-- status-log INSERT (data-modifying CTEs over unnest(req_ids)), not a call to
+-- update_status_with_log per row. new_stat is checked against the statuses the
+-- app uses (INTEREST_STATUSES in backend/app/routes.py) before anything is
+-- touched; an invalid one raises and nothing changes. The requested rows are
+-- locked, only rows whose status actually changes are updated and logged
+-- (same log table and columns update_status_with_log writes), and each id
+-- gets an outcome: 'updated', 'unchanged' (already at new_stat) or 'not_found'.
+create or replace function update_status_bulk_with_log(
+  req_ids uuid[],
+  new_stat text,
+  actor text default 'system',
+  src text default 'api'
+)
+returns table (id uuid, outcome text, previous_status text)
+language plpgsql
+volatile
+as $$
+#variable_conflict use_column
+begin
+  if new_stat is null or not (new_stat = any(array['New', 'In Progress', 'Request Filed', 'Complete'])) then
+    raise exception 'Invalid status: %', new_stat using errcode = '22023';
+  end if;
+
+  return query
+    with requested as (
+      select distinct unnest(req_ids) as req_id
+    ),
+    current_rows as (
+      select p.id as req_id, p.status as current_status
+      from product_interest_requests p
+      join requested q on q.req_id = p.id
+      order by p.id
+      for update of p
+    ),
+    changed as (
+      update product_interest_requests p
+      set status = new_stat
+      from current_rows c
+      where p.id = c.req_id
+        and c.current_status is distinct from new_stat
+      returning p.id as req_id, c.current_status as old_status
+    ),
+    logged as (
+      insert into product_interest_status_log (request_id, old_status, new_status, changed_by, source, is_optimistic)
+      select ch.req_id, ch.old_status, new_stat, actor, src, false
+      from changed ch
+      returning request_id
+    )
+    select
+      q.req_id,
+      case
+        when c.req_id is null then 'not_found'
+        when ch.req_id is not null then 'updated'
+        else 'unchanged'
+      end,
+      c.current_status
+    from requested q
+    left join current_rows c on c.req_id = q.req_id
+    left join changed ch on ch.req_id = q.req_id;
+end;
+$$;
+
+
+-- Checkpoint for scripts/ingest_signed_copy_orders.py: the watermark of the last
+-- completed run (later runs only fetch orders updated since), and the search and
+-- cursor of the last page written by a run that hasn't finished yet.
+create table if not exists signed_copy_ingest_state (
+  key text primary key,
+  last_synced_at timestamptz,
+  run_started_at timestamptz,
+  run_search text,
+  run_cursor text,
+  run_pages integer default 0,
+  run_rows integer default 0,
+  updated_at timestamptz default now()
+);
+
+-- Page-by-page upserts resolve conflicts on the Shopify line item.
+-- Re-running the original ingest inserted plain duplicate rows, and the index
+-- can't be built over them: first keep the earliest row per line item. If a
+-- later duplicate is the one that was emailed, its send (email_sent, sent time,
+-- token) moves onto the kept row, so nobody is emailed twice. No-op without
+-- duplicates.
+with kept as (
+  select distinct on (line_item_id) id, line_item_id
+  from signed_copy_campaign_recipients
+  where line_item_id is not null
+  order by line_item_id, created_at, id
+),
+first_send as (
+  select distinct on (line_item_id) line_item_id, email_sent_at, token, token_generated_at
+  from signed_copy_campaign_recipients
+  where line_item_id is not null
+    and email_sent
+  order by line_item_id, email_sent_at nulls last, created_at, id
+)
+update signed_copy_campaign_recipients r
+set email_sent = true,
+    email_sent_at = s.email_sent_at,
+    token = s.token,
+    token_generated_at = s.token_generated_at
+from kept k
+join first_send s on s.line_item_id = k.line_item_id
+where r.id = k.id
+  and r.email_sent is not true;
+
+delete from signed_copy_campaign_recipients r
+using (
+  select id, row_number() over (partition by line_item_id order by created_at, id) as n
+  from signed_copy_campaign_recipients
+  where line_item_id is not null
+) d
+where r.id = d.id
+  and d.n > 1;
+
+create unique index if not exists signed_copy_campaign_recipients_line_item_id_idx
+  on signed_copy_campaign_recipients (line_item_id);
+
+
+-- Campaigns as data for scripts/ingest_signed_copy_orders.py: one pass over the
+-- orders matches every line item against all active campaigns' product ids.
+-- Orders count for a campaign when placed within starts_at/ends_at (null = open).
+create table if not exists signed_copy_campaigns (
+  campaign_key text primary key,
+  title text not null,
+  product_ids bigint[] not null,
+  starts_at timestamptz,
+  ends_at timestamptz,
+  active boolean not null default true,
+  created_at timestamptz default now()
+);
+
+insert into signed_copy_campaigns (campaign_key, title, product_ids)
+values ('noma-signed-copy-decision', 'The Noma Guide to Building Flavour', array[7179329437829])
+on conflict (campaign_key) do nothing;
+
+-- Existing recipients all belong to the Noma campaign
+alter table signed_copy_campaign_recipients
+  add column if not exists campaign_key text not null default 'noma-signed-copy-decision';
+
+-- A line item can be a recipient of more than one campaign (the dedupe above
+-- already leaves (campaign_key, line_item_id) unique)
+drop index if exists signed_copy_campaign_recipients_line_item_id_idx;
+create unique index if not exists signed_copy_campaign_recipients_campaign_line_item_idx
+  on signed_copy_campaign_recipients (campaign_key, line_item_id);
+
+-- Bulk bookkeeping for mailtrap/send_signed_copy_emails.py: marks a batch of
+-- delivered recipients sent in one statement. sends is [{id, token, sent_at}];
+-- rows another run already marked (email_sent = true) are left unchanged.
+-- Returns the ids it updated.
+create or replace function mark_signed_copy_emails_sent(sends jsonb)
+returns table (id uuid)
+language sql
+volatile
+as $$
+  update signed_copy_campaign_recipients r
+  set email_sent = true,
+      email_sent_at = s.sent_at,
+      token = s.token,
+      token_generated_at = s.sent_at
+  from jsonb_to_recordset(sends) as s(id uuid, token text, sent_at timestamptz)
+  where r.id = s.id
+    and r.email_sent = false
+  returning r.id;
+$$;
+
+-- scripts/sync_catalog_mirror.py: when the last full rescan ran. Incremental
+-- runs can't see collection membership changes, so a run becomes a full
+-- rescan once this is older than CATALOG_FULL_SYNC_HOURS.
+alter table catalog_sync_state
+  add column if not exists last_full_sync_at timestamptz;
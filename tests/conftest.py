@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+# Modules import `backend.app.*` / `scripts.*` from the repo root and build
+# their Supabase clients at import time; nothing here talks to them.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_KEY", "test.test.test")
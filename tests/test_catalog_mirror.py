@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from scripts import sync_catalog_mirror as mirror
+
+RECORDS = [
+    {"id": "gid://shopify/Product/1", "title": "Noma"},
+    {"id": "gid://shopify/ProductVariant/11", "__parentId": "gid://shopify/Product/1", "barcode": "978"},
+    # Child of a product that never appeared before it
+    {"id": "gid://shopify/Collection/5", "__parentId": "gid://shopify/Product/2", "title": "OP"},
+]
+
+
+def test_orphans_are_counted():
+    stats = {}
+    rows = list(mirror.iter_products(iter(RECORDS), "2026-01-01T00:00:00+00:00", stats))
+
+    assert [r["product_id"] for r in rows] == [1]
+    assert stats["orphans"] == 1
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    saved, queries = [], []
+    monkeypatch.setattr(mirror, "start_bulk_operation", lambda query: queries.append(query) or "op-1")
+    monkeypatch.setattr(mirror, "wait_for_bulk_operation", lambda op_id: {"objectCount": 3, "url": "jsonl"})
+    monkeypatch.setattr(mirror, "stream_jsonl", lambda url: iter(RECORDS))
+    monkeypatch.setattr(mirror, "upsert_chunk", lambda rows: None)
+    monkeypatch.setattr(mirror, "save_watermark", lambda *args: saved.append(args))
+    return saved, queries
+
+
+def test_orphans_keep_the_old_watermark(offline, monkeypatch):
+    saved, _queries = offline
+    recent = datetime.now(timezone.utc).isoformat()
+    monkeypatch.setattr(mirror, "load_state", lambda: {"last_synced_at": recent, "last_full_sync_at": recent})
+
+    with pytest.raises(RuntimeError, match="orphan"):
+        mirror.sync()
+
+    assert saved == []
+
+
+def test_stale_full_sync_turns_a_run_into_a_rescan(offline, monkeypatch):
+    saved, queries = offline
+    old = (datetime.now(timezone.utc) - timedelta(hours=mirror.FULL_SYNC_HOURS + 1)).isoformat()
+    monkeypatch.setattr(mirror, "load_state", lambda: {"last_synced_at": old, "last_full_sync_at": old})
+    monkeypatch.setattr(mirror, "stream_jsonl", lambda url: iter(RECORDS[:2]))
+
+    class Deleted:
+        data = []
+
+    monkeypatch.setattr(mirror.supabase, "table", lambda name: type("Q", (), {
+        "delete": lambda self: self, "lt": lambda self, *a: self, "execute": lambda self: Deleted(),
+    })())
+
+    mirror.sync()
+
+    assert "updated_at" not in queries[0]
+    assert saved and saved[0][-1] is True
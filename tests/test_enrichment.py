@@ -0,0 +1,39 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from app import supabase_client
+
+
+def run_enrichment(monkeypatch, outcomes, prior_attempts=0):
+    calls, sleeps = [], []
+
+    def attempt(row_id, product_id, n, last):
+        calls.append((n, last))
+        return {"id": row_id, "status": outcomes.pop(0), "attempts": n}
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(supabase_client, "enrich_interest_attempt", attempt)
+    monkeypatch.setattr(supabase_client.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(supabase_client, "ENRICHMENT_MAX_ATTEMPTS", 4)
+    result = asyncio.run(supabase_client.enrich_interest_row("row-1", 1, prior_attempts))
+    return result, calls, sleeps
+
+
+def test_backoff_waits_on_the_event_loop(monkeypatch):
+    result, calls, sleeps = run_enrichment(monkeypatch, ["retry", "retry", "complete"])
+
+    assert result["status"] == "complete"
+    assert calls == [(1, False), (2, False), (3, False)]
+    assert len(sleeps) == 2 and sleeps[1] == 2 * sleeps[0]
+
+
+def test_sweep_only_uses_the_attempts_left(monkeypatch):
+    result, calls, _sleeps = run_enrichment(monkeypatch, ["retry", "failed"], prior_attempts=2)
+
+    assert result["status"] == "failed"
+    assert calls == [(3, False), (4, True)]
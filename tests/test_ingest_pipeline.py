@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+from scripts import ingest_signed_copy_orders as ingest_mod
+
+CAMPAIGN = {
+    "campaign_key": "test-campaign",
+    "title": "Test",
+    "product_ids": [1],
+    "starts_at": None,
+    "ends_at": None,
+}
+
+
+def order(n):
+    return {
+        "id": f"gid://shopify/Order/{n}",
+        "name": f"#{n}",
+        "email": f"buyer{n}@example.com",
+        "createdAt": "2026-01-01T00:00:00+00:00",
+        "customer": {"id": f"gid://shopify/Customer/{n}", "firstName": "Ada"},
+        "lineItems": {
+            "pageInfo": {"hasNextPage": False, "endCursor": None},
+            "edges": [{"node": {
+                "id": f"gid://shopify/LineItem/{n}",
+                "quantity": 1,
+                "sku": "SKU-1",
+                "product": {"id": "gid://shopify/Product/1"},
+            }}],
+        },
+    }
+
+
+def slow_pages(search, cursor=None):
+    # Slower than the writer, so ingest is waiting on the next page when a write fails
+    n = 0
+    while True:
+        time.sleep(0.2)
+        n += 1
+        yield [order(n)], f"cursor-{n}", True
+
+
+def run_with_timeout(fn, seconds=10):
+    outcome = {}
+
+    def target():
+        try:
+            fn()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "ingest hung"
+    return outcome.get("error")
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    monkeypatch.setattr(ingest_mod, "load_campaigns", lambda keys=None: [CAMPAIGN])
+    monkeypatch.setattr(ingest_mod, "load_state", lambda key: {})
+    monkeypatch.setattr(ingest_mod, "save_state", lambda key, **fields: None)
+    monkeypatch.setattr(ingest_mod, "iter_pages", slow_pages)
+
+
+def test_pipelined_ingest_raises_when_writer_fails(offline, monkeypatch):
+    def failing_write(rows):
+        raise RuntimeError("upsert failed")
+
+    monkeypatch.setattr(ingest_mod, "write_rows", failing_write)
+
+    error = run_with_timeout(lambda: ingest_mod.ingest(pipelined=True, chunk_size=1))
+
+    assert isinstance(error, RuntimeError)
+    assert str(error) == "upsert failed"
+
+
+def test_pipelined_ingest_raises_when_fetch_fails(offline, monkeypatch):
+    def failing_pages(search, cursor=None):
+        yield [order(1)], "cursor-1", True
+        raise RuntimeError("THROTTLED")
+
+    monkeypatch.setattr(ingest_mod, "iter_pages", failing_pages)
+    monkeypatch.setattr(ingest_mod, "write_rows", lambda rows: None)
+
+    error = run_with_timeout(lambda: ingest_mod.ingest(pipelined=True, chunk_size=1))
+
+    assert str(error) == "THROTTLED"
+
+
+def test_sku_filter_is_rejected_for_several_campaigns(offline, monkeypatch):
+    other = {**CAMPAIGN, "campaign_key": "other-campaign", "product_ids": [2]}
+    monkeypatch.setattr(ingest_mod, "load_campaigns", lambda keys=None: [CAMPAIGN, other])
+
+    with pytest.raises(RuntimeError, match="campaigns"):
+        ingest_mod.ingest(sku="SKU-1")
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_interrupted_run_resumes_past_page_one(offline, monkeypatch, pipelined):
+    # Fewer matches than chunk_size: only the periodic checkpoint can save the cursor
+    state = {}
+    monkeypatch.setattr(ingest_mod, "load_state", lambda key: dict(state))
+    monkeypatch.setattr(ingest_mod, "save_state", lambda key, **fields: state.update(fields))
+    monkeypatch.setattr(ingest_mod, "write_rows", lambda rows: None)
+    monkeypatch.setattr(ingest_mod, "CHECKPOINT_PAGES", 3)
+    resumed_from = []
+
+    def pages(search, cursor=None):
+        resumed_from.append(cursor)
+        start = int(cursor.split("-")[1]) if cursor else 0
+        for n in range(start + 1, 11):
+            if n == 8 and cursor is None:
+                raise RuntimeError("THROTTLED")
+            # Every other page has no matching line items
+            orders = [order(n)] if n % 2 else []
+            yield orders, f"cursor-{n}", n < 10
+
+    monkeypatch.setattr(ingest_mod, "iter_pages", pages)
+
+    error = run_with_timeout(lambda: ingest_mod.ingest(pipelined=pipelined, chunk_size=500))
+    assert str(error) == "THROTTLED"
+    assert state["run_cursor"] == "cursor-7"
+    assert state["run_rows"] == 4
+
+    assert run_with_timeout(lambda: ingest_mod.ingest(pipelined=pipelined, chunk_size=500)) is None
+    assert resumed_from == [None, "cursor-7"]
+    assert state["run_cursor"] is None
+    assert state["last_synced_at"]
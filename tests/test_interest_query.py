@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+# The app imports itself as `app.*` (run from backend/)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from app.interest_query import seek_segments
+
+
+class RecordingQuery:
+    def __init__(self):
+        self.calls = []
+
+    @property
+    def not_(self):
+        self.calls.append(("not",))
+        return self
+
+    def __getattr__(self, name):
+        def record(*args):
+            self.calls.append((name, *args))
+            return self
+        return record
+
+
+def segments(field, desc, cursor):
+    out = []
+    for segment in seek_segments(field, desc, cursor):
+        q = RecordingQuery()
+        segment(q)
+        out.append(q.calls)
+    return out
+
+
+def test_first_page_has_no_seek():
+    assert segments("created_at", True, None) == [[]]
+
+
+def test_desc_seek_has_an_index_range_bound():
+    [calls] = segments("created_at", True, {"v": "2026-01-01", "id": "b"})
+    assert ("lte", "created_at", "2026-01-01") in calls
+    assert calls[-1][0] == "or_"
+
+
+def test_asc_seek_reads_the_null_tail_separately():
+    ranged, tail = segments("customer_name", False, {"v": "Ada", "id": "b"})
+    assert ("gte", "customer_name", "Ada") in ranged
+    assert tail == [("is_", "customer_name", "null")]
+
+
+def test_desc_seek_from_the_null_block():
+    nulls, rest = segments("customer_name", True, {"v": None, "id": "b"})
+    assert nulls == [("is_", "customer_name", "null"), ("lt", "id", "b")]
+    assert rest == [("not",), ("is_", "customer_name", "null")]
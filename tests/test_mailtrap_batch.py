@@ -0,0 +1,137 @@
+import httpx
+import pytest
+
+from mailtrap import send_signed_copy_emails as sender
+
+
+class RecordingOutcomes:
+    def __init__(self):
+        self.sent_ids = []
+        self.log = []
+
+    def sent(self, row, token):
+        self.sent_ids.append(row["id"])
+
+    def failed(self, row, error_msg, status="failed"):
+        self.log.append((row["id"], status))
+
+    def flush(self):
+        pass
+
+
+ROWS = [
+    {"id": f"r{n}", "email": f"buyer{n}@example.com", "first_name": "Ada", "product_title": "Noma"}
+    for n in range(3)
+]
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setenv("MAILTRAP_API_TOKEN", "test")
+    monkeypatch.setenv("EMAIL_SENDER", "test@example.com")
+    monkeypatch.setattr(sender, "render", lambda row: (f"token-{row['id']}", "<p>hi</p>"))
+    monkeypatch.setattr(sender.time, "sleep", lambda seconds: None)
+
+
+def respond(monkeypatch, response=None, error=None):
+    calls = []
+
+    def request(method, url, **kwargs):
+        calls.append(kwargs["json"])
+        if error:
+            raise error
+        return response
+
+    monkeypatch.setattr(sender.http_client, "request", request)
+    return calls
+
+
+def test_ambiguous_batch_failure_is_not_resent(monkeypatch):
+    calls = respond(monkeypatch, error=httpx.ReadTimeout("timed out"))
+    per_message = []
+    monkeypatch.setattr(sender, "process_row", lambda *args, **kwargs: per_message.append(args))
+    outcomes = RecordingOutcomes()
+
+    sent, failed, unknown, not_attempted = sender.run_batches(ROWS, outcomes, batch_size=10)
+
+    assert len(calls) == 1
+    assert per_message == []
+    assert (sent, failed, unknown, not_attempted) == (0, 0, 3, 0)
+    assert {status for _id, status in outcomes.log} == {"unknown"}
+
+
+def test_malformed_200_is_not_resent(monkeypatch):
+    calls = respond(monkeypatch, httpx.Response(200, json={"success": True, "responses": []}))
+    monkeypatch.setattr(sender, "process_row", lambda *args, **kwargs: pytest.fail("fell back to per-message sends"))
+
+    sent, failed, unknown, not_attempted = sender.run_batches(ROWS, RecordingOutcomes(), batch_size=10)
+
+    assert len(calls) == 1
+    assert unknown == 3
+
+
+def test_persistent_429_stops_instead_of_sending_per_message(monkeypatch):
+    calls = respond(monkeypatch, httpx.Response(429))
+    monkeypatch.setattr(sender, "process_row", lambda *args, **kwargs: pytest.fail("fell back to per-message sends"))
+
+    result = sender.run_batches(ROWS, RecordingOutcomes(), batch_size=2)
+
+    assert len(calls) == sender.MAX_RETRIES
+    assert result == (0, 0, 0, 3)
+
+
+def test_rejected_batch_falls_back_to_per_message_sends(monkeypatch):
+    respond(monkeypatch, httpx.Response(422, json={"errors": ["too large"]}))
+    per_message = []
+    monkeypatch.setattr(sender, "process_row", lambda row, outcomes, **kwargs: per_message.append(row["id"]))
+
+    assert sender.run_batches(ROWS, RecordingOutcomes(), batch_size=10) == (3, 0, 0, 0)
+    assert per_message == ["r0", "r1", "r2"]
+
+
+def test_send_rate_counts_messages_not_batch_calls(monkeypatch):
+    respond(monkeypatch, httpx.Response(200, json={"responses": [{"success": True}] * 3}))
+    taken = []
+    monkeypatch.setattr(sender.TokenBucket, "acquire", lambda self, n=1: taken.append(n))
+
+    sender.run_batches(ROWS, RecordingOutcomes(), batch_size=10, send_rate=5)
+
+    assert taken == [3]
+
+
+def test_token_bucket_borrows_beyond_its_burst(monkeypatch):
+    clock = {"now": 0.0}
+    monkeypatch.setattr(sender.time, "monotonic", lambda: clock["now"])
+    monkeypatch.setattr(sender.time, "sleep", lambda seconds: clock.update(now=clock["now"] + seconds))
+    bucket = sender.TokenBucket(10)
+
+    bucket.acquire(30)   # the full burst of 10, plus 20 borrowed
+    bucket.acquire(1)
+
+    assert clock["now"] == pytest.approx(2.1)
+
+
+def test_connect_error_means_not_sent(monkeypatch):
+    respond(monkeypatch, error=httpx.ConnectError("refused"))
+
+    with pytest.raises(sender.BatchTemporarilyRefused):
+        sender.send_mailtrap_batch([{"to": "a@example.com", "subject": "s", "html": "h"}])
+
+
+def test_rejected_messages_are_retried_alone(monkeypatch):
+    results = iter([
+        {"responses": [{"success": True}, {"success": False, "errors": ["bad"]}, {"success": True}]},
+        {"responses": [{"success": True}]},
+    ])
+    calls = []
+
+    def request(method, url, **kwargs):
+        calls.append([m["to"][0]["email"] for m in kwargs["json"]["requests"]])
+        return httpx.Response(200, json=next(results))
+
+    monkeypatch.setattr(sender.http_client, "request", request)
+    outcomes = RecordingOutcomes()
+
+    assert sender.run_batches(ROWS, outcomes, batch_size=10) == (3, 0, 0, 0)
+    assert calls[1] == ["buyer1@example.com"]
+    assert sorted(outcomes.sent_ids) == ["r0", "r1", "r2"]
@@ -5,6 +5,8 @@ import jwt
 
 SIGNED_COPY_TOKEN_SECRET = os.getenv("SIGNED_COPY_TOKEN_SECRET")
 SIGNED_COPY_TOKEN_ALG = "HS256"
+# Campaign for recipient rows without a campaign_key (ingested before signed_copy_campaigns)
+DEFAULT_CAMPAIGN_KEY = "noma-signed-copy-decision"
 
 def generate_signed_copy_token(row: dict) -> str:
     now = int(time.time())
@@ -19,7 +21,7 @@ def generate_signed_copy_token(row: dict) -> str:
         "order_name": row.get("order_name"),
         "line_item_id": row.get("line_item_id"),
         "customer_id": row.get("customer_id"),
-        "campaign_key": "noma-signed-copy-decision",
+        "campaign_key": row.get("campaign_key") or DEFAULT_CAMPAIGN_KEY,
         "iat": now,
         "exp": now + (60 * 60 * 24 * 30),
     }